@@ -0,0 +1,113 @@
+# app/charts.py
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+import streamlit.components.v1 as components
+from app.downsampling import downsample_for_chart
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+CHART_CACHE_ENTRIES = 64  # Rendered charts kept in memory; least recently used are evicted first
+# -----------------------------
+
+_lock = threading.RLock()
+_rendered = OrderedDict()  # chart key -> Bokeh json_item dict
+_bundle = {'html': None}
+
+def data_hash(df) -> str:
+    """Content hash of a frame: its values, index, column names and dtypes."""
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    return digest.hexdigest()
+
+def chart_key(df, kind, options) -> str:
+    """Cache key for a chart: plot kind, data hash and the hvplot options."""
+    return f"{kind}:{data_hash(df)}:{json.dumps(options, sort_keys=True, default=str)}"
+
+def _build_item(df, kind, options):
+    """
+    Plots `df` with hvplot, renders it to a Bokeh model and serializes it in
+    memory. Long series are downsampled to the chart's point budget first.
+    """
+    import holoviews as hv
+    import hvplot.pandas  # noqa: F401 - registers the DataFrame.hvplot accessor
+    from bokeh.embed import json_item
+
+    df = downsample_for_chart(df, kind, options)
+    plot = getattr(df.hvplot, kind)(**options)
+    return json_item(hv.render(plot, backend='bokeh'))
+
+def render_chart_item(df, kind='line', **options):
+    """
+    Returns the Bokeh json_item for `df.hvplot.<kind>(**options)`. Items are
+    cached by data hash and options, so a rerun with unchanged inputs does
+    not plot or render again.
+    """
+    key = chart_key(df, kind, options)
+    with _lock:
+        item = _rendered.get(key)
+        if item is not None:
+            _rendered.move_to_end(key)
+            logger.debug(f"Chart cache hit for {kind} plot of {len(df)} rows")
+            return item
+    item = _build_item(df, kind, options)
+    with _lock:
+        _rendered[key] = item
+        while len(_rendered) > CHART_CACHE_ENTRIES:
+            _rendered.popitem(last=False)
+    return item
+
+def bokeh_bundle_html() -> str:
+    """Script tags loading BokehJS from the CDN; built once per process."""
+    if _bundle['html'] is None:
+        from bokeh.resources import CDN
+        _bundle['html'] = CDN.render_js()
+    return _bundle['html']
+
+def charts_html(items) -> str:
+    """
+    One HTML document embedding every json_item, with a single BokehJS
+    bundle shared between them.
+    """
+    divs = []
+    scripts = []
+    for position, item in enumerate(items):
+        target = f"chart-{position}"
+        divs.append(f'<div id="{target}"></div>')
+        # "</" inside the JSON would close the <script> element early
+        payload = json.dumps(item).replace('</', '<\\/')
+        scripts.append(f"Bokeh.embed.embed_item({payload}, '{target}');")
+    return (
+        f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">{bokeh_bundle_html()}</head>"
+        f"<body>{''.join(divs)}<script>{''.join(scripts)}</script></body></html>"
+    )
+
+def show_charts(charts, frame_height=450) -> bool:
+    """
+    Renders several charts in one Streamlit component. `charts` is a list
+    of (df, kind, options) tuples; `frame_height` is the component height
+    allowed per chart, in pixels.
+
+    Returns:
+        True if the charts were rendered, False on failure (already logged).
+    """
+    try:
+        items = [render_chart_item(df, kind, **options) for df, kind, options in charts]
+        components.html(charts_html(items), height=frame_height * len(items))
+        return True
+    except Exception as e:
+        logger.error(f"Failed to render Bokeh chart: {e}", exc_info=True)
+        return False
+
+def show_chart(df, kind='line', frame_height=450, **options) -> bool:
+    """Renders `df.hvplot.<kind>(**options)` in a Streamlit component. See show_charts."""
+    return show_charts([(df, kind, options)], frame_height=frame_height)
+
+def clear_chart_cache():
+    with _lock:
+        _rendered.clear()
@@ -0,0 +1,66 @@
+# app/corridor.py
+import logging
+import numpy as np
+import pandas as pd
+from app.geo_index import EARTH_RADIUS_M
+
+logger = logging.getLogger(__name__)
+
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+
+def corridor_station_keys(station_index, road, lga=None) -> tuple:
+    """Stations whose road_name or common_road_name is `road`, optionally within one LGA, in station order."""
+    keys = set(station_index.keys_for('road_name', road)) | set(station_index.keys_for('common_road_name', road))
+    if lga:
+        keys &= set(station_index.keys_for('lga', lga))
+    return tuple(key for key in station_index.keys if key in keys)
+
+def corridor_axis(lats, lons):
+    """
+    Fits a straight line through the points (principal axis of their
+    positions in a local metric projection) and returns each point's
+    distance along it in metres, starting at 0. The axis points north for
+    mostly north-south roads and east otherwise, so a corridor always reads
+    the same way round.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if len(lats) < 2:
+        return np.zeros(len(lats))
+    scale = np.radians(1.0) * EARTH_RADIUS_M
+    points = np.column_stack((lons * np.cos(np.radians(lats.mean())) * scale, lats * scale))
+    centred = points - points.mean(axis=0)
+    axis = np.linalg.svd(centred, full_matrices=False)[2][0]
+    dominant = 1 if abs(axis[1]) >= abs(axis[0]) else 0
+    if axis[dominant] < 0:
+        axis = -axis
+    along = centred @ axis
+    return along - along.min()
+
+def order_along_corridor(stations: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sorts stations by their position along the corridor's line fit and adds
+    `chainage_km`. Stations without coordinates go last with a missing
+    chainage.
+    """
+    stations = stations.copy()
+    located = stations['wgs84_latitude'].notna() & stations['wgs84_longitude'].notna()
+    stations['chainage_km'] = np.nan
+    stations.loc[located, 'chainage_km'] = corridor_axis(
+        stations.loc[located, 'wgs84_latitude'], stations.loc[located, 'wgs84_longitude']) / 1000.0
+    return stations.sort_values(['chainage_km', 'station_key'], na_position='last').reset_index(drop=True)
+
+def profiles_long(profiles: pd.DataFrame, labels: dict) -> pd.DataFrame:
+    """
+    Reshapes per-station profiles (station_key, hour_00..hour_23) into
+    ['Hour', 'Average Volume', 'Station ID'] rows for a multi-line chart,
+    keeping the row order of `profiles`. `labels` maps station_key to the
+    label shown in the legend.
+    """
+    long = profiles[['station_key'] + HOUR_COLUMNS].melt(id_vars='station_key', var_name='Hour',
+                                                         value_name='Average Volume')
+    long['Hour'] = long['Hour'].str[-2:].astype(int)
+    long['Station ID'] = long['station_key'].map(labels)
+    order = {key: position for position, key in enumerate(profiles['station_key'])}
+    long['order'] = long['station_key'].map(order)
+    return long.sort_values(['order', 'Hour'])[['Hour', 'Average Volume', 'Station ID']].reset_index(drop=True)
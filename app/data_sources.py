@@ -0,0 +1,426 @@
+# app/data_sources.py
+import os
+import json
+import logging
+import datetime
+import threading
+from typing import Dict, List, Optional, Any
+import pandas as pd
+import streamlit as st
+from app.models import HourlyCount
+from app.query_cache import get_dataset_version, build_scope, is_entry_current
+from app.hv_metrics import CLASS_PREFIXES as HV_CLASSES, VALUE_COLUMNS as HV_VALUE_COLUMNS, pivot_column
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: without pyarrow every read goes to PostgreSQL
+    pa = ds = pq = None
+
+try:
+    import duckdb
+except ImportError:  # Optional: only needed for the 'duckdb' backend
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+DEFAULT_BACKEND = 'postgres'  # 'postgres', 'parquet' or 'duckdb'; override in st.secrets["data_source"] or env
+DEFAULT_PARQUET_DIR = os.path.join("app", "data", "parquet", "hourly_counts")
+DEFAULT_DUCKDB_PATH = os.path.join("app", "data", "traffic.duckdb")  # Built by db_parquet_export.py --duckdb
+PARQUET_FILE_NAME = 'data.parquet'  # One file per year=/station_key= partition directory
+PARQUET_ROW_GROUP_SIZE = 4096  # Rows per row group; files are sorted by count_date so date filters skip groups
+MANIFEST_FILE_NAME = '_manifest.json'  # Dataset version the local files are current to
+STATIONS_FILE_NAME = '_stations.parquet'  # Station metadata exported next to the partitions
+# -----------------------------
+
+HOURLY_COLUMN_NAMES = [column.name for column in HourlyCount.__table__.columns]
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+PARTITION_COLUMNS = ['year', 'station_key']  # Hive partition keys, in directory order
+
+_source_lock = threading.Lock()
+_source_state = {'settings': None, 'source': None}
+
+def get_data_source_settings() -> Dict[str, Any]:
+    """
+    Local backend settings from st.secrets["data_source"] (keys `backend`,
+    `parquet_dir` and `duckdb_path`), falling back to the TRAFFIC_DATA_SOURCE,
+    TRAFFIC_PARQUET_DIR and TRAFFIC_DUCKDB_PATH environment variables, then
+    the defaults.
+    """
+    settings = {
+        'backend': os.environ.get('TRAFFIC_DATA_SOURCE', DEFAULT_BACKEND),
+        'parquet_dir': os.environ.get('TRAFFIC_PARQUET_DIR', DEFAULT_PARQUET_DIR),
+        'duckdb_path': os.environ.get('TRAFFIC_DUCKDB_PATH', DEFAULT_DUCKDB_PATH),
+    }
+    try:
+        if "data_source" in st.secrets:
+            settings.update({key: value for key, value in st.secrets["data_source"].items() if key in settings})
+    except Exception as e:
+        logger.debug(f"No data_source settings in secrets: {e}")
+    settings['backend'] = str(settings['backend']).lower()
+    return settings
+
+def _to_date(value) -> datetime.date:
+    return pd.Timestamp(value).date()
+
+def hourly_file_schema():
+    """
+    Arrow schema of a partition file: every hourly_counts column except the
+    partition keys, typed like `db_utils.HOURLY_COMPACT_DTYPES`.
+    """
+    from app.db_utils import HOURLY_COMPACT_DTYPES
+
+    fields = []
+    for name in HOURLY_COLUMN_NAMES:
+        if name in PARTITION_COLUMNS:
+            continue
+        if name == 'count_date':
+            arrow_type = pa.date32()
+        elif name in HOURLY_COMPACT_DTYPES:
+            dtype = HOURLY_COMPACT_DTYPES[name]
+            arrow_type = pa.bool_() if dtype == 'bool' else getattr(pa, dtype)()
+        else:
+            arrow_type = pa.int64()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+def _sql_literal(value) -> str:
+    """Quotes a file path for inline use in DuckDB SQL (table functions take no parameters)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+def partition_schema():
+    return pa.schema([pa.field('year', pa.int16()), pa.field('station_key', pa.int32())])
+
+
+class LocalDataSource:
+    """
+    A local backend that can answer db_utils reads without PostgreSQL. Every
+    `read_*` method returns None whenever the source cannot serve a request
+    (unsupported, missing or stale data), and the caller falls back to the
+    database. Results match what the PostgreSQL query would return before
+    db_utils post-processes them.
+    """
+    name = 'base'
+
+    def read_hourly(self, _session, station_keys: List[int], start_date, end_date,
+                    directions: Optional[List[int]] = None,
+                    columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Rows of hourly_counts, as selected by `get_hourly_data_for_stations`."""
+        return None
+
+    def read_station_metadata(self, _session) -> Optional[pd.DataFrame]:
+        """Every row of stations, as returned by `get_all_station_metadata`."""
+        return None
+
+    def read_hourly_profile_rows(self, _session, station_keys: List[int], start_date, end_date,
+                                 directions: Optional[List[int]] = None, classification_seq: Optional[int] = None,
+                                 by_station: bool = False) -> Optional[pd.DataFrame]:
+        """[station_key,] period and AVG(hour_00..hour_23) rows, as aggregated by `get_hourly_profile`."""
+        return None
+
+    def read_station_days(self, _session, station_keys: List[int], start_date, end_date,
+                          directions: Optional[List[int]] = None, classification_seq: Optional[int] = None,
+                          day_type: Optional[str] = None, exclude_holidays: bool = True,
+                          value_columns: Optional[List[str]] = None, by_class: bool = False) -> Optional[pd.DataFrame]:
+        """
+        `value_columns` summed per station-day [and class], as the station-day
+        subquery of `get_station_day_hours` / `get_corridor_profiles` groups them.
+        """
+        return None
+
+    def read_heavy_vehicle_pivot(self, _session, station_keys: List[int], start_date, end_date,
+                                 directions: Optional[List[int]] = None,
+                                 day_type: Optional[str] = 'Weekday') -> Optional[pd.DataFrame]:
+        """Per-station class sums in the hv_metrics.pivot_columns() layout, as aggregated by `get_heavy_vehicle_pivot`."""
+        return None
+
+
+class ParquetHourlySource(LocalDataSource):
+    """
+    hourly_counts exported to Parquet under
+    `<root>/year=YYYY/station_key=K/data.parquet` (see dbtools/db_parquet_export.py).
+
+    Requests touch only the partition files for the requested years and
+    stations; count_date and direction filters are pushed down to row-group
+    statistics and only the requested columns are decoded. The manifest's
+    dataset version is compared with the database's, and a request is served
+    only if no ingest run since the export overlaps its stations and dates.
+    """
+    name = 'parquet'
+
+    def __init__(self, root: str):
+        self.root = root
+        self._manifest = None
+        self._manifest_mtime = None
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        """The export manifest, re-read whenever the file changes; None if there is no complete export."""
+        path = os.path.join(self.root, MANIFEST_FILE_NAME)
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime != self._manifest_mtime:
+                with open(path) as infile:
+                    self._manifest = json.load(infile)
+                self._manifest_mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.debug(f"No usable Parquet manifest at {path}: {e}")
+            self._manifest, self._manifest_mtime = None, None
+        if self._manifest and self._manifest.get('complete'):
+            return self._manifest
+        return None
+
+    def exported_version(self) -> Optional[int]:
+        """Dataset version the local data reflects, or None if there is no usable export."""
+        manifest = self.manifest()
+        return int(manifest['dataset_version']) if manifest is not None else None
+
+    def is_current(self, _session, station_keys=None, start_date=None, end_date=None) -> bool:
+        """
+        True if the local data reflects every ingest run that touched these
+        stations and dates (all stations and dates when not given).
+        """
+        exported_version = self.exported_version()
+        if exported_version is None:
+            return False
+        current_version = get_dataset_version(_session)
+        if exported_version >= current_version:
+            return True
+        scope = build_scope({'station_keys': station_keys, 'start_date': start_date, 'end_date': end_date},
+                            stations='station_keys', dates=('start_date', 'end_date'))
+        return is_entry_current({'version': exported_version, 'scope': scope}, current_version)
+
+    def partition_paths(self, station_keys, start_date, end_date) -> List[str]:
+        """Existing partition files for the requested stations in the years spanned by the date range."""
+        paths = []
+        for year in range(_to_date(start_date).year, _to_date(end_date).year + 1):
+            for station_key in sorted(set(int(key) for key in station_keys)):
+                path = os.path.join(self.root, f"year={year}", f"station_key={station_key}", PARQUET_FILE_NAME)
+                if os.path.exists(path):
+                    paths.append(path)
+        return paths
+
+    def read_hourly(self, _session, station_keys, start_date, end_date, directions=None, columns=None):
+        if ds is None or not station_keys or not self.is_current(_session, station_keys, start_date, end_date):
+            return None
+        columns = list(dict.fromkeys(columns)) if columns else HOURLY_COLUMN_NAMES
+        paths = self.partition_paths(station_keys, start_date, end_date)
+        if not paths:
+            # The export is complete, so a missing partition means the station has no rows that year
+            return pd.DataFrame({col: pd.Series(dtype='object') for col in columns})
+
+        dataset = ds.dataset(
+            paths, schema=pa.unify_schemas([hourly_file_schema(), partition_schema()]), format='parquet',
+            partitioning=ds.partitioning(partition_schema(), flavor='hive'), partition_base_dir=self.root,
+        )
+        condition = (ds.field('count_date') >= pa.scalar(_to_date(start_date), pa.date32())) & \
+                    (ds.field('count_date') <= pa.scalar(_to_date(end_date), pa.date32()))
+        if directions and 3 not in directions:
+            condition &= ds.field('traffic_direction_seq').isin([int(d) for d in directions])
+        table = dataset.to_table(columns=columns, filter=condition)
+        logger.debug(f"Read {table.num_rows} hourly rows from {len(paths)} Parquet partitions")
+        return table.to_pandas()
+
+    def read_station_metadata(self, _session):
+        path = os.path.join(self.root, STATIONS_FILE_NAME)
+        if pq is None or not os.path.exists(path) or not self.is_current(_session):
+            return None
+        return pq.read_table(path).to_pandas()
+
+
+class DuckDBSource(ParquetHourlySource):
+    """
+    Embedded DuckDB over the Parquet export. When `database_path` exists (a
+    database built by `db_parquet_export.py --duckdb`), its native tables are
+    queried read-only and its `_meta` table gives the dataset version;
+    otherwise an in-memory database exposes the Parquet files as views. Runs
+    the same SQL as the PostgreSQL readers, so whole-network group-bys stay
+    on the local machine.
+    """
+    name = 'duckdb'
+
+    def __init__(self, root: str, database_path: str):
+        super().__init__(root)
+        self.database_path = database_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connection = None
+        self._opened = None  # (database mtime or None, manifest version) the connection was opened for
+        self._database_version = None
+        self._generation = 0
+
+    def _open_connection(self):
+        """Opens the database file read-only, or an in-memory database with views over the export."""
+        if os.path.exists(self.database_path):
+            connection = duckdb.connect(self.database_path, read_only=True)
+            version = connection.execute("SELECT dataset_version FROM _meta").fetchone()[0]
+            return connection, int(version)
+
+        connection = duckdb.connect(':memory:')
+        partitions = os.path.join(self.root, 'year=*', 'station_key=*', PARQUET_FILE_NAME)
+        connection.execute(
+            f"CREATE VIEW hourly_counts AS SELECT {', '.join(HOURLY_COLUMN_NAMES)} FROM read_parquet({_sql_literal(partitions)}, "
+            "hive_partitioning = true, hive_types = {'year': SMALLINT, 'station_key': INTEGER})"
+        )
+        stations = os.path.join(self.root, STATIONS_FILE_NAME)
+        if os.path.exists(stations):
+            connection.execute(f"CREATE VIEW stations AS SELECT * FROM read_parquet({_sql_literal(stations)})")
+        return connection, None
+
+    def cursor(self):
+        """
+        A cursor for the calling thread. The shared connection is reopened
+        when the database file is rebuilt or the export is refreshed.
+        """
+        if duckdb is None:
+            return None
+        database_mtime = os.path.getmtime(self.database_path) if os.path.exists(self.database_path) else None
+        opened_for = (database_mtime, super().exported_version())
+        if database_mtime is None and opened_for[1] is None:
+            return None
+        with self._lock:
+            if self._opened != opened_for:
+                if self._connection is not None:
+                    self._connection.close()
+                self._connection, self._database_version = self._open_connection()
+                self._opened = opened_for
+                self._generation += 1
+                logger.info(f"Opened DuckDB ({'file ' + self.database_path if database_mtime else 'Parquet views'})")
+            if getattr(self._local, 'generation', None) != self._generation:
+                self._local.cursor = self._connection.cursor()
+                self._local.generation = self._generation
+            return self._local.cursor
+
+    def exported_version(self):
+        if self.cursor() is None:
+            return None
+        return self._database_version if self._database_version is not None else super().exported_version()
+
+    def _query(self, sql, params=None):
+        cursor = self.cursor()
+        df = cursor.execute(sql, params or []).df()
+        if 'count_date' in df.columns:
+            df['count_date'] = pd.to_datetime(df['count_date']).dt.date  # PostgreSQL returns datetime.date objects
+        return df
+
+    @staticmethod
+    def _hourly_conditions(station_keys, start_date, end_date, directions=None):
+        """WHERE clause shared by the hourly readers; year bounds let DuckDB prune partitions."""
+        start, end = _to_date(start_date), _to_date(end_date)
+        keys = ', '.join(str(int(key)) for key in set(station_keys))
+        where = (f"station_key IN ({keys}) AND year BETWEEN {start.year} AND {end.year} "
+                 "AND count_date >= ? AND count_date <= ?")
+        if directions and 3 not in directions:
+            where += f" AND traffic_direction_seq IN ({', '.join(str(int(d)) for d in directions)})"
+        return where, [start, end]
+
+    @staticmethod
+    def _day_conditions(classification_seq=None, day_type=None, exclude_holidays=True):
+        """The rest of db_utils._station_day_filters, appended to an _hourly_conditions clause."""
+        from app.db_utils import WEEKEND_DAYS
+
+        where = ""
+        if exclude_holidays:
+            where += " AND is_public_holiday IS false"
+        if classification_seq is not None:
+            where += f" AND classification_seq = {int(classification_seq)}"
+        weekend = ', '.join(str(day) for day in WEEKEND_DAYS)
+        if day_type == 'Weekday':
+            where += f" AND day_of_week NOT IN ({weekend})"
+        elif day_type == 'Weekend':
+            where += f" AND day_of_week IN ({weekend})"
+        return where
+
+    def read_hourly(self, _session, station_keys, start_date, end_date, directions=None, columns=None):
+        if duckdb is None or not station_keys or not self.is_current(_session, station_keys, start_date, end_date):
+            return None
+        columns = list(dict.fromkeys(columns)) if columns else HOURLY_COLUMN_NAMES
+        where, params = self._hourly_conditions(station_keys, start_date, end_date, directions)
+        return self._query(f"SELECT {', '.join(columns)} FROM hourly_counts WHERE {where}", params)
+
+    def read_station_metadata(self, _session):
+        if duckdb is None or not self.is_current(_session):
+            return None
+        try:
+            return self._query("SELECT * FROM stations")
+        except duckdb.CatalogException:
+            return None  # Export predates the stations file
+
+    def read_hourly_profile_rows(self, _session, station_keys, start_date, end_date, directions=None,
+                                 classification_seq=None, by_station=False):
+        if duckdb is None or not station_keys or not self.is_current(_session, station_keys, start_date, end_date):
+            return None
+        where, params = self._hourly_conditions(station_keys, start_date, end_date, directions)
+        where += " AND is_public_holiday IS false"
+        if classification_seq is not None:
+            where += f" AND classification_seq = {int(classification_seq)}"
+        group_cols = ['station_key', 'period'] if by_station else ['period']
+        sql = (
+            f"SELECT {'station_key, ' if by_station else ''}"
+            "CASE WHEN day_of_week IN (6, 7) THEN 'Weekend' ELSE 'Weekday' END AS period, "
+            + ', '.join(f"AVG({col}) AS {col}" for col in HOUR_COLUMNS)
+            + f" FROM hourly_counts WHERE {where} GROUP BY {', '.join(group_cols)}"
+        )
+        return self._query(sql, params)
+
+    def read_station_days(self, _session, station_keys, start_date, end_date, directions=None,
+                          classification_seq=None, day_type=None, exclude_holidays=True, value_columns=None,
+                          by_class=False):
+        if duckdb is None or not station_keys or not self.is_current(_session, station_keys, start_date, end_date):
+            return None
+        where, params = self._hourly_conditions(station_keys, start_date, end_date, directions)
+        where += self._day_conditions(classification_seq, day_type, exclude_holidays)
+        group_cols = ['station_key', 'count_date'] + (['classification_seq'] if by_class else [])
+        # PostgreSQL's SUM of an integer column is a bigint; DuckDB's would be a HUGEINT
+        sql = (
+            f"SELECT {', '.join(group_cols)}, "
+            + ', '.join(f"CAST(SUM({col}) AS BIGINT) AS {col}" for col in value_columns or HOUR_COLUMNS)
+            + f" FROM hourly_counts WHERE {where} GROUP BY {', '.join(group_cols)}"
+        )
+        return self._query(sql, params)
+
+    def read_heavy_vehicle_pivot(self, _session, station_keys, start_date, end_date, directions=None,
+                                 day_type='Weekday'):
+        if duckdb is None or not station_keys or not self.is_current(_session, station_keys, start_date, end_date):
+            return None
+        where, params = self._hourly_conditions(station_keys, start_date, end_date, directions)
+        where += self._day_conditions(None, day_type)
+        where += f" AND classification_seq IN ({', '.join(str(int(seq)) for seq in HV_CLASSES)})"
+        columns = []
+        for seq in HV_CLASSES:
+            is_class = f"FILTER (WHERE classification_seq = {int(seq)})"
+            columns.append(f"COUNT(DISTINCT count_date) {is_class} AS {pivot_column(seq, 'days')}")
+            columns.extend(f"CAST(SUM({col}) {is_class} AS BIGINT) AS {pivot_column(seq, col)}"
+                           for col in HV_VALUE_COLUMNS)
+        sql = (f"SELECT station_key, {', '.join(columns)} FROM hourly_counts WHERE {where} "
+               "GROUP BY station_key ORDER BY station_key")
+        return self._query(sql, params)
+
+
+def get_local_source() -> Optional[LocalDataSource]:
+    """
+    The configured local data source, or None when reads should go straight
+    to PostgreSQL. The source object is reused while the settings stay the same.
+    """
+    settings = get_data_source_settings()
+    with _source_lock:
+        if settings == _source_state['settings']:
+            return _source_state['source']
+        source = None
+        backend = settings['backend']
+        if backend == 'parquet':
+            if ds is None:
+                logger.warning("Parquet data source requested but pyarrow is not installed; using PostgreSQL")
+            else:
+                source = ParquetHourlySource(settings['parquet_dir'])
+        elif backend == 'duckdb':
+            if duckdb is None:
+                logger.warning("DuckDB data source requested but duckdb is not installed; using PostgreSQL")
+            else:
+                source = DuckDBSource(settings['parquet_dir'], settings['duckdb_path'])
+        elif backend != 'postgres':
+            logger.warning(f"Unknown data source {backend!r}; using PostgreSQL")
+        _source_state.update(settings=settings, source=source)
+        logger.info(f"Data source: {source.name if source else 'postgres'}")
+        return source
@@ -4,26 +4,83 @@ import logging
 import pandas as pd
 import sqlalchemy
 import datetime
-from sqlalchemy import create_engine, select, func, distinct, text, and_, or_, true, false, update
+from sqlalchemy import create_engine, select, func, distinct, text, and_, or_, true, false, update, case
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import contextmanager
 import os
+import atexit
+import threading
 from typing import List, Optional, Tuple, Dict, Any, Union
-from app.models import Base, Station, HourlyCount
+from app.models import Base, Station, HourlyCount, StationYearMetric, StationProfileHourly
+from app.query_cache import cached_query, skip_cache, get_dataset_version, per_dataset_version
+from app.data_sources import get_local_source
+from app.geo_index import StationGeoIndex, GEO_RESULT_COLUMNS, line_wkt, polygon_wkt, degree_margin
+from app.peak_metrics import DEFAULT_PEAK_WINDOWS, window_sum_expression, station_peak_summary
+from app.hv_metrics import CLASS_PREFIXES as HV_CLASSES, VALUE_COLUMNS as HV_VALUE_COLUMNS, pivot_column, class_pivot
 
 logger = logging.getLogger(__name__)
 
-def get_engine():
+# Connection pool defaults; override any of them in st.secrets["database"]
+DEFAULT_POOL_SETTINGS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_recycle': 300,  # Seconds; recycle before Neon drops idle connections
+    'pool_timeout': 30,
+}
+DEFAULT_STATEMENT_TIMEOUT_MS = 30000  # Applied to the app's shared engine only; 0 disables
+
+# Process-wide engine and session factory, created once by init_db_resources
+_engine = None
+_session_factory = None
+_resources_lock = threading.Lock()
+
+def _database_secrets() -> Dict[str, Any]:
+    """Returns the optional [database] section of st.secrets (empty if absent)."""
+    try:
+        return st.secrets["database"] if "database" in st.secrets else {}
+    except Exception as e:
+        logger.debug(f"No database settings in secrets: {e}")
+        return {}
+
+def get_pool_settings() -> Dict[str, int]:
+    """Pool options for create_engine: DEFAULT_POOL_SETTINGS overridden by st.secrets["database"]."""
+    settings = dict(DEFAULT_POOL_SETTINGS)
+    overrides = _database_secrets()
+    for key in settings:
+        if key in overrides:
+            try:
+                settings[key] = int(overrides[key])
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring invalid database setting {key}={overrides[key]!r}")
+    return settings
+
+def get_statement_timeout() -> int:
+    """Statement timeout in milliseconds from st.secrets["database"]["statement_timeout_ms"]."""
+    value = _database_secrets().get("statement_timeout_ms", DEFAULT_STATEMENT_TIMEOUT_MS)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid statement_timeout_ms={value!r}")
+        return DEFAULT_STATEMENT_TIMEOUT_MS
+
+def get_engine(statement_timeout_ms: Optional[int] = None):
     """
     Creates and returns a SQLAlchemy engine.
     Reads configuration from Streamlit secrets.
     Returns None if configuration is missing or connection fails.
+
+    Pool options come from `get_pool_settings`. `statement_timeout_ms` is only
+    set when given, so maintenance scripts keep running long statements.
+    The app should use `init_db_resources`, which caches a single engine.
     """
     try:
         if "environment" in st.secrets and "DATABASE_URL" in st.secrets["environment"]:
             db_url = st.secrets["environment"]["DATABASE_URL"]
-            engine = create_engine(db_url, pool_pre_ping=True)
+            engine_kwargs = get_pool_settings()
+            if statement_timeout_ms:
+                engine_kwargs['connect_args'] = {'options': f"-c statement_timeout={int(statement_timeout_ms)}"}
+            engine = create_engine(db_url, pool_pre_ping=True, **engine_kwargs)
             logger.debug("Database engine created successfully")
             return engine
         else:
@@ -53,27 +110,54 @@ def create_session_factory(db_engine):
 
 # Initializes and returns the engine and session factory with stale connection handling
 def init_db_resources() -> Tuple[Optional[Any], Optional[Any]]:
-    """Initializes and returns the engine and session factory."""
-    logger.debug("Initializing database resources")
-    engine = get_engine()
-    session_factory = create_session_factory(engine)
-    # Short-circuit on failure
-    if engine is None or session_factory is None:
-        logger.error("Failed to initialize one or more DB resources.")
-        return None, None
-    # Check for stale connection and retry once
-    try:
-        with engine.connect():
-            pass
-    except Exception as e:
-        logger.warning(f"Stale DB connection detected: {e}")
-        # Reinitialize resources
-        engine = get_engine()
+    """
+    Returns the process-wide engine and session factory, creating them on
+    first use. Later calls reuse the same pool; pool_pre_ping replaces the
+    per-call test connection. Failures are not cached, so the next call retries.
+    """
+    global _engine, _session_factory
+    if _session_factory is not None:
+        return _engine, _session_factory
+
+    with _resources_lock:
+        if _session_factory is not None:
+            return _engine, _session_factory
+
+        logger.debug("Initializing database resources")
+        statement_timeout_ms = get_statement_timeout()
+        engine = get_engine(statement_timeout_ms=statement_timeout_ms)
         session_factory = create_session_factory(engine)
+        # Short-circuit on failure
         if engine is None or session_factory is None:
-            logger.error("Failed to initialize one or more DB resources after retry.")
+            logger.error("Failed to initialize one or more DB resources.")
             return None, None
-    return engine, session_factory
+        # Check for stale connection and retry once
+        try:
+            with engine.connect():
+                pass
+        except Exception as e:
+            logger.warning(f"Stale DB connection detected: {e}")
+            engine.dispose()
+            # Reinitialize resources
+            engine = get_engine(statement_timeout_ms=statement_timeout_ms)
+            session_factory = create_session_factory(engine)
+            if engine is None or session_factory is None:
+                logger.error("Failed to initialize one or more DB resources after retry.")
+                return None, None
+
+        _engine, _session_factory = engine, session_factory
+        return _engine, _session_factory
+
+def dispose_db_resources():
+    """Closes every pooled connection and forgets the cached engine (registered with atexit)."""
+    global _engine, _session_factory
+    with _resources_lock:
+        if _engine is not None:
+            _engine.dispose()
+            logger.debug("Database engine disposed")
+        _engine, _session_factory = None, None
+
+atexit.register(dispose_db_resources)
 
 def get_db_session():
     """Gets a new database session using the initialized SessionFactory."""
@@ -89,25 +173,56 @@ def get_db_session():
         logger.error("Session Factory not available, cannot create session.")
         return None
 
-@st.cache_data
+def get_maintenance_session():
+    """
+    A session on its own engine created without the app's statement
+    timeout, for dbtools scripts: merges, constraint changes and summary
+    refreshes over the whole dataset run far longer than an app query.
+    Returns None if the engine cannot be created.
+    """
+    session_factory = create_session_factory(get_engine())
+    if session_factory is None:
+        logger.error("Session Factory not available, cannot create maintenance session.")
+        return None
+    return session_factory()
+
+def _read_local(source, method: str, _session, *args):
+    """
+    Calls `method` on the configured local data source (app/data_sources.py).
+    Returns None, so the caller queries PostgreSQL, when no source is
+    configured, it cannot serve the request, or it fails.
+    """
+    if source is None:
+        return None
+    try:
+        return getattr(source, method)(_session, *args)
+    except Exception as e:
+        logger.warning(f"{source.name} source failed in {method}, reading from PostgreSQL instead: {e}")
+        return None
+
+@cached_query()
 def get_all_station_metadata(_session: Optional[Session]) -> Optional[pd.DataFrame]:
     """Fetches all station metadata from the database."""
     if _session is None:
         logger.error("Database session is None in get_all_station_metadata.")
         return None
     try:
+        df = _read_local(get_local_source(), 'read_station_metadata', _session)
+        if df is not None:
+            return df
         query = _session.query(Station)
         df = pd.read_sql(query.statement, _session.bind)
         logger.debug(f"Retrieved {len(df)} station metadata records")
         return df
     except Exception as e:
+        skip_cache()
         logger.error(f"Error fetching all station metadata: {e}", exc_info=True)
         st.error("Failed to load station metadata from database.")
         return None
 
-@st.cache_data
+@cached_query()
 def get_station_details(_session, station_key: int):
-    """Fetches details for a specific station."""
+    """Fetches details for a specific station as a plain dict of column values (geometry excluded)."""
     if _session is None:
         logger.error("Database session is None in get_station_details.")
         return None
@@ -115,16 +230,18 @@ def get_station_details(_session, station_key: int):
         station = _session.query(Station).filter(Station.station_key == station_key).first()
         if station:
             logger.debug(f"Retrieved details for station_key: {station_key}")
-            return station
+            return {c.name: getattr(station, c.name) for c in Station.__table__.columns
+                    if c.name != 'location_geom'}
         else:
             logger.warning(f"No station found with key: {station_key}")
             return None
     except Exception as e:
+        skip_cache()
         logger.error(f"Error fetching station details for key {station_key}: {e}", exc_info=True)
         st.error(f"Failed to load details for station {station_key}.")
         return None
 
-@st.cache_data
+@cached_query(stations='station_key')
 def get_latest_data_date(_session, station_key: int, direction: int):
     """Fetches the latest data timestamp for a given station and direction."""
     if _session is None:
@@ -138,18 +255,74 @@ def get_latest_data_date(_session, station_key: int, direction: int):
         logger.debug(f"Latest data date for station {station_key}, direction {direction}: {latest_date}")
         return latest_date
     except Exception as e:
+        skip_cache()
         logger.error(f"Error fetching latest data date for station {station_key}: {e}", exc_info=True)
         st.error("Failed to determine latest data date.")
         return None
 
-@st.cache_data
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+
+# Smallest dtype that safely holds each hourly_counts column. Hourly and daily
+# volumes stay well below 2**31; count_id is left as int64.
+HOURLY_COMPACT_DTYPES = {
+    'station_key': 'int32',
+    'traffic_direction_seq': 'int8',
+    'cardinal_direction_seq': 'int8',
+    'classification_seq': 'int8',
+    'year': 'int16',
+    'month': 'int8',
+    'day_of_week': 'int8',
+    'daily_total': 'int32',
+    'hours_counted': 'int8',
+    'is_public_holiday': 'bool',
+    'is_school_holiday': 'bool',
+    **{col: 'int32' for col in HOUR_COLUMNS},
+}
+
+def compact_hourly_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcasts hourly_counts columns to the dtypes in HOURLY_COMPACT_DTYPES.
+    Columns containing NULLs use the matching pandas nullable dtype (Int32, boolean, ...).
+    """
+    for col, dtype in HOURLY_COMPACT_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if df[col].isna().any():
+            dtype = 'boolean' if dtype == 'bool' else dtype.capitalize()
+        df[col] = df[col].astype(dtype)
+    return df
+
+@cached_query(stations='station_keys', dates=('start_date', 'end_date'))
 def get_hourly_data_for_stations(_session, station_keys: list, start_date, end_date, directions: list = None, required_cols: list = None):
-    """Fetches hourly count data for a list of stations and date range."""
+    """
+    Fetches hourly count data for a list of stations and date range.
+
+    Only the columns in `required_cols` are selected (all columns when None),
+    and the result is downcast with `compact_hourly_dtypes`. When a local
+    data source is configured (see app/data_sources.py) and current for the
+    request, it is served from there instead of PostgreSQL.
+    """
     if _session is None:
         logger.error("Database session is None in get_hourly_data_for_stations.")
         return None
+
+    if required_cols:
+        invalid_cols = [col for col in required_cols if col not in HourlyCount.__table__.columns]
+        if invalid_cols:
+            logger.error(f"Invalid column names {invalid_cols} requested from '{HourlyCount.__tablename__}'.")
+            st.error(f"Invalid columns specified: {', '.join(invalid_cols)}")
+            return None
+        entities = [getattr(HourlyCount, col) for col in dict.fromkeys(required_cols)]
+    else:
+        entities = [HourlyCount]
+
     try:
-        query = _session.query(HourlyCount).filter(
+        df = _read_local(get_local_source(), 'read_hourly', _session, station_keys, start_date, end_date,
+                         directions, required_cols)
+        if df is not None:
+            return compact_hourly_dtypes(df)
+
+        query = _session.query(*entities).filter(
             HourlyCount.station_key.in_(station_keys),
             HourlyCount.count_date >= start_date,
             HourlyCount.count_date <= end_date
@@ -157,15 +330,405 @@ def get_hourly_data_for_stations(_session, station_keys: list, start_date, end_d
         if directions and 3 not in directions:
             query = query.filter(HourlyCount.traffic_direction_seq.in_(directions))
 
-        df = pd.read_sql(query.statement, _session.bind)
-        logger.debug(f"Retrieved {len(df)} hourly records")
+        df = compact_hourly_dtypes(pd.read_sql(query.statement, _session.bind))
+        logger.debug(f"Retrieved {len(df)} hourly records ({df.memory_usage(deep=True).sum() / 1e6:.1f} MB)")
         return df
     except Exception as e:
+        skip_cache()
         logger.error(f"Error fetching hourly data: {e}", exc_info=True)
         st.error("Failed to load hourly traffic data.")
         return pd.DataFrame()
 
-@st.cache_data
+@cached_query(stations='station_keys', dates=('start_date', 'end_date'))
+def get_hourly_profile(_session, station_keys: list, start_date, end_date, directions: list = None,
+                       classification_seq: int = None, by_station: bool = False):
+    """
+    Average hourly profile (Weekday/Weekend, public holidays excluded) computed
+    in PostgreSQL with AVG(hour_00..hour_23), so only the 24 averages per
+    group leave the database.
+
+    Returns:
+        DataFrame indexed by hour (0-23) with one column per period
+        ('Weekday', 'Weekend'), or per (station_key, period) when `by_station`
+        is set. Empty if no rows match; None if the session is missing.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_hourly_profile.")
+        return None
+    try:
+        period = case((HourlyCount.day_of_week.in_([6, 7]), 'Weekend'), else_='Weekday').label('period')
+        group_cols = [HourlyCount.station_key, period] if by_station else [period]
+        query = select(
+            *group_cols,
+            *[func.avg(getattr(HourlyCount, col)).label(col) for col in HOUR_COLUMNS]
+        ).where(
+            HourlyCount.station_key.in_(station_keys),
+            HourlyCount.count_date >= start_date,
+            HourlyCount.count_date <= end_date,
+            HourlyCount.is_public_holiday.is_(False)
+        ).group_by(*group_cols)
+        if directions and 3 not in directions:
+            query = query.where(HourlyCount.traffic_direction_seq.in_(directions))
+        if classification_seq is not None:
+            query = query.where(HourlyCount.classification_seq == classification_seq)
+
+        rows = _read_local(get_local_source(), 'read_hourly_profile_rows', _session, station_keys,
+                           start_date, end_date, directions, classification_seq, by_station)
+        if rows is None:
+            rows = pd.read_sql(query, _session.bind)
+        index_cols = ['station_key', 'period'] if by_station else ['period']
+        profile = rows.set_index(index_cols)[HOUR_COLUMNS].astype(float).T.sort_index(axis=1)
+        profile.index = pd.RangeIndex(24, name='hour')
+        logger.debug(f"Retrieved hourly profile with {profile.shape[1]} series for {len(station_keys)} stations")
+        return profile
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error fetching hourly profile: {e}", exc_info=True)
+        st.error("Failed to load hourly traffic profile.")
+        return pd.DataFrame()
+
+WEEKEND_DAYS = (6, 7)  # day_of_week values for Saturday and Sunday
+
+def _station_day_filters(station_keys, start_date, end_date, directions, classification_seq,
+                         day_type=None, exclude_holidays=True):
+    """WHERE conditions shared by the station-day readers. `day_type` is None, 'Weekday' or 'Weekend'."""
+    conditions = [
+        HourlyCount.station_key.in_(station_keys),
+        HourlyCount.count_date >= start_date,
+        HourlyCount.count_date <= end_date,
+    ]
+    if exclude_holidays:
+        conditions.append(HourlyCount.is_public_holiday.is_(False))
+    if directions and 3 not in directions:
+        conditions.append(HourlyCount.traffic_direction_seq.in_(directions))
+    if classification_seq is not None:
+        conditions.append(HourlyCount.classification_seq == classification_seq)
+    if day_type == 'Weekday':
+        conditions.append(HourlyCount.day_of_week.notin_(WEEKEND_DAYS))
+    elif day_type == 'Weekend':
+        conditions.append(HourlyCount.day_of_week.in_(WEEKEND_DAYS))
+    return conditions
+
+def _local_station_days(_session, station_keys, start_date, end_date, directions, classification_seq,
+                        day_type=None, exclude_holidays=True, value_columns=HOUR_COLUMNS, by_class=False):
+    """
+    `value_columns` summed per station-day (directions added together) from
+    the local data source, or None to use PostgreSQL. With `by_class` the
+    rows are kept apart per classification_seq. A source that can aggregate
+    (DuckDB) runs the group-by itself; otherwise the hourly rows it returns
+    (Parquet) are grouped here.
+    """
+    source = get_local_source()
+    station_days = _read_local(source, 'read_station_days', _session, station_keys, start_date, end_date,
+                               directions, classification_seq, day_type, exclude_holidays, list(value_columns),
+                               by_class)
+    if station_days is not None:
+        return station_days
+    columns = ['station_key', 'count_date', 'classification_seq', 'day_of_week', 'is_public_holiday'] + list(value_columns)
+    rows = _read_local(source, 'read_hourly', _session, station_keys, start_date, end_date, directions, columns)
+    if rows is None:
+        return None
+    keep = pd.Series(True, index=rows.index)
+    if exclude_holidays:
+        keep &= ~rows['is_public_holiday'].astype(bool)
+    if classification_seq is not None:
+        keep &= rows['classification_seq'] == classification_seq
+    if day_type == 'Weekday':
+        keep &= ~rows['day_of_week'].isin(WEEKEND_DAYS)
+    elif day_type == 'Weekend':
+        keep &= rows['day_of_week'].isin(WEEKEND_DAYS)
+    group_cols = ['station_key', 'count_date'] + (['classification_seq'] if by_class else [])
+    # min_count=1 keeps a value NULL, as SQL SUM does, when every direction is missing it
+    return rows[keep].groupby(group_cols, as_index=False)[list(value_columns)].sum(min_count=1)
+
+@cached_query(stations='station_keys', dates=('start_date', 'end_date'))
+def get_station_day_hours(_session, station_keys: list, start_date, end_date, directions: list = None,
+                          classification_seq: int = 1, weekdays_only: bool = True):
+    """
+    Hourly volumes per station-day with the selected directions summed, for
+    the vectorised peak metrics in app/peak_metrics.py. Public holidays are
+    excluded, and weekends too when `weekdays_only` is set.
+
+    Returns:
+        DataFrame [station_key, count_date, hour_00..hour_23].
+    """
+    if _session is None:
+        logger.error("Database session is None in get_station_day_hours.")
+        return None
+    try:
+        day_type = 'Weekday' if weekdays_only else None
+        df = _local_station_days(_session, station_keys, start_date, end_date, directions,
+                                 classification_seq, day_type)
+        if df is None:
+            query = select(
+                HourlyCount.station_key,
+                HourlyCount.count_date,
+                *[func.sum(getattr(HourlyCount, col)).label(col) for col in HOUR_COLUMNS]
+            ).where(
+                *_station_day_filters(station_keys, start_date, end_date, directions, classification_seq, day_type)
+            ).group_by(HourlyCount.station_key, HourlyCount.count_date)
+            df = pd.read_sql(query, _session.bind)
+        logger.debug(f"Retrieved {len(df)} station-days of hourly volumes for {len(station_keys)} stations")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error fetching station-day hourly volumes: {e}", exc_info=True)
+        st.error("Failed to load hourly traffic volumes.")
+        return pd.DataFrame()
+
+@cached_query(stations='station_keys', dates=('start_date', 'end_date'))
+def get_peak_volumes(_session, station_keys: list, start_date, end_date, directions: list = None,
+                     windows: dict = None, classification_seq: int = 1, weekdays_only: bool = True):
+    """
+    Average peak-period volume per station: each station-day's volume summed
+    over every window in `windows` ({name: (first_hour, last_hour)}, default
+    AM 06-09 and PM 15-18), averaged over days. PostgreSQL computes the sums
+    as hour_06 + ... + hour_09 expressions, so one row per station is
+    returned; a local data source is reduced with the same NumPy code as
+    the true peak mode.
+
+    Returns:
+        DataFrame [station_key, <window names>..., days].
+    """
+    if _session is None:
+        logger.error("Database session is None in get_peak_volumes.")
+        return None
+    windows = windows or DEFAULT_PEAK_WINDOWS
+    try:
+        day_type = 'Weekday' if weekdays_only else None
+        station_days = _local_station_days(_session, station_keys, start_date, end_date, directions,
+                                           classification_seq, day_type)
+        if station_days is not None:
+            return station_peak_summary(station_days, windows).reset_index()
+
+        daily = select(
+            HourlyCount.station_key,
+            HourlyCount.count_date,
+            *[func.sum(window_sum_expression(HourlyCount, window)).label(name) for name, window in windows.items()]
+        ).where(
+            *_station_day_filters(station_keys, start_date, end_date, directions, classification_seq, day_type)
+        ).group_by(HourlyCount.station_key, HourlyCount.count_date).subquery()
+        query = select(
+            daily.c.station_key,
+            *[func.avg(daily.c[name]).label(name) for name in windows],
+            func.count().label('days')
+        ).group_by(daily.c.station_key).order_by(daily.c.station_key)
+
+        df = pd.read_sql(query, _session.bind)
+        logger.debug(f"Retrieved peak volumes for {len(df)} stations")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error fetching peak volumes: {e}", exc_info=True)
+        st.error("Failed to load peak period volumes.")
+        return pd.DataFrame()
+
+@cached_query(stations='station_keys', dates=('start_date', 'end_date'))
+def get_corridor_profiles(_session, station_keys: list, start_date, end_date, directions: list = None,
+                          day_type: str = None, classification_seq: int = 1):
+    """
+    Average hourly profile and average daily total for every station in
+    `station_keys` in one grouped statement: rows are summed per station-day
+    (so both directions add up) and then averaged per station. Public
+    holidays are excluded; `day_type` limits to 'Weekday' or 'Weekend' days.
+
+    Returns:
+        DataFrame [station_key, hour_00..hour_23, daily_total, days], one row per station with data.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_corridor_profiles.")
+        return None
+    value_columns = HOUR_COLUMNS + ['daily_total']
+    try:
+        station_days = _local_station_days(_session, station_keys, start_date, end_date, directions,
+                                           classification_seq, day_type, value_columns=value_columns)
+        if station_days is not None:
+            grouped = station_days.groupby('station_key')
+            df = grouped[value_columns].mean()
+            df['days'] = grouped.size()
+            return df.reset_index()
+
+        daily = select(
+            HourlyCount.station_key,
+            HourlyCount.count_date,
+            *[func.sum(getattr(HourlyCount, col)).label(col) for col in value_columns]
+        ).where(
+            *_station_day_filters(station_keys, start_date, end_date, directions, classification_seq, day_type)
+        ).group_by(HourlyCount.station_key, HourlyCount.count_date).subquery()
+        query = select(
+            daily.c.station_key,
+            *[func.avg(daily.c[col]).label(col) for col in value_columns],
+            func.count().label('days')
+        ).group_by(daily.c.station_key).order_by(daily.c.station_key)
+
+        df = pd.read_sql(query, _session.bind)
+        logger.debug(f"Retrieved corridor profiles for {len(df)} of {len(station_keys)} stations")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error fetching corridor profiles: {e}", exc_info=True)
+        st.error("Failed to load corridor traffic profiles.")
+        return pd.DataFrame()
+
+@cached_query(stations='station_keys', dates=('start_date', 'end_date'))
+def get_heavy_vehicle_pivot(_session, station_keys: list, start_date, end_date, directions: list = None,
+                            day_type: str = 'Weekday'):
+    """
+    Heavy-vehicle and all-vehicle sums per station from one scan of
+    hourly_counts: each hour column and daily_total is summed once per class
+    with SUM(...) FILTER (WHERE classification_seq = ...), next to the count
+    of days each class was recorded, so the two class streams never need
+    joining. DuckDB runs the same pivot; rows from a Parquet source are
+    reduced with the NumPy scatter-add in app/hv_metrics.py. Public holidays
+    are excluded.
+
+    Returns:
+        DataFrame in the hv_metrics.pivot_columns() layout, one row per station with data.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_heavy_vehicle_pivot.")
+        return None
+    try:
+        pivot = _read_local(get_local_source(), 'read_heavy_vehicle_pivot', _session, station_keys,
+                            start_date, end_date, directions, day_type)
+        if pivot is not None:
+            return pivot
+        station_days = _local_station_days(_session, station_keys, start_date, end_date, directions, None,
+                                           day_type, value_columns=HV_VALUE_COLUMNS, by_class=True)
+        if station_days is not None:
+            return class_pivot(station_days)
+
+        columns = []
+        for seq in HV_CLASSES:
+            is_class = HourlyCount.classification_seq == seq
+            columns.append(func.count(distinct(HourlyCount.count_date)).filter(is_class).label(pivot_column(seq, 'days')))
+            columns.extend(func.sum(getattr(HourlyCount, col)).filter(is_class).label(pivot_column(seq, col))
+                           for col in HV_VALUE_COLUMNS)
+        query = select(HourlyCount.station_key, *columns).where(
+            *_station_day_filters(station_keys, start_date, end_date, directions, None, day_type),
+            HourlyCount.classification_seq.in_(list(HV_CLASSES))
+        ).group_by(HourlyCount.station_key).order_by(HourlyCount.station_key)
+
+        df = pd.read_sql(query, _session.bind)
+        logger.debug(f"Retrieved heavy vehicle sums for {len(df)} of {len(station_keys)} stations")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error fetching heavy vehicle volumes: {e}", exc_info=True)
+        st.error("Failed to load heavy vehicle volumes.")
+        return pd.DataFrame()
+
+@cached_query(stations='station_keys', years='years')
+def get_station_year_metrics(_session, station_keys: list, years: list = None, directions: list = None):
+    """
+    Fetches pre-aggregated AADT/AAWT/heavy-vehicle metrics per station, year
+    and direction from station_year_metrics (one row per station-year-direction).
+    """
+    if _session is None:
+        logger.error("Database session is None in get_station_year_metrics.")
+        return None
+    try:
+        query = _session.query(StationYearMetric).filter(StationYearMetric.station_key.in_(station_keys))
+        if years:
+            query = query.filter(StationYearMetric.year.in_(years))
+        if directions and 3 not in directions:
+            query = query.filter(StationYearMetric.traffic_direction_seq.in_(directions))
+        query = query.order_by(StationYearMetric.station_key, StationYearMetric.year,
+                               StationYearMetric.traffic_direction_seq)
+
+        df = pd.read_sql(query.statement, _session.bind)
+        logger.debug(f"Retrieved {len(df)} station-year metric rows")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error fetching station year metrics: {e}", exc_info=True)
+        st.error("Failed to load station summary metrics.")
+        return pd.DataFrame()
+
+@cached_query(stations='station_keys', years='year')
+def get_station_profile_hourly(_session, station_keys: list, year: int, directions: list = None, classification_seq: int = 1):
+    """
+    Fetches pre-aggregated weekday/weekend hourly profiles from
+    station_profile_hourly. Adds an `avg_volume` column (volume_sum / day_count).
+    """
+    if _session is None:
+        logger.error("Database session is None in get_station_profile_hourly.")
+        return None
+    try:
+        query = _session.query(StationProfileHourly).filter(
+            StationProfileHourly.station_key.in_(station_keys),
+            StationProfileHourly.year == year,
+            StationProfileHourly.classification_seq == classification_seq
+        )
+        if directions and 3 not in directions:
+            query = query.filter(StationProfileHourly.traffic_direction_seq.in_(directions))
+        query = query.order_by(StationProfileHourly.station_key, StationProfileHourly.traffic_direction_seq,
+                               StationProfileHourly.day_type, StationProfileHourly.hour)
+
+        df = pd.read_sql(query.statement, _session.bind)
+        df['avg_volume'] = df['volume_sum'] / df['day_count'].where(df['day_count'] > 0)
+        logger.debug(f"Retrieved {len(df)} hourly profile rows")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error fetching hourly profiles: {e}", exc_info=True)
+        st.error("Failed to load hourly profile data.")
+        return pd.DataFrame()
+
+def get_profile_hourly_rows(_session, year: int, station_keys: list = None):
+    """
+    Raw station_profile_hourly rows for one year (all stations, or only
+    `station_keys`), for building or patching the profile cube in
+    app/profile_cube.py. Not cached: the cube is the cache.
+
+    Returns:
+        DataFrame [station_key, traffic_direction_seq, classification_seq,
+        day_type, hour, volume_sum, day_count], or None on failure.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_profile_hourly_rows.")
+        return None
+    try:
+        query = select(
+            StationProfileHourly.station_key,
+            StationProfileHourly.traffic_direction_seq,
+            StationProfileHourly.classification_seq,
+            StationProfileHourly.day_type,
+            StationProfileHourly.hour,
+            StationProfileHourly.volume_sum,
+            StationProfileHourly.day_count
+        ).where(StationProfileHourly.year == year)
+        if station_keys is not None:
+            query = query.where(StationProfileHourly.station_key.in_(list(station_keys)))
+        df = pd.read_sql(query, _session.bind)
+        logger.debug(f"Retrieved {len(df)} profile rows for {year}")
+        return df
+    except Exception as e:
+        logger.error(f"Error fetching profile rows for {year}: {e}", exc_info=True)
+        return None
+
+def get_profile_hourly_checksum(_session, year: int) -> Optional[Tuple[int, int, int]]:
+    """
+    (row count, SUM(volume_sum), SUM(day_count)) of station_profile_hourly
+    for one year, compared with a profile cube's own totals to catch
+    summaries rewritten without a dataset version bump, or a cube file from
+    another database. None on failure.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_profile_hourly_checksum.")
+        return None
+    try:
+        query = select(
+            func.count(),
+            func.coalesce(func.sum(StationProfileHourly.volume_sum), 0),
+            func.coalesce(func.sum(StationProfileHourly.day_count), 0)
+        ).where(StationProfileHourly.year == year)
+        return tuple(int(value) for value in _session.execute(query).one())
+    except Exception as e:
+        logger.error(f"Error fetching profile checksum for {year}: {e}", exc_info=True)
+        return None
+
+@cached_query()
 def get_distinct_values(_session, column_name: str, table=Station):
     """
     Fetches distinct values from a specified column in a table.
@@ -187,10 +750,143 @@ def get_distinct_values(_session, column_name: str, table=Station):
         logger.debug(f"Retrieved {len(results)} distinct values for column '{column_name}'")
         return list(results)
     except Exception as e:
+        skip_cache()
         logger.error(f"Error fetching distinct values for column '{column_name}': {e}", exc_info=True)
         st.error(f"Failed to load distinct values for column '{column_name}'.")
         return None
 
+# --- Spatial station queries (PostGIS on stations.location_geom) ---
+
+KNN_OVERSAMPLE = 4  # <-> orders by planar degrees; fetch k * this many and re-rank by metres
+
+@per_dataset_version
+def get_station_geo_index(_session, version: int = 0) -> Optional[StationGeoIndex]:
+    """In-process spatial index over station coordinates, rebuilt when the dataset version changes."""
+    station_df = get_all_station_metadata(_session)
+    if station_df is None:
+        return None
+    index = StationGeoIndex(station_df, version)
+    logger.debug(f"Built station geo index for {len(index)} stations at version {version}")
+    return index
+
+def _query_stations_geo(_session, query, method: str, *args) -> pd.DataFrame:
+    """
+    Runs a PostGIS station query. When a local data source is configured
+    (no PostGIS behind it) or the query fails, the same question is answered
+    by StationGeoIndex.`method`(*args) instead.
+    """
+    if get_local_source() is None:
+        try:
+            return pd.read_sql(query, _session.bind)
+        except Exception as e:
+            logger.warning(f"PostGIS station query failed, using the in-process geo index: {e}")
+    index = get_station_geo_index(_session)
+    if index is None:
+        raise RuntimeError("Station coordinates are unavailable")
+    return getattr(index, method)(*args)
+
+def _geo_columns(source=None):
+    """GEO_RESULT_COLUMNS from the stations table, or from a subquery over it."""
+    columns = source.c if source is not None else Station.__table__.c
+    return [columns[col] for col in GEO_RESULT_COLUMNS]
+
+@cached_query()
+def get_nearest_stations(_session, lat: float, lon: float, k: int = 10):
+    """
+    The `k` stations nearest to (lat, lon), nearest first, with a
+    `distance_m` column (metres on the spheroid). Uses the GiST index on
+    location_geom through the <-> KNN operator.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_nearest_stations.")
+        return None
+    try:
+        point = func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326)
+        candidates = select(*_geo_columns(), Station.location_geom).where(
+            Station.location_geom.isnot(None)
+        ).order_by(Station.location_geom.op('<->')(point)).limit(k * KNN_OVERSAMPLE).subquery()
+        distance = func.ST_Distance(func.geography(candidates.c.location_geom), func.geography(point)).label('distance_m')
+        query = select(*_geo_columns(candidates), distance).order_by(distance).limit(k)
+
+        df = _query_stations_geo(_session, query, 'nearest', lat, lon, k)
+        logger.debug(f"Found {len(df)} stations nearest to ({lat}, {lon})")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error finding stations near ({lat}, {lon}): {e}", exc_info=True)
+        st.error("Failed to find nearby stations.")
+        return pd.DataFrame()
+
+@cached_query()
+def get_stations_in_bbox(_session, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    """Stations inside a latitude/longitude box (e.g. the visible map area), ordered by station_key."""
+    if _session is None:
+        logger.error("Database session is None in get_stations_in_bbox.")
+        return None
+    try:
+        envelope = func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+        query = select(*_geo_columns()).where(
+            Station.location_geom.op('&&')(envelope)
+        ).order_by(Station.station_key)
+
+        df = _query_stations_geo(_session, query, 'in_bbox', min_lat, min_lon, max_lat, max_lon)
+        logger.debug(f"Found {len(df)} stations in bounding box")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error finding stations in bounding box: {e}", exc_info=True)
+        st.error("Failed to load stations for the map area.")
+        return pd.DataFrame()
+
+@cached_query()
+def get_stations_in_polygon(_session, coordinates: list):
+    """Stations inside a polygon given as (lon, lat) pairs, ordered by station_key."""
+    if _session is None:
+        logger.error("Database session is None in get_stations_in_polygon.")
+        return None
+    try:
+        polygon = func.ST_GeomFromText(polygon_wkt(coordinates), 4326)
+        query = select(*_geo_columns()).where(
+            func.ST_Intersects(Station.location_geom, polygon)
+        ).order_by(Station.station_key)
+
+        df = _query_stations_geo(_session, query, 'in_polygon', coordinates)
+        logger.debug(f"Found {len(df)} stations in polygon")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error finding stations in polygon: {e}", exc_info=True)
+        st.error("Failed to load stations for the selected area.")
+        return pd.DataFrame()
+
+@cached_query()
+def get_stations_near_line(_session, coordinates: list, distance_m: float):
+    """
+    Stations within `distance_m` metres of a road line given as (lon, lat)
+    pairs, nearest first, with a `distance_m` column. A bounding-box test
+    against the expanded line lets the GiST index prune before the exact
+    geography distance check.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_stations_near_line.")
+        return None
+    try:
+        line = func.ST_GeomFromText(line_wkt(coordinates), 4326)
+        distance = func.ST_Distance(func.geography(Station.location_geom), func.geography(line)).label('distance_m')
+        query = select(*_geo_columns(), distance).where(
+            Station.location_geom.op('&&')(func.ST_Expand(line, degree_margin(distance_m, coordinates))),
+            func.ST_DWithin(func.geography(Station.location_geom), func.geography(line), distance_m)
+        ).order_by(distance)
+
+        df = _query_stations_geo(_session, query, 'near_line', coordinates, distance_m)
+        logger.debug(f"Found {len(df)} stations within {distance_m}m of line")
+        return df
+    except Exception as e:
+        skip_cache()
+        logger.error(f"Error finding stations near line: {e}", exc_info=True)
+        st.error("Failed to find stations along the selected road.")
+        return pd.DataFrame()
+
 @contextmanager
 def session_scope():
     """Provide a transactional scope around a series of operations."""
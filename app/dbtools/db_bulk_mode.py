@@ -0,0 +1,212 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import text
+
+# --- CONFIGURABLE PARAMETERS ---
+BULK_TABLE = 'hourly_counts'  # Table whose secondary indexes are dropped for a bulk load
+SNAPSHOT_DIR = os.path.join("app", "logs")  # Index definitions are kept here until they are rebuilt
+REBUILD_WORKERS = 4  # Indexes rebuilt at the same time, each on its own connection
+MAINTENANCE_WORK_MEM = '1GB'  # Per rebuild connection; sorts for CREATE INDEX stay in memory
+MAX_PARALLEL_MAINTENANCE_WORKERS = 4  # Parallel workers PostgreSQL may use for each CREATE INDEX
+# -----------------------------
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+def snapshot_path(table_name=BULK_TABLE):
+    return os.path.join(SNAPSHOT_DIR, f"index_snapshot_{table_name}.json")
+
+def snapshot_secondary_indexes(engine, table_name=BULK_TABLE):
+    """
+    Reads the definitions of `table_name`'s secondary indexes from pg_indexes.
+    Indexes backing a constraint (the primary key and the natural-key unique
+    constraint that upserts rely on) are left out and never dropped.
+
+    Returns:
+        List of {'name', 'definition'} dicts.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(text("""
+            SELECT i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.tablename = :table_name AND i.schemaname = current_schema()
+              AND i.indexname NOT IN (
+                  SELECT c.relname FROM pg_constraint con
+                  JOIN pg_class c ON c.oid = con.conindid
+                  WHERE con.conrelid = CAST(:table_name AS regclass)
+              )
+            ORDER BY i.indexname
+        """), {'table_name': table_name}).all()
+    return [{'name': name, 'definition': definition} for name, definition in rows]
+
+def save_snapshot(table_name, indexes):
+    """Writes the snapshot atomically (temporary file + rename) so a crash never leaves half a file."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(table_name)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as outfile:
+        json.dump({'table': table_name, 'created_at': datetime.datetime.now().isoformat(),
+                   'indexes': indexes}, outfile, indent=4)
+    os.replace(temporary_path, path)
+    logger.info(f"Saved {len(indexes)} index definitions to {path}")
+
+def load_snapshot(table_name=BULK_TABLE):
+    """Returns the saved index definitions, or None if no bulk load is pending."""
+    path = snapshot_path(table_name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as infile:
+        return json.load(infile)['indexes']
+
+def rebuild_statement(definition):
+    """
+    Makes a pg_indexes definition safe to re-run. pg_indexes shows a
+    partitioned table's indexes as `ON ONLY`, which would not build the
+    partitions' indexes, so ONLY is removed.
+    """
+    statement = re.sub(r'^CREATE (UNIQUE )?INDEX ', r'CREATE \1INDEX IF NOT EXISTS ', definition)
+    return statement.replace(' ON ONLY ', ' ON ', 1)
+
+def drop_secondary_indexes(engine, indexes):
+    """Drops the snapshotted indexes in one transaction."""
+    with engine.begin() as connection:
+        for index in indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    logger.info(f"Dropped {len(indexes)} secondary indexes for bulk load")
+
+def _build_index(engine, index):
+    """
+    Builds one index on its own connection with raised maintenance settings.
+    They are SET LOCAL, so they end with the transaction (committed or rolled
+    back) and the pooled connection keeps its own statement_timeout.
+    """
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        connection.execute(text("SET LOCAL statement_timeout = 0"))
+        connection.execute(text(f"SET LOCAL maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'"))
+        connection.execute(text(f"SET LOCAL max_parallel_maintenance_workers = {int(MAX_PARALLEL_MAINTENANCE_WORKERS)}"))
+        connection.execute(text(rebuild_statement(index['definition'])))
+        connection.commit()
+    return time.perf_counter() - started
+
+def rebuild_indexes(engine, indexes, workers=REBUILD_WORKERS):
+    """
+    Rebuilds indexes in parallel. Every index is attempted; if any fail, a
+    RuntimeError naming them is raised after the others finish.
+    """
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(_build_index, engine, index): index['name'] for index in indexes}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                logger.info(f"Rebuilt index {name} in {future.result():.1f}s")
+            except Exception as e:
+                logger.error(f"Failed to rebuild index {name}: {e}")
+                failed.append(name)
+    if failed:
+        raise RuntimeError(f"Failed to rebuild indexes: {', '.join(sorted(failed))}")
+
+def restore_indexes(engine, table_name=BULK_TABLE, workers=REBUILD_WORKERS):
+    """
+    Rebuilds every index in the saved snapshot, runs ANALYZE and removes the
+    snapshot. The snapshot is kept if a rebuild fails, so the restore can be
+    retried. Returns the number of indexes restored (0 if none were pending).
+    """
+    indexes = load_snapshot(table_name)
+    if indexes is None:
+        return 0
+    started = time.perf_counter()
+    rebuild_indexes(engine, indexes, workers)
+    with engine.connect() as connection:
+        connection.execute(text("SET LOCAL statement_timeout = 0"))
+        connection.execute(text(f"ANALYZE {table_name}"))
+        connection.commit()
+    os.remove(snapshot_path(table_name))
+    logger.info(f"Restored {len(indexes)} indexes on {table_name} and analyzed it in {time.perf_counter() - started:.1f}s")
+    return len(indexes)
+
+@contextmanager
+def bulk_load_mode(engine, table_name=BULK_TABLE, workers=REBUILD_WORKERS):
+    """
+    Drops `table_name`'s secondary indexes for the duration of a load and
+    rebuilds them afterwards, whether or not the load succeeds. If both the
+    load and the rebuild fail, the load's exception is the one raised.
+
+    The definitions are written to a snapshot file before anything is
+    dropped. If a previous bulk load died before restoring, its snapshot is
+    reused (the live table has already lost those indexes), so the original
+    definitions survive any number of crashes until a restore completes.
+    Callers must not hold locks on the table when the block exits, or the
+    rebuild will wait on them.
+    """
+    indexes = load_snapshot(table_name)
+    if indexes is None:
+        indexes = snapshot_secondary_indexes(engine, table_name)
+        save_snapshot(table_name, indexes)
+    else:
+        logger.warning(f"Resuming an interrupted bulk load: {len(indexes)} indexes on {table_name} are still pending rebuild")
+    drop_secondary_indexes(engine, indexes)
+    try:
+        yield indexes
+    except BaseException:
+        # Keep the load's own error: a failed rebuild is logged and its snapshot left for `restore`
+        try:
+            restore_indexes(engine, table_name, workers)
+        except Exception as e:
+            logger.error(f"Index rebuild after the failed load also failed; run 'db_bulk_mode.py restore': {e}")
+        raise
+    restore_indexes(engine, table_name, workers)
+
+def main(argv=None):
+    """Command-line entry point for manual bulk-mode control and recovery."""
+    from log_config import setup_logging
+    from db_utils import get_engine
+
+    parser = argparse.ArgumentParser(description="Drop and rebuild secondary indexes around bulk loads.")
+    parser.add_argument('command', choices=['status', 'drop', 'restore'],
+                        help="status: show pending snapshot; drop: snapshot and drop; restore: rebuild and analyze")
+    parser.add_argument('--table', default=BULK_TABLE)
+    parser.add_argument('--workers', type=int, default=REBUILD_WORKERS, help="Indexes rebuilt at the same time")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    engine = get_engine()
+    if engine is None:
+        logger.error("Failed to create database engine")
+        return False
+    try:
+        pending = load_snapshot(args.table)
+        if args.command == 'status':
+            if pending is None:
+                print(f"No bulk load pending for {args.table}.")
+            else:
+                print(f"{len(pending)} indexes awaiting rebuild on {args.table}:")
+                for index in pending:
+                    print(f"  {index['definition']}")
+        elif args.command == 'drop':
+            if pending is None:
+                pending = snapshot_secondary_indexes(engine, args.table)
+                save_snapshot(args.table, pending)
+            drop_secondary_indexes(engine, pending)
+            print(f"Dropped {len(pending)} indexes; run 'restore' after loading.")
+        else:
+            print(f"Restored {restore_indexes(engine, args.table, args.workers)} indexes on {args.table}.")
+        return True
+    except Exception as e:
+        logger.error(f"Bulk mode command failed: {e}", exc_info=True)
+        print(f"Error: {e}")
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
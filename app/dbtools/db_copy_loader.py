@@ -0,0 +1,245 @@
+import io
+import logging
+import pandas as pd
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+
+# Column order used for every COPY into hourly_counts (count_id comes from the sequence)
+HOURLY_COPY_COLUMNS = [
+    'station_key', 'traffic_direction_seq', 'cardinal_direction_seq',
+    'classification_seq', 'count_date', 'year', 'month', 'day_of_week',
+    'is_public_holiday', 'is_school_holiday',
+] + HOUR_COLUMNS + ['daily_total', 'hours_counted']
+
+# Column order used for every COPY into stations (location_geom is built in SQL)
+STATION_COPY_COLUMNS = [
+    'station_key', 'station_id', 'name', 'road_name', 'full_name',
+    'common_road_name', 'lga', 'suburb', 'post_code',
+    'road_functional_hierarchy', 'lane_count', 'road_classification_type',
+    'device_type', 'permanent_station', 'vehicle_classifier',
+    'heavy_vehicle_checking_station', 'quality_rating', 'wgs84_latitude',
+    'wgs84_longitude',
+]
+
+# Natural keys used as ON CONFLICT targets when upserting
+HOURLY_NATURAL_KEY = ['station_key', 'count_date', 'traffic_direction_seq', 'classification_seq']
+STATION_NATURAL_KEY = ['station_key']
+
+HOURLY_STAGING_TABLE = 'hourly_counts_staging'
+HOURLY_CHUNK_TEMP_TABLE = 'hourly_counts_chunk'  # Session-private TEMP table for per-chunk upserts
+STATION_STAGING_TABLE = 'stations_staging'
+
+# SQL expression that turns the WGS84 columns into the PostGIS point stored in location_geom
+LOCATION_GEOM_SQL = "ST_SetSRID(ST_MakePoint(wgs84_longitude, wgs84_latitude), 4326)"
+
+def dataframe_to_csv_buffer(df, columns):
+    """
+    Serialises the given columns of a DataFrame into an in-memory CSV buffer
+    suitable for `COPY ... FROM STDIN WITH (FORMAT csv)`. NaN/None become
+    unquoted empty fields, which COPY reads as NULL.
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, columns=columns, header=False, index=False)
+    buffer.seek(0)
+    return buffer
+
+def copy_dataframe(dbapi_conn, df, table_name, columns):
+    """
+    Streams a DataFrame into `table_name` with COPY FROM STDIN.
+
+    Args:
+        dbapi_conn: A psycopg2 connection (e.g. `session.connection().connection.dbapi_connection`).
+        df: DataFrame holding at least `columns`.
+        table_name: Target table.
+        columns: Ordered list of columns to copy.
+
+    Returns:
+        Number of rows copied.
+    """
+    if df.empty:
+        return 0
+    buffer = dataframe_to_csv_buffer(df, columns)
+    column_list = ", ".join(columns)
+    with dbapi_conn.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    logger.debug(f"Copied {len(df)} rows into {table_name}")
+    return len(df)
+
+def prepare_staging_table(dbapi_conn, staging_table, target_table, columns):
+    """
+    (Re)creates an empty UNLOGGED staging table holding only the copied
+    columns of `target_table`. UNLOGGED skips WAL writes, and having no
+    indexes or constraints makes the COPY itself as cheap as possible. The
+    table is rebuilt each time so it follows schema changes to the target.
+    """
+    column_list = ", ".join(columns)
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {staging_table} AS "
+            f"SELECT {column_list} FROM {target_table} WITH NO DATA"
+        )
+    logger.debug(f"Staging table {staging_table} ready")
+
+def merge_staging_table(dbapi_conn, staging_table, target_table, columns, extra_columns=None,
+                        conflict_columns=None):
+    """
+    Moves everything in the staging table into the target with a single
+    `INSERT ... SELECT`, then empties the staging table.
+
+    Args:
+        extra_columns: Optional mapping of target column -> SQL expression
+            evaluated over the staging rows (e.g. location_geom).
+        conflict_columns: Optional natural key. When given, the insert becomes
+            an upsert (`ON CONFLICT ... DO UPDATE`) and only the last staged
+            row per key is kept, since one statement cannot update a row twice.
+
+    Returns:
+        Number of rows inserted or updated in the target.
+    """
+    extra_columns = extra_columns or {}
+    target_cols = list(columns) + list(extra_columns)
+    insert_cols = ", ".join(target_cols)
+    select_cols = ", ".join(list(columns) + list(extra_columns.values()))
+    if conflict_columns:
+        key_cols = ", ".join(conflict_columns)
+        update_cols = ", ".join(
+            f"{col} = EXCLUDED.{col}" for col in target_cols if col not in conflict_columns
+        )
+        statement = (
+            f"INSERT INTO {target_table} ({insert_cols}) "
+            f"SELECT DISTINCT ON ({key_cols}) {select_cols} FROM {staging_table} "
+            f"ORDER BY {key_cols}, ctid DESC "
+            f"ON CONFLICT ({key_cols}) DO UPDATE SET {update_cols}"
+        )
+    else:
+        statement = (
+            f"INSERT INTO {target_table} ({insert_cols}) "
+            f"SELECT {select_cols} FROM {staging_table}"
+        )
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(statement)
+        inserted = cursor.rowcount
+        cursor.execute(f"TRUNCATE {staging_table}")
+    logger.info(f"Merged {inserted} rows from {staging_table} into {target_table}")
+    return inserted
+
+def copy_stations(dbapi_conn, df_stations, use_staging=True, upsert=False):
+    """
+    Loads prepared station records with COPY and builds location_geom in SQL.
+
+    With `use_staging` the rows are copied into an UNLOGGED staging table and
+    inserted with one `INSERT ... SELECT` that computes the geometry; otherwise
+    they are copied straight into `stations` and the geometry is filled by a
+    single UPDATE. `upsert` updates existing stations in place (it always goes
+    through the staging table).
+
+    Returns:
+        Number of stations loaded.
+    """
+    if use_staging or upsert:
+        prepare_staging_table(dbapi_conn, STATION_STAGING_TABLE, 'stations', STATION_COPY_COLUMNS)
+        copy_dataframe(dbapi_conn, df_stations, STATION_STAGING_TABLE, STATION_COPY_COLUMNS)
+        return merge_staging_table(
+            dbapi_conn, STATION_STAGING_TABLE, 'stations', STATION_COPY_COLUMNS,
+            extra_columns={'location_geom': LOCATION_GEOM_SQL},
+            conflict_columns=STATION_NATURAL_KEY if upsert else None,
+        )
+
+    copied = copy_dataframe(dbapi_conn, df_stations, 'stations', STATION_COPY_COLUMNS)
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE stations SET location_geom = {LOCATION_GEOM_SQL} WHERE location_geom IS NULL"
+        )
+    return copied
+
+def copy_hourly_chunk(dbapi_conn, prepared, use_staging=False, upsert=False):
+    """
+    Streams one prepared hourly chunk (see `transform_hourly_chunk`) into
+    `hourly_counts`, or into the staging table when `use_staging` is set.
+    Staged rows reach `hourly_counts` when `merge_hourly_staging` is called.
+    Without staging, `upsert` merges the chunk immediately on the natural key.
+    """
+    if use_staging:
+        return copy_dataframe(dbapi_conn, prepared, HOURLY_STAGING_TABLE, HOURLY_COPY_COLUMNS)
+    if upsert:
+        return upsert_hourly_chunk(dbapi_conn, prepared)
+    return copy_dataframe(dbapi_conn, prepared, 'hourly_counts', HOURLY_COPY_COLUMNS)
+
+def upsert_hourly_chunk(dbapi_conn, prepared):
+    """
+    Upserts one chunk through a session-private TEMP staging table. Each
+    connection gets its own table, so parallel workers never share staging.
+    """
+    if prepared.empty:
+        return 0
+    column_list = ", ".join(HOURLY_COPY_COLUMNS)
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {HOURLY_CHUNK_TEMP_TABLE} AS "
+            f"SELECT {column_list} FROM hourly_counts WITH NO DATA"
+        )
+        cursor.execute(f"TRUNCATE {HOURLY_CHUNK_TEMP_TABLE}")
+    copy_dataframe(dbapi_conn, prepared, HOURLY_CHUNK_TEMP_TABLE, HOURLY_COPY_COLUMNS)
+    return merge_staging_table(
+        dbapi_conn, HOURLY_CHUNK_TEMP_TABLE, 'hourly_counts', HOURLY_COPY_COLUMNS,
+        conflict_columns=HOURLY_NATURAL_KEY,
+    )
+
+def prepare_hourly_staging(dbapi_conn):
+    """Creates/empties the UNLOGGED hourly staging table."""
+    prepare_staging_table(dbapi_conn, HOURLY_STAGING_TABLE, 'hourly_counts', HOURLY_COPY_COLUMNS)
+
+def merge_hourly_staging(dbapi_conn, upsert=False):
+    """Inserts (or upserts) all staged hourly rows into `hourly_counts` in one statement."""
+    return merge_staging_table(
+        dbapi_conn, HOURLY_STAGING_TABLE, 'hourly_counts', HOURLY_COPY_COLUMNS,
+        conflict_columns=HOURLY_NATURAL_KEY if upsert else None,
+    )
+
+def ensure_hourly_natural_key(dbapi_conn):
+    """
+    Adds the `uq_hourly_counts_natural_key` constraint to an existing
+    hourly_counts table, first deleting duplicate rows left behind by earlier
+    non-idempotent loads (the row with the highest count_id is kept).
+    No-op when the constraint is already present.
+    """
+    key_cols = ", ".join(HOURLY_NATURAL_KEY)
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_hourly_counts_natural_key'"
+        )
+        if cursor.fetchone():
+            return False
+        join_cond = " AND ".join(f"a.{col} = b.{col}" for col in HOURLY_NATURAL_KEY)
+        cursor.execute(
+            f"DELETE FROM hourly_counts a USING hourly_counts b "
+            f"WHERE {join_cond} AND a.count_id < b.count_id"
+        )
+        logger.info(f"Removed {cursor.rowcount} duplicate hourly_counts rows")
+        cursor.execute(
+            f"ALTER TABLE hourly_counts ADD CONSTRAINT uq_hourly_counts_natural_key UNIQUE ({key_cols})"
+        )
+    logger.info("Added uq_hourly_counts_natural_key constraint")
+    return True
+
+def load_high_water_marks(dbapi_conn):
+    """
+    Returns a dict of station_key -> latest loaded count_date.
+
+    Uses one correlated MAX per station so each lookup is an index probe on
+    (station_key, count_date) rather than a scan of hourly_counts.
+    """
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT s.station_key, "
+            "(SELECT MAX(h.count_date) FROM hourly_counts h WHERE h.station_key = s.station_key) "
+            "FROM stations s"
+        )
+        return {key: latest for key, latest in cursor.fetchall() if latest is not None}
@@ -1,6 +1,7 @@
 import os
 import logging
 import sys
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -9,15 +10,47 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 from models import Base, Station, HourlyCount
 from geoalchemy2 import WKTElement
-from db_utils import get_db_session, get_engine  # Import get_engine
+from db_utils import get_maintenance_session, get_engine  # Import get_engine
 from tqdm import tqdm  # Import tqdm
-from data_load_checker import validate_station_data, validate_hourly_count_data
+from db_data_load_checker import validate_station_data, validate_hourly_count_data
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from db_copy_loader import (
+    HOURLY_NATURAL_KEY,
+    STATION_COPY_COLUMNS,
+    copy_stations,
+    copy_hourly_chunk,
+    prepare_hourly_staging,
+    merge_hourly_staging,
+    ensure_hourly_natural_key,
+    load_high_water_marks,
+)
+from db_summary_tables import ensure_summary_schema, station_years, refresh_station_summaries
+from db_ingest_runs import ensure_ingest_run_tables, chunk_date_range, widen_date_range, record_ingest_run
+from db_partitions import ensure_partitions_for_chunk
+from db_bulk_mode import bulk_load_mode
+from db_parquet_export import refresh_parquet_cache
+from contextlib import nullcontext
 
 # --- CONFIGURABLE PARAMETERS ---
 MAX_ROWS_TO_PROCESS = 'all'  # Set to a number to limit rows, or 'all' to process the entire file
 COMMIT_BATCH_SIZE = 10000  # Increase commit batch size
+LOADER_BACKEND = 'copy'  # 'copy' streams rows with COPY FROM STDIN; 'orm' uses bulk_insert_mappings
+USE_STAGING_TABLE = True  # COPY into UNLOGGED staging tables and finish with a single INSERT ... SELECT
+# 'append' inserts blindly; 'upsert' merges on the natural key (ON CONFLICT DO UPDATE);
+# 'incremental' upserts and also skips rows dated before each station's high-water mark
+LOAD_MODE = 'incremental'
+CSV_CHUNK_SIZE = 100000  # Rows read from the hourly CSV per chunk; bounds peak memory
+BULK_MODE = False  # Drop secondary hourly_counts indexes during the load and rebuild them in parallel afterwards
+HOURLY_CSV_PATH = '/home/runner/workspace/app/data/road_traffic_counts_hourly_sample_0.csv'
 # -----------------------------
 
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+HOURLY_SOURCE_COLUMNS = set([
+    'station_key', 'traffic_direction_seq', 'cardinal_direction_seq',
+    'classification_seq', 'date', 'is_public_holiday', 'is_school_holiday',
+] + HOUR_COLUMNS)
+TRUE_STRINGS = ['true', 't', '1', 'yes', 'y']
+
 # Set up logging
 logger = logging.getLogger(__name__) # Get logger for this module
 
@@ -72,8 +105,8 @@ def load_station_reference_data(session):
                 else:
                     df_stations[col] = pd.to_numeric(df_stations[col], errors='coerce').fillna(0).astype(int)
 
-        # Data Type Conversions and Geometry Creation
-        stations_to_insert = []
+        # Data Type Conversions
+        station_records = []
         skipped_stations = 0
         for idx, row in tqdm(df_stations.iterrows(), total=len(df_stations), desc="Processing Stations"):
             try:
@@ -86,11 +119,7 @@ def load_station_reference_data(session):
                     skipped_stations += 1
                     continue
 
-                # Geometry Creation (Optimized)
-                wkt_point = f"POINT({round(longitude, 6)} {round(latitude, 6)})"
-                location_geom = WKTElement(wkt_point, srid=4326)
-
-                station = Station(
+                station_record = dict(
                     station_key=int(row.get('station_key')),
                     station_id=str(row.get('station_id')) if not isinstance(row.get('station_id'), str) else row.get('station_id'),
                     name=str(row.get('name')) if not isinstance(row.get('name'), str) else row.get('name'),
@@ -108,11 +137,10 @@ def load_station_reference_data(session):
                     vehicle_classifier=bool(row.get('vehicle_classifier', False)),
                     heavy_vehicle_checking_station=bool(row.get('heavy_vehicle_checking_station', False)),
                     quality_rating=int(row.get('quality_rating', 0)),
-                    wgs84_latitude=str(latitude),
-                    wgs84_longitude=str(longitude),
-                    location_geom=location_geom
+                    wgs84_latitude=latitude,
+                    wgs84_longitude=longitude
                 )
-                stations_to_insert.append(station)
+                station_records.append(station_record)
 
             except Exception as row_error:
                 logger.error(f"Error processing station record {idx}: {row_error}")
@@ -120,11 +148,35 @@ def load_station_reference_data(session):
                 skipped_stations += 1
                 continue
 
-        # Bulk insert using SQLAlchemy
         logger.info("Inserting station data in bulk...")
-        session.add_all(stations_to_insert)
+        upsert = LOAD_MODE != 'append'
+        if LOADER_BACKEND == 'copy':
+            # COPY through an in-memory buffer; location_geom is built in SQL
+            df_records = pd.DataFrame.from_records(station_records, columns=STATION_COPY_COLUMNS)
+            copy_stations(get_dbapi_connection(session), df_records, use_staging=USE_STAGING_TABLE, upsert=upsert)
+        else:
+            # Bulk insert using SQLAlchemy, with geometry created client-side
+            rows = [
+                dict(
+                    record,
+                    location_geom=WKTElement(
+                        f"POINT({round(record['wgs84_longitude'], 6)} {round(record['wgs84_latitude'], 6)})",
+                        srid=4326
+                    )
+                )
+                for record in station_records
+            ]
+            if not upsert:
+                session.add_all([Station(**row) for row in rows])
+            elif rows:
+                stmt = pg_insert(Station.__table__)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['station_key'],
+                    set_={col: stmt.excluded[col] for col in rows[0] if col != 'station_key'}
+                )
+                session.execute(stmt, rows)
         session.commit()
-        logger.info(f"Successfully imported {len(stations_to_insert)} stations")
+        logger.info(f"Successfully imported {len(station_records)} stations")
         if skipped_stations > 0:
             logger.warning(f"Skipped {skipped_stations} station records due to data issues. See logs/skipped_data.log for details.")
 
@@ -135,113 +187,292 @@ def load_station_reference_data(session):
         session.rollback()
         return False
 
-def ingest_hourly_data():
-    """Ingests hourly traffic data from a CSV file into the database."""
+def iter_hourly_chunks(csv_file_path, chunksize=CSV_CHUNK_SIZE, nrows=None, skip_rows=0):
+    """
+    Streams the hourly counts CSV in fixed-size chunks.
+
+    Only the columns needed to build `HourlyCount` rows are parsed, so memory
+    use is bounded by `chunksize` rather than by the size of the file.
+
+    Args:
+        csv_file_path: Path to the RMS hourly counts CSV.
+        chunksize: Number of rows per chunk.
+        nrows: Optional cap on the total number of rows read.
+        skip_rows: Number of leading data rows to skip (the header is kept),
+            used to resume a partially loaded file.
+
+    Yields:
+        Raw pandas DataFrame chunks.
+    """
+    reader = pd.read_csv(
+        csv_file_path,
+        usecols=lambda col: col in HOURLY_SOURCE_COLUMNS,
+        chunksize=chunksize,
+        nrows=nrows,
+        skiprows=range(1, skip_rows + 1) if skip_rows else None,
+        low_memory=False,
+    )
+    for chunk in reader:
+        yield chunk
+
+def _to_int_column(chunk, col):
+    """Vectorised equivalent of safe_int: invalid or missing values become 0."""
+    if col not in chunk.columns:
+        return np.zeros(len(chunk), dtype=np.int64)
+    return pd.to_numeric(chunk[col], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+
+def _to_bool_column(chunk, col):
+    """Parses a boolean flag column that may arrive as bool, 0/1 or 'true'/'false' text."""
+    if col not in chunk.columns:
+        return np.zeros(len(chunk), dtype=bool)
+    series = chunk[col]
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=bool)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.fillna(0).to_numpy() != 0
+    return series.astype(str).str.strip().str.lower().isin(TRUE_STRINGS).to_numpy()
+
+def hour_matrix(chunk):
+    """
+    Returns the 24 hourly volumes of a chunk as an (n_rows, 24) int64 array,
+    together with the number of hours per row that held a valid count.
+    Missing hour columns and NaN/invalid values are treated as 0.
+    """
+    hours = chunk.reindex(columns=HOUR_COLUMNS)
+    hours = hours.apply(pd.to_numeric, errors='coerce')
+    hours_counted = hours.notna().sum(axis=1).to_numpy(dtype=np.int64)
+    return hours.fillna(0).to_numpy(dtype=np.int64), hours_counted
+
+def transform_hourly_chunk(chunk, valid_station_keys):
+    """
+    Converts a raw CSV chunk into rows ready for the `hourly_counts` table.
+
+    All checks and derivations are column-wise NumPy/pandas operations:
+    station keys are checked against the reference set, dates are parsed once
+    per chunk, year/month/day_of_week are derived from the parsed dates, NaN
+    hours are filled with 0 and daily_total is the row sum of the hour matrix.
+    hours_counted records how many hours were valid before filling, which the
+    summary tables use for the >= 19 hours quality rule.
+
+    Args:
+        chunk: Raw DataFrame as produced by `iter_hourly_chunks`.
+        valid_station_keys: Array-like of station keys present in `stations`.
+
+    Returns:
+        Tuple of (prepared DataFrame, rows skipped for unknown station_key,
+        rows skipped for unparseable dates).
+    """
+    station_keys = _to_int_column(chunk, 'station_key')
+    key_mask = np.isin(station_keys, np.asarray(valid_station_keys, dtype=np.int64))
+    skipped_station_keys = int((~key_mask).sum())
+    if skipped_station_keys:
+        missing = np.unique(station_keys[~key_mask])
+        skipped_data_logger.info(
+            f"Skipped {skipped_station_keys} hourly count records: Missing station_key values - {missing.tolist()}"
+        )
+
+    count_dates = pd.to_datetime(chunk['date'], errors='coerce', format='ISO8601') if 'date' in chunk.columns \
+        else pd.Series(pd.NaT, index=chunk.index)
+    date_mask = count_dates.notna().to_numpy()
+    skipped_dates = int((key_mask & ~date_mask).sum())
+    if skipped_dates:
+        skipped_data_logger.info(f"Skipped {skipped_dates} hourly count records: Invalid date format")
+
+    keep = key_mask & date_mask
+    chunk = chunk.loc[keep]
+    count_dates = count_dates[keep]
+    hours, hours_counted = hour_matrix(chunk)
+
+    prepared = pd.DataFrame({
+        'station_key': station_keys[keep],
+        'traffic_direction_seq': _to_int_column(chunk, 'traffic_direction_seq'),
+        'cardinal_direction_seq': _to_int_column(chunk, 'cardinal_direction_seq'),
+        'classification_seq': _to_int_column(chunk, 'classification_seq'),
+        'count_date': count_dates.dt.date.to_numpy(),
+        'year': count_dates.dt.year.to_numpy(dtype=np.int64),
+        'month': count_dates.dt.month.to_numpy(dtype=np.int64),
+        'day_of_week': count_dates.dt.dayofweek.to_numpy(dtype=np.int64) + 1,  # ISO: 1 (Mon) to 7 (Sun)
+        'is_public_holiday': _to_bool_column(chunk, 'is_public_holiday'),
+        'is_school_holiday': _to_bool_column(chunk, 'is_school_holiday'),
+    })
+    prepared[HOUR_COLUMNS] = hours
+    prepared['daily_total'] = hours.sum(axis=1)
+    prepared['hours_counted'] = hours_counted
+    return prepared, skipped_station_keys, skipped_dates
+
+def filter_by_high_water_mark(prepared, high_water_marks):
+    """
+    Drops rows dated before the latest count_date already loaded for their
+    station. Rows on the high-water date itself are kept (and upserted) so a
+    partially loaded last day is completed rather than skipped.
+
+    Args:
+        prepared: Output of `transform_hourly_chunk`.
+        high_water_marks: Dict of station_key -> latest loaded date.
+
+    Returns:
+        Tuple of (filtered DataFrame, number of rows dropped).
+    """
+    if not high_water_marks or prepared.empty:
+        return prepared, 0
+    marks = pd.to_datetime(prepared['station_key'].map(high_water_marks))
+    dates = pd.to_datetime(prepared['count_date'])
+    keep = (marks.isna() | (dates >= marks)).to_numpy()
+    return prepared.loc[keep], int((~keep).sum())
+
+def get_dbapi_connection(session):
+    """Returns the raw psycopg2 connection behind the session's current transaction."""
+    return session.connection().connection.dbapi_connection
+
+def insert_hourly_chunk(session, prepared):
+    """
+    Writes a prepared chunk using the configured LOADER_BACKEND and commits.
+    With the COPY backend and USE_STAGING_TABLE the rows land in the staging
+    table; `merge_hourly_staging` moves them into hourly_counts at the end.
+    """
+    upsert = LOAD_MODE != 'append'
+    if LOADER_BACKEND == 'copy':
+        copied = copy_hourly_chunk(
+            get_dbapi_connection(session), prepared, use_staging=USE_STAGING_TABLE, upsert=upsert
+        )
+        session.commit()
+        return copied
+
+    if upsert:
+        # A single multi-row upsert cannot touch the same key twice
+        prepared = prepared.drop_duplicates(subset=HOURLY_NATURAL_KEY, keep='last')
+    records = prepared.to_dict('records')
+    for start in range(0, len(records), COMMIT_BATCH_SIZE):
+        batch = records[start:start + COMMIT_BATCH_SIZE]
+        if upsert:
+            stmt = pg_insert(HourlyCount.__table__)
+            stmt = stmt.on_conflict_do_update(
+                constraint='uq_hourly_counts_natural_key',
+                set_={col: stmt.excluded[col] for col in batch[0] if col not in HOURLY_NATURAL_KEY}
+            )
+            session.execute(stmt, batch)
+        else:
+            session.bulk_insert_mappings(HourlyCount, batch)
+        session.commit()
+    return len(records)
 
-    try:
-        with get_db_session() as session:  # Use the context manager
-            if session is None:
-                logger.error("Failed to get database session.")
-                return False
+def ingest_hourly_data(csv_file_path=HOURLY_CSV_PATH):
+    """Ingests hourly traffic data from a CSV file into the database, chunk by chunk."""
 
+    try:
+        # No statement timeout: the merge, natural-key and summary statements outlast the app's limit
+        session = get_maintenance_session()
+        if session is None:
+            logger.error("Failed to get database session.")
+            return False
+        with session:  # Use the context manager
             # Load station reference data first
             if not load_station_reference_data(session):
                 logger.error("Failed to load station reference data. Aborting hourly data ingestion.")
                 return False
 
-            # Read CSV file using relative path
-            csv_file_path = '/home/runner/workspace/app/data/road_traffic_counts_hourly_sample_0.csv'
-            df = pd.read_csv(csv_file_path, low_memory=False)
-            logger.info(f"Successfully read CSV file with {len(df)} rows")
-
             # Limit the number of rows to process
+            nrows = None
             if MAX_ROWS_TO_PROCESS != 'all':
                 try:
-                    max_rows = int(MAX_ROWS_TO_PROCESS)
-                    df = df.head(max_rows)
-                    logger.info(f"Limiting processing to the first {max_rows} rows.")
+                    nrows = int(MAX_ROWS_TO_PROCESS)
+                    logger.info(f"Limiting processing to the first {nrows} rows.")
                 except ValueError:
                     logger.error("Invalid value for MAX_ROWS_TO_PROCESS. Please set to a number or 'all'. Processing all rows.")
             else:
                 logger.info("Processing all rows in the CSV file.")
 
             hourly_counts_processed = 0
+            rows_read = 0
             skipped_station_keys = 0
             skipped_hourly_counts = 0
+            skipped_already_loaded = 0
 
             try:
-                # Load valid station keys into a set
-                valid_station_keys = {station.station_key for station in session.query(Station.station_key).all()}
-                logger.info(f"Loaded {len(valid_station_keys)} valid station keys into set.")
-
-                # Load Hourly Counts
-                # Prepare data for bulk insert
-                hourly_counts_to_insert = []
-                for _, row in tqdm(df.iterrows(), total=len(df), desc="Processing Hourly Counts"):
-                    # Extract station_key
-                    station_key = safe_int(row.get('station_key'))
-
-                    # Check if station_key exists in stations table (using set)
-                    if station_key not in valid_station_keys:
-                        logger.warning(f"Skipping hourly count record due to missing station_key: {station_key}")
-                        skipped_data_logger.info(f"Skipped hourly count record: Missing station_key - {station_key} - {row.to_dict()}")
-                        skipped_station_keys += 1  # Increment the counter
-                        skipped_hourly_counts += 1
-                        continue
-
-                    # Convert date string to datetime
-                    try:
-                        count_date = pd.to_datetime(row['date']).date()
-                    except ValueError as e:
-                        logger.error(f"Error converting date: {e}")
-                        skipped_data_logger.info(f"Skipped hourly count record: Invalid date format - {row.to_dict()}")
-                        skipped_hourly_counts += 1
-                        continue
-
-                    # Create HourlyCount object
-                    count_data = {
-                        'station_key': station_key,
-                        'traffic_direction_seq': safe_int(row.get('traffic_direction_seq')),
-                        'cardinal_direction_seq': safe_int(row.get('cardinal_direction_seq')),
-                        'classification_seq': safe_int(row.get('classification_seq')),
-                        'count_date': count_date,
-                        'year': count_date.year,
-                        'month': count_date.month,
-                        'day_of_week': count_date.isoweekday(),
-                        'is_public_holiday': bool(row.get('is_public_holiday', False)),
-                        'is_school_holiday': bool(row.get('is_school_holiday', False))
-                    }
-
-                    # Add hourly values
-                    for hour in range(24):
-                        hour_col = f'hour_{str(hour).zfill(2)}'
-                        # Use .get() with a default value of 0 and handle NaN values
-                        hour_value = row.get(hour_col, 0)
-                        if pd.isna(hour_value):
-                            hour_value = 0
-                        count_data[hour_col] = int(hour_value)
-
-                    # Calculate daily total
-                    hour_cols = [f'hour_{str(h).zfill(2)}' for h in range(24)]
-                    daily_total = sum(int(row.get(col, 0)) if not pd.isna(row.get(col, 0)) else 0 for col in hour_cols)
-                    count_data['daily_total'] = daily_total
-
-                    hourly_counts_to_insert.append(count_data)
-                    hourly_counts_processed += 1
-
-                    # Commit in batches
-                    if hourly_counts_processed % COMMIT_BATCH_SIZE == 0:
-                        session.bulk_insert_mappings(HourlyCount, hourly_counts_to_insert)
-                        session.commit()
-                        hourly_counts_to_insert = []  # Clear the list after commit
-                        logger.info(f"Processed {hourly_counts_processed} hourly count records...")
-
-                # Final commit for hourly counts
-                if hourly_counts_to_insert:  # Commit any remaining records
-                    session.bulk_insert_mappings(HourlyCount, hourly_counts_to_insert)
+                # Load valid station keys into an array for vectorised membership checks
+                valid_station_keys = np.fromiter(
+                    (key for (key,) in session.query(Station.station_key).all()), dtype=np.int64
+                )
+                logger.info(f"Loaded {len(valid_station_keys)} valid station keys.")
+
+                ensure_summary_schema(session.get_bind())
+                ensure_ingest_run_tables(session.get_bind())
+
+                high_water_marks = {}
+                if LOAD_MODE != 'append':
+                    # Upserts need the natural-key constraint as their ON CONFLICT target
+                    ensure_hourly_natural_key(get_dbapi_connection(session))
+                    session.commit()
+                if LOAD_MODE == 'incremental':
+                    high_water_marks = load_high_water_marks(get_dbapi_connection(session))
+                    logger.info(f"Loaded high-water marks for {len(high_water_marks)} stations.")
+
+                use_staging = LOADER_BACKEND == 'copy' and USE_STAGING_TABLE
+                if use_staging:
+                    prepare_hourly_staging(get_dbapi_connection(session))
                     session.commit()
-                print(f"Successfully imported {hourly_counts_processed} hourly count records")
-                logger.info(f"Successfully imported {hourly_counts_processed} hourly count records")
+
+                affected_station_years = set()
+                loaded_date_range = None
+                started = time.perf_counter()
+                # Release this session's locks; bulk mode drops and rebuilds indexes on other connections
+                session.commit()
+                with bulk_load_mode(session.get_bind()) if BULK_MODE else nullcontext():
+                    try:
+                        progress = tqdm(desc="Processing Hourly Counts", unit="rows")
+                        for chunk in iter_hourly_chunks(csv_file_path, nrows=nrows):
+                            prepared, missing_keys, bad_dates = transform_hourly_chunk(chunk, valid_station_keys)
+                            prepared, already_loaded = filter_by_high_water_mark(prepared, high_water_marks)
+                            skipped_already_loaded += already_loaded
+                            affected_station_years |= station_years(prepared)
+                            loaded_date_range = widen_date_range(loaded_date_range, chunk_date_range(prepared))
+                            # A partitioned hourly_counts needs a partition for every year before rows arrive
+                            if ensure_partitions_for_chunk(get_dbapi_connection(session), prepared):
+                                session.commit()
+                            hourly_counts_processed += insert_hourly_chunk(session, prepared)
+
+                            rows_read += len(chunk)
+                            skipped_station_keys += missing_keys
+                            skipped_hourly_counts += missing_keys + bad_dates
+                            progress.update(len(chunk))
+
+                            elapsed = time.perf_counter() - started
+                            logger.info(
+                                f"Processed {hourly_counts_processed} hourly count records "
+                                f"({rows_read / elapsed if elapsed else 0:,.0f} rows/s)..."
+                            )
+                        progress.close()
+
+                        if use_staging:
+                            merge_hourly_staging(get_dbapi_connection(session), upsert=LOAD_MODE != 'append')
+                            session.commit()
+                    except BaseException:
+                        session.rollback()  # The index rebuild would otherwise wait on this transaction's locks
+                        raise
+
+                # Rebuild AADT/AAWT/HV and profile summaries only for the station-years just loaded
+                refresh_station_summaries(get_dbapi_connection(session), affected_station_years)
+                # Tell the app which cached results this load invalidates
+                record_ingest_run(get_dbapi_connection(session), affected_station_years, loaded_date_range,
+                                  hourly_counts_processed, source=csv_file_path)
+                session.commit()
+
+                # Re-export the loaded station-years if this machine keeps a local Parquet cache
+                try:
+                    refresh_parquet_cache(session.get_bind())
+                except Exception as e:
+                    logger.error(f"Failed to refresh the Parquet cache: {e}")
+
+                elapsed = time.perf_counter() - started
+                rate = rows_read / elapsed if elapsed else 0
+                print(f"Successfully imported {hourly_counts_processed} hourly count records ({rate:,.0f} rows/s)")
+                logger.info(
+                    f"Successfully imported {hourly_counts_processed} hourly count records "
+                    f"from {rows_read} CSV rows in {elapsed:.1f}s ({rate:,.0f} rows/s)"
+                )
+
+                if skipped_already_loaded:
+                    logger.info(f"Skipped {skipped_already_loaded} hourly count records older than their station's high-water mark.")
 
                 # Log the number of skipped station keys
                 logger.info(f"Skipped {skipped_station_keys} hourly count records due to missing station_key values.")
@@ -0,0 +1,491 @@
+import re
+import json
+import hashlib
+import logging
+import datetime
+import contextlib
+from sqlalchemy import event, text, Boolean
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from models import HourlyCount
+from db_partitions import PARTITION_NAME_PATTERN
+
+# --- CONFIGURABLE PARAMETERS ---
+ADVISOR_TABLE = 'hourly_counts'  # Table whose indexes are proposed and reviewed
+MAX_INCLUDE_COLUMNS = 4  # Wider outputs (e.g. all 24 hour columns) get a plain composite index instead
+LOW_CARDINALITY_MAX = 32  # Single-column indexes on columns with at most this many distinct values are flagged
+SAMPLE_STATION_COUNT = 3  # Stations used to replay the app's queries
+STATS_QUERY_LIMIT = 20  # Most expensive pg_stat_statements entries to explain
+# Equality columns lead a proposed index in this order; the first range column follows them
+EQUALITY_COLUMN_ORDER = ['station_key', 'traffic_direction_seq', 'classification_seq']
+# -----------------------------
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+TABLE_COLUMNS = [column.name for column in HourlyCount.__table__.columns]
+BOOLEAN_COLUMNS = [column.name for column in HourlyCount.__table__.columns if isinstance(column.type, Boolean)]
+
+def _reader(func):
+    """The undecorated db_utils reader, so replays always reach the database."""
+    return getattr(func, '__wrapped__', func)
+
+@contextlib.contextmanager
+def _postgres_only(db_utils):
+    """Disables the local Parquet/DuckDB source so the replayed readers query PostgreSQL."""
+    get_local_source = db_utils.get_local_source
+    db_utils.get_local_source = lambda: None
+    try:
+        yield
+    finally:
+        db_utils.get_local_source = get_local_source
+
+def choose_sample_scope(engine, count=SAMPLE_STATION_COUNT):
+    """
+    Picks the stations with the most counted days in station_year_metrics and
+    their latest year, falling back to the first stations when the summaries
+    are empty. Returns (station_keys, start_date, end_date).
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(text("""
+            SELECT station_key, MAX(year) FROM station_year_metrics
+            GROUP BY station_key ORDER BY SUM(days_counted) DESC LIMIT :count
+        """), {'count': count}).all()
+        if not rows:
+            rows = connection.execute(
+                text("SELECT station_key, NULL FROM stations ORDER BY station_key LIMIT :count"), {'count': count}
+            ).all()
+    station_keys = [int(key) for key, _ in rows]
+    year = max((int(year) for _, year in rows if year is not None), default=datetime.date.today().year - 1)
+    return station_keys, datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+
+def capture_app_workload(engine, station_keys, start_date, end_date):
+    """
+    Replays the db_utils readers that query hourly_counts against `engine`
+    and records the SQL and parameters each one sends. The local data source
+    is bypassed for the replay, otherwise those readers never reach the database.
+
+    Returns:
+        List of {'name', 'sql', 'params'} dicts.
+    """
+    import db_utils
+
+    replays = [
+        ('get_latest_data_date', db_utils.get_latest_data_date, (station_keys[0], 1), {}),
+        ('get_hourly_data_for_stations', db_utils.get_hourly_data_for_stations,
+         (station_keys, start_date, end_date), {'directions': [1, 2]}),
+        ('get_hourly_data_for_stations[daily_total]', db_utils.get_hourly_data_for_stations,
+         (station_keys, start_date, end_date), {'required_cols': ['count_date', 'daily_total']}),
+        ('get_hourly_profile', db_utils.get_hourly_profile,
+         (station_keys, start_date, end_date), {'classification_seq': 1}),
+        ('get_hourly_profile[by_station]', db_utils.get_hourly_profile,
+         (station_keys, start_date, end_date), {'directions': [1], 'by_station': True}),
+        # Peak Hour Analysis: true peak mode, then fixed windows with the weekday profile
+        ('get_station_day_hours', db_utils.get_station_day_hours,
+         (station_keys, start_date, end_date), {'directions': [3]}),
+        ('get_peak_volumes', db_utils.get_peak_volumes,
+         (station_keys, start_date, end_date), {'directions': [3]}),
+        ('get_corridor_profiles[weekday]', db_utils.get_corridor_profiles,
+         (station_keys, start_date, end_date), {'directions': [3], 'day_type': 'Weekday'}),
+        # Corridor comparison (all days) and Heavy Vehicle Pattern Explorer, at their default selections
+        ('get_corridor_profiles', db_utils.get_corridor_profiles,
+         (station_keys, start_date, end_date), {'directions': [3], 'day_type': None}),
+        ('get_heavy_vehicle_pivot', db_utils.get_heavy_vehicle_pivot,
+         (station_keys, start_date, end_date), {'directions': [3], 'day_type': 'Weekday'}),
+    ]
+    workload = []
+    current = {'name': None}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if ADVISOR_TABLE in statement and statement.lstrip().upper().startswith('SELECT'):
+            workload.append({'name': current['name'], 'sql': statement, 'params': parameters})
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        with _postgres_only(db_utils), Session(engine) as session:
+            for name, reader, args, kwargs in replays:
+                current['name'] = name
+                _reader(reader)(session, *args, **kwargs)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    logger.info(f"Captured {len(workload)} queries from db_utils readers")
+    return workload
+
+def capture_stats_workload(engine, limit=STATS_QUERY_LIMIT):
+    """
+    Reads the most expensive SELECTs on hourly_counts from pg_stat_statements.
+    Returns an empty list when the extension is not installed.
+    """
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(text("""
+                SELECT query, calls, total_exec_time FROM pg_stat_statements
+                WHERE query ILIKE 'select%' AND query ILIKE :pattern
+                ORDER BY total_exec_time DESC LIMIT :limit
+            """), {'pattern': f"%{ADVISOR_TABLE}%", 'limit': limit}).all()
+    except SQLAlchemyError as e:
+        logger.warning(f"pg_stat_statements is not available: {e}")
+        return []
+    return [
+        {'name': f"pg_stat_statements #{i} ({calls} calls, {total_ms:,.0f} ms)", 'sql': query, 'params': None}
+        for i, (query, calls, total_ms) in enumerate(rows, start=1)
+    ]
+
+def explain_workload(engine, workload):
+    """
+    Runs EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) for each captured
+    query. Normalised pg_stat_statements text has $n placeholders, so those
+    get EXPLAIN (GENERIC_PLAN) instead (PostgreSQL 16+), without ANALYZE.
+    Every query runs in a transaction that is rolled back.
+
+    Returns:
+        The workload entries with a 'plan' (top plan node) and 'execution_ms'.
+    """
+    explained = []
+    dbapi_conn = engine.raw_connection()
+    try:
+        for entry in workload:
+            try:
+                with dbapi_conn.cursor() as cursor:
+                    if entry['params'] is None:
+                        cursor.execute(f"EXPLAIN (GENERIC_PLAN, VERBOSE, FORMAT JSON) {entry['sql']}")
+                    else:
+                        sql = cursor.mogrify(entry['sql'], entry['params']).decode()
+                        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) {sql}")
+                    result = cursor.fetchone()[0]
+                result = json.loads(result) if isinstance(result, str) else result
+                explained.append(dict(entry, plan=result[0]['Plan'], execution_ms=result[0].get('Execution Time')))
+            except Exception as e:
+                logger.warning(f"Could not explain {entry['name']}: {e}")
+            finally:
+                dbapi_conn.rollback()
+    finally:
+        dbapi_conn.close()
+    return explained
+
+def iter_plan_nodes(plan):
+    """Yields every node of an EXPLAIN JSON plan tree, depth first."""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from iter_plan_nodes(child)
+
+def _base_table(relation_name):
+    """Maps a yearly partition back to hourly_counts."""
+    return ADVISOR_TABLE if relation_name and PARTITION_NAME_PATTERN.match(relation_name) else relation_name
+
+def _node_conditions(node):
+    """Index, recheck and filter conditions of a scan, including its bitmap index children."""
+    conditions = [node.get(key, '') for key in ('Index Cond', 'Recheck Cond', 'Filter')]
+    for child in node.get('Plans', []):
+        if child.get('Node Type') == 'Bitmap Index Scan':
+            conditions.append(child.get('Index Cond', ''))
+    return ' '.join(conditions)
+
+def scan_needs_index(node):
+    """
+    Returns the reason a scan on hourly_counts would benefit from a new
+    index, or None: sequential scans, index scans that discard more rows
+    than they return, and plain index scans that still visit the heap.
+    """
+    node_type = node.get('Node Type')
+    if node_type == 'Seq Scan':
+        return 'sequential scan'
+    if node_type in ('Index Scan', 'Bitmap Heap Scan'):
+        returned = node.get('Actual Rows', 0) * node.get('Actual Loops', 1)
+        removed = node.get('Rows Removed by Filter', 0) + node.get('Rows Removed by Index Recheck', 0)
+        if removed > returned:
+            return f"{node_type.lower()} removed {removed} rows to return {returned}"
+        return f"{node_type.lower()} visits the heap"
+    return None
+
+def candidate_from_scan(node):
+    """
+    Derives a composite index for a scan from its conditions and output:
+    equality columns (EQUALITY_COLUMN_ORDER first), then the first range
+    column; output columns become INCLUDE columns when there are at most
+    MAX_INCLUDE_COLUMNS of them; a boolean filter becomes a partial-index
+    predicate. Returns None if the scan filters on nothing indexable.
+    """
+    conditions = _node_conditions(node)
+    equality, ranges, predicate = [], [], None
+    for column in TABLE_COLUMNS:
+        if column in BOOLEAN_COLUMNS:
+            match = re.search(rf"NOT\s+\(?(?:\w+\.)?{column}\b|\b{column}\s+IS\s+(?:NOT\s+)?(?:TRUE|FALSE)",
+                              conditions, re.IGNORECASE)
+            if match:
+                predicate = re.sub(r'\(|\w+\.', '', match.group(0)).upper().replace(column.upper(), column)
+            continue
+        if re.search(rf"\b{column}\s*=", conditions):
+            equality.append(column)
+        elif re.search(rf"\b{column}\s*(?:>=|<=|>|<(?!>))", conditions):
+            ranges.append(column)
+    if not equality and not ranges:
+        return None
+
+    def order(column):
+        return (EQUALITY_COLUMN_ORDER.index(column) if column in EQUALITY_COLUMN_ORDER else len(EQUALITY_COLUMN_ORDER),
+                TABLE_COLUMNS.index(column))
+
+    columns = sorted(equality, key=order) + ranges[:1]
+    outputs = [re.sub(r'^\w+\.', '', output) for output in node.get('Output', [])]
+    include = [col for col in dict.fromkeys(outputs) if col in TABLE_COLUMNS and col not in columns]
+    if len(include) > MAX_INCLUDE_COLUMNS:
+        include = []
+    return {'table': ADVISOR_TABLE, 'columns': columns, 'include': include, 'where': predicate}
+
+def index_name(candidate):
+    """ix_<table>_<columns>[_incl][_partial], shortened with a hash to fit PostgreSQL's 63-character limit."""
+    name = f"ix_{candidate['table']}_{'_'.join(candidate['columns'])}"
+    name += '_incl' if candidate['include'] else ''
+    name += '_partial' if candidate['where'] else ''
+    if len(name) > 55:
+        name = f"{name[:46]}_{_short_hash(json.dumps(candidate, sort_keys=True))}"
+    return name
+
+def _short_hash(value):
+    return hashlib.sha1(value.encode()).hexdigest()[:8]
+
+def get_index_inventory(engine, table_name=ADVISOR_TABLE):
+    """
+    Lists the indexes on `table_name` with key/INCLUDE columns, predicate,
+    size and scan count. For a partitioned table, sizes and scans are summed
+    over the partition indexes attached to each parent index.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(text("""
+            SELECT i.relname, ix.indisunique, ix.indisprimary, ix.indnkeyatts,
+                   ARRAY(SELECT a.attname FROM unnest(ix.indkey) WITH ORDINALITY AS k(attnum, ord)
+                         JOIN pg_attribute a ON a.attrelid = ix.indrelid AND a.attnum = k.attnum
+                         ORDER BY k.ord) AS columns,
+                   pg_get_expr(ix.indpred, ix.indrelid) AS predicate,
+                   pg_relation_size(i.oid) + COALESCE((
+                       SELECT SUM(pg_relation_size(inh.inhrelid)) FROM pg_inherits inh
+                       WHERE inh.inhparent = i.oid), 0) AS size_bytes,
+                   COALESCE(s.idx_scan, 0) + COALESCE((
+                       SELECT SUM(cs.idx_scan) FROM pg_inherits inh
+                       JOIN pg_stat_user_indexes cs ON cs.indexrelid = inh.inhrelid
+                       WHERE inh.inhparent = i.oid), 0) AS scans
+            FROM pg_index ix
+            JOIN pg_class i ON i.oid = ix.indexrelid
+            JOIN pg_class t ON t.oid = ix.indrelid
+            LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.oid
+            WHERE t.relname = :table_name
+        """), {'table_name': table_name}).all()
+    return [
+        {'name': name, 'unique': unique or primary, 'columns': list(columns[:key_count]),
+         'include': list(columns[key_count:]), 'where': predicate,
+         'size_bytes': int(size_bytes or 0), 'scans': int(scans or 0)}
+        for name, unique, primary, key_count, columns, predicate, size_bytes, scans in rows
+    ]
+
+def normalise_predicate(predicate):
+    """
+    Comparable form of an index predicate: pg_get_expr wraps it in parentheses
+    ("(NOT is_public_holiday)") where a candidate has none, so enclosing
+    parentheses are stripped, whitespace collapsed and case folded.
+    """
+    if predicate is None:
+        return None
+    predicate = ' '.join(predicate.split())
+    while predicate.startswith('(') and predicate.endswith(')'):
+        depth = 0
+        for position, char in enumerate(predicate):
+            depth += {'(': 1, ')': -1}.get(char, 0)
+            if depth == 0 and position < len(predicate) - 1:
+                break  # "(a) AND (b)": the first parenthesis closes early
+        else:
+            predicate = predicate[1:-1].strip()
+            continue
+        break
+    return predicate.lower()
+
+def is_covered(candidate, inventory):
+    """True if an existing index already serves `candidate`: same leading key columns, its INCLUDE columns and a compatible predicate."""
+    for index in inventory:
+        keys = index['columns']
+        if keys[:len(candidate['columns'])] != candidate['columns']:
+            continue
+        if not set(candidate['include']) <= set(keys + index['include']):
+            continue
+        if index['where'] is None or normalise_predicate(index['where']) == normalise_predicate(candidate['where']):
+            return True
+    return False
+
+def propose_indexes(explained, inventory):
+    """
+    Collects one candidate per distinct scan shape that needs help and is not
+    already covered by an existing index.
+
+    Returns:
+        List of candidate dicts with 'name' and the 'queries'/'reasons' behind them.
+    """
+    proposals = {}
+    for entry in explained:
+        for node in iter_plan_nodes(entry['plan']):
+            if _base_table(node.get('Relation Name')) != ADVISOR_TABLE:
+                continue
+            reason = scan_needs_index(node)
+            candidate = candidate_from_scan(node) if reason else None
+            if candidate is None or is_covered(candidate, inventory):
+                continue
+            name = index_name(candidate)
+            proposal = proposals.setdefault(name, dict(candidate, name=name, queries=[], reasons=[]))
+            if entry['name'] not in proposal['queries']:
+                proposal['queries'].append(entry['name'])
+            if reason not in proposal['reasons']:
+                proposal['reasons'].append(reason)
+    return list(proposals.values())
+
+def get_column_distinct_counts(engine, table_name=ADVISOR_TABLE):
+    """Estimated distinct values per column from pg_stats (negative n_distinct is a fraction of rows, i.e. high cardinality)."""
+    with engine.connect() as connection:
+        rows = connection.execute(text("""
+            SELECT attname, MAX(n_distinct) FROM pg_stats WHERE tablename = :table_name GROUP BY attname
+        """), {'table_name': table_name}).all()
+    return {name: float(n_distinct) for name, n_distinct in rows if n_distinct is not None}
+
+def flag_indexes(inventory, distinct_counts):
+    """
+    Flags non-unique indexes worth dropping:
+    - 'unused': never scanned since statistics were last reset;
+    - 'redundant': its key columns are a leading prefix of another index;
+    - 'low cardinality': a single column with at most LOW_CARDINALITY_MAX values
+      (e.g. month, day_of_week), which the planner rarely uses but every insert maintains.
+
+    Returns:
+        {index name: [flags]} for flagged indexes only.
+    """
+    flags = {}
+    for index in inventory:
+        if index['unique']:
+            continue
+        reasons = []
+        if index['scans'] == 0:
+            reasons.append('unused')
+        if index['where'] is None and any(
+                other is not index and len(other['columns']) > len(index['columns'])
+                and other['columns'][:len(index['columns'])] == index['columns']
+                for other in inventory):
+            reasons.append('redundant')
+        if len(index['columns']) == 1:
+            n_distinct = distinct_counts.get(index['columns'][0])
+            if n_distinct is not None and 0 < n_distinct <= LOW_CARDINALITY_MAX:
+                reasons.append('low cardinality')
+        if reasons:
+            flags[index['name']] = reasons
+    return flags
+
+def get_partition_names(engine, table_name=ADVISOR_TABLE):
+    """Names of the partitions attached to `table_name` (empty for a plain table)."""
+    with engine.connect() as connection:
+        return connection.execute(text("""
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = :table_name
+        """), {'table_name': table_name}).scalars().all()
+
+def index_ddl(candidate, name=None, table_name=None, concurrently=True, only=False):
+    """CREATE INDEX statement for a candidate, optionally on another table (a partition) or ON ONLY the parent."""
+    sql = "CREATE INDEX " + ("CONCURRENTLY " if concurrently else "")
+    sql += f"IF NOT EXISTS {name or candidate['name']} ON {'ONLY ' if only else ''}{table_name or candidate['table']} "
+    sql += f"({', '.join(candidate['columns'])})"
+    if candidate['include']:
+        sql += f" INCLUDE ({', '.join(candidate['include'])})"
+    if candidate['where']:
+        sql += f" WHERE {candidate['where']}"
+    return sql
+
+def apply_index(engine, candidate):
+    """
+    Builds a proposed index without blocking writes. A plain table gets
+    CREATE INDEX CONCURRENTLY. PostgreSQL cannot build a partitioned index
+    concurrently, so for a partitioned hourly_counts the parent index is
+    created ON ONLY the parent (invalid, instant), each partition's index is
+    built concurrently and attached, after which the parent becomes valid.
+    A failed concurrent build leaves an invalid index, which is dropped.
+    """
+    partitions = sorted(get_partition_names(engine, candidate['table']))
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if not partitions:
+            targets = [(candidate['name'], candidate['table'])]
+        else:
+            connection.execute(text(index_ddl(candidate, concurrently=False, only=True)))
+            suffix = _short_hash(candidate['name'])
+            targets = [(f"{partition}_ix{suffix}", partition) for partition in partitions]
+
+        for name, table_name in targets:
+            try:
+                connection.execute(text(index_ddl(candidate, name=name, table_name=table_name)))
+                if partitions:
+                    connection.execute(text(f"ALTER INDEX {candidate['name']} ATTACH PARTITION {name}"))
+                logger.info(f"Built index {name} on {table_name}")
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to build index {name} on {table_name}: {e}")
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                raise
+        connection.execute(text(f"ANALYZE {candidate['table']}"))
+
+def drop_flagged_index(engine, index_name_to_drop, partitioned):
+    """Drops an index (concurrently unless it belongs to a partitioned table, which PostgreSQL does not allow)."""
+    concurrently = '' if partitioned else 'CONCURRENTLY '
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text(f"DROP INDEX {concurrently}IF EXISTS {index_name_to_drop}"))
+    logger.info(f"Dropped index {index_name_to_drop}")
+
+def run_advisor(engine, source='app', station_keys=None, apply=False, drop_unused=False):
+    """
+    Captures the workload, explains it, prints proposed and flagged indexes
+    and, with `apply` / `drop_unused`, builds the proposals and drops indexes
+    flagged unused or redundant. Low-cardinality indexes are only reported.
+
+    Returns:
+        (proposals, flags)
+    """
+    workload = []
+    if source in ('app', 'both'):
+        sample_keys, start_date, end_date = choose_sample_scope(engine)
+        station_keys = station_keys or sample_keys
+        if station_keys:
+            print(f"Replaying db_utils readers for stations {station_keys}, {start_date} to {end_date}")
+            workload += capture_app_workload(engine, station_keys, start_date, end_date)
+        else:
+            print("No stations found; skipping the db_utils replay.")
+    if source in ('stats', 'both'):
+        workload += capture_stats_workload(engine)
+
+    explained = explain_workload(engine, workload)
+    inventory = get_index_inventory(engine)
+    proposals = propose_indexes(explained, inventory)
+    flags = flag_indexes(inventory, get_column_distinct_counts(engine))
+
+    print(f"\nExplained {len(explained)} queries:")
+    for entry in explained:
+        timing = f"{entry['execution_ms']:.1f} ms" if entry['execution_ms'] is not None else "generic plan"
+        scans = sorted({node['Node Type'] for node in iter_plan_nodes(entry['plan'])
+                        if _base_table(node.get('Relation Name')) == ADVISOR_TABLE})
+        print(f"  {entry['name']}: {timing}; {', '.join(scans) or 'no hourly_counts scan'}")
+
+    print(f"\nProposed indexes ({len(proposals)}):")
+    for proposal in proposals:
+        print(f"  {index_ddl(proposal)};")
+        print(f"    for {', '.join(proposal['queries'])} ({'; '.join(proposal['reasons'])})")
+
+    print(f"\nFlagged indexes ({len(flags)}):")
+    by_name = {index['name']: index for index in inventory}
+    for name, reasons in flags.items():
+        index = by_name[name]
+        print(f"  {name} ({', '.join(index['columns'])}): {', '.join(reasons)}; "
+              f"{index['scans']} scans, {index['size_bytes'] / 1e6:.1f} MB")
+
+    if apply:
+        for proposal in proposals:
+            apply_index(engine, proposal)
+            print(f"Built {proposal['name']}")
+    if drop_unused:
+        partitioned = bool(get_partition_names(engine))
+        for name, reasons in flags.items():
+            if 'unused' in reasons or 'redundant' in reasons:
+                drop_flagged_index(engine, name, partitioned)
+                print(f"Dropped {name}")
+    return proposals, flags
@@ -1,8 +1,10 @@
 import os
 import logging
+import argparse
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from db_utils import get_engine
+from db_index_advisor import run_advisor
 
 # Set up logging
 logger = logging.getLogger(__name__) # Get logger for this module
@@ -42,13 +44,19 @@ def drop_index(engine, table_name, index_name):
         print(f"Error dropping index {index_name} from table {table_name}: {e}")
 
 def get_existing_tables(engine):
-    """Retrieves a list of existing tables in the database."""
+    """
+    Retrieves a list of existing tables in the database. Yearly partitions of
+    hourly_counts are left out: indexes built on, and ANALYZE run on, the
+    partitioned parent cover them (autovacuum never analyzes the parent itself).
+    """
     try:
         with engine.connect() as connection :
             query = text("""
-                SELECT tablename
-                FROM pg_catalog.pg_tables
-                WHERE schemaname != 'pg_catalog' AND schemaname != 'information_schema';
+                SELECT c.relname
+                FROM pg_catalog.pg_class c
+                JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition
+                  AND n.nspname != 'pg_catalog' AND n.nspname != 'information_schema';
             """)
             result = connection.execute(query)
             tables = [row[0] for row in result]
@@ -91,13 +99,35 @@ def build_index(engine, table_name, column_name):
         print(f"Error building index on table {table_name}({column_name}): {e}")
 
 def main():
-    """Main function to drive the index building and dropping process."""
+    """
+    Main function to drive the index building and dropping process.
+    Interactive by default; `--advise` runs the workload-driven index advisor
+    non-interactively instead.
+    """
+    parser = argparse.ArgumentParser(description="Build, drop and analyze indexes.")
+    parser.add_argument('--advise', action='store_true',
+                        help="Explain the app's queries and propose covering/partial indexes")
+    parser.add_argument('--source', choices=['app', 'stats', 'both'], default='app',
+                        help="Replay db_utils readers, pg_stat_statements entries, or both")
+    parser.add_argument('--stations', type=int, nargs='+',
+                        help="Station keys to replay the readers with (default: best-covered stations)")
+    parser.add_argument('--apply', action='store_true',
+                        help="Build proposed indexes with CREATE INDEX CONCURRENTLY")
+    parser.add_argument('--drop-unused', action='store_true',
+                        help="Drop indexes flagged unused or redundant")
+    args = parser.parse_args()
+
     engine = get_engine()
     if not engine:
         logger.error("Failed to create database engine")
         print("Failed to create database engine. Check logs.")
         return
 
+    if args.advise:
+        run_advisor(engine, source=args.source, station_keys=args.stations,
+                    apply=args.apply, drop_unused=args.drop_unused)
+        return
+
     while True:
         print("\nChoose an action:")
         print("1. Drop Indexes")
@@ -0,0 +1,74 @@
+import logging
+import pandas as pd
+from models import DatasetVersion, IngestRun
+
+# --- CONFIGURABLE PARAMETERS ---
+DATASET_NAME = 'traffic'  # Must match DATASET_NAME in app/query_cache.py
+# -----------------------------
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+def ensure_ingest_run_tables(engine):
+    """Creates dataset_version and ingest_runs if they do not exist yet."""
+    DatasetVersion.__table__.create(engine, checkfirst=True)
+    IngestRun.__table__.create(engine, checkfirst=True)
+
+def chunk_date_range(prepared):
+    """Returns (min count_date, max count_date) of a prepared hourly chunk, or None if it is empty."""
+    if prepared.empty:
+        return None
+    dates = pd.to_datetime(prepared['count_date'])
+    return dates.min().date(), dates.max().date()
+
+def widen_date_range(current, other):
+    """Union of two (min, max) date ranges, either of which may be None."""
+    if current is None:
+        return other
+    if other is None:
+        return current
+    return min(current[0], other[0]), max(current[1], other[1])
+
+def bump_dataset_version(dbapi_conn, dataset_name=DATASET_NAME):
+    """Increments and returns the dataset_version stamp read by the app's query cache. The caller commits."""
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO dataset_version (name, version, updated_at) VALUES (%s, 1, now()) "
+            "ON CONFLICT (name) DO UPDATE SET version = dataset_version.version + 1, updated_at = now() "
+            "RETURNING version",
+            (dataset_name,),
+        )
+        return cursor.fetchone()[0]
+
+def record_ingest_run(dbapi_conn, station_year_pairs, date_range, rows_loaded, source=None,
+                      dataset_name=DATASET_NAME):
+    """
+    Bumps the dataset version and records what the run changed, so the app
+    only invalidates cached results for overlapping stations and dates.
+    The caller commits, normally in the same transaction as the load.
+
+    Args:
+        dbapi_conn: A psycopg2 connection.
+        station_year_pairs: (station_key, year) pairs loaded by the run, or
+            None when every station may have changed (e.g. a detached year).
+        date_range: (min, max) count_date loaded, or None.
+        rows_loaded: Rows written to hourly_counts.
+        source: Free-text description of the input (file path, 'parallel', ...).
+
+    Returns:
+        The new dataset version.
+    """
+    station_keys = None if station_year_pairs is None else sorted({int(key) for key, _ in station_year_pairs})
+    min_date, max_date = date_range if date_range else (None, None)
+    version = bump_dataset_version(dbapi_conn, dataset_name)
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO ingest_runs (dataset_name, version, station_keys, min_date, max_date, rows_loaded, source, finished_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, now())",
+            (dataset_name, version, station_keys, min_date, max_date, int(rows_loaded), source),
+        )
+    logger.info(
+        f"Recorded ingest run: version {version}, {'all' if station_keys is None else len(station_keys)} stations, "
+        f"{min_date} to {max_date}, {rows_loaded} rows"
+    )
+    return version
@@ -0,0 +1,310 @@
+import os
+import sys
+import glob
+import time
+import hashlib
+import logging
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.exc import SQLAlchemyError
+from log_config import setup_logging
+from models import IngestCheckpoint
+from db_utils import get_engine
+from db_data_ingestion import (
+    CSV_CHUNK_SIZE,
+    LOAD_MODE,
+    iter_hourly_chunks,
+    transform_hourly_chunk,
+    filter_by_high_water_mark,
+)
+from db_copy_loader import (
+    copy_hourly_chunk,
+    ensure_hourly_natural_key,
+    load_high_water_marks,
+)
+from db_summary_tables import ensure_summary_schema, station_years, refresh_station_summaries
+from db_ingest_runs import ensure_ingest_run_tables, chunk_date_range, widen_date_range, record_ingest_run
+from db_partitions import ensure_partitions_for_chunk
+from db_bulk_mode import bulk_load_mode
+from db_parquet_export import refresh_parquet_cache
+from contextlib import nullcontext
+
+# --- CONFIGURABLE PARAMETERS ---
+DEFAULT_WORKERS = os.cpu_count() or 1  # One worker per core; each holds its own DB connection
+HASH_BLOCK_SIZE = 8 * 1024 * 1024  # Bytes read per step when fingerprinting a file
+# -----------------------------
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+UPSERT_CHECKPOINT_SQL = """
+    INSERT INTO ingest_checkpoints (file_path, file_size, file_hash, rows_read, rows_loaded, status, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, now())
+    ON CONFLICT (file_path) DO UPDATE SET
+        file_size = EXCLUDED.file_size,
+        file_hash = EXCLUDED.file_hash,
+        rows_read = EXCLUDED.rows_read,
+        rows_loaded = EXCLUDED.rows_loaded,
+        status = EXCLUDED.status,
+        updated_at = now()
+"""
+
+def resolve_input_files(patterns):
+    """
+    Expands directories and glob patterns into a sorted, de-duplicated list of CSV files.
+
+    Args:
+        patterns: Iterable of directory paths, file paths or glob patterns.
+
+    Returns:
+        List of absolute file paths.
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.csv'))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        if not matches:
+            logger.warning(f"No files matched: {pattern}")
+        files.update(os.path.abspath(path) for path in matches if os.path.isfile(path))
+    return sorted(files)
+
+def file_fingerprint(file_path):
+    """Returns (size in bytes, sha256 hex digest) for a file, reading it in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return os.path.getsize(file_path), digest.hexdigest()
+
+def read_checkpoint(dbapi_conn, file_path):
+    """Returns the checkpoint row for a file as a dict, or None if it has never been seen."""
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT file_size, file_hash, rows_read, rows_loaded, status "
+            "FROM ingest_checkpoints WHERE file_path = %s",
+            (file_path,),
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip(['file_size', 'file_hash', 'rows_read', 'rows_loaded', 'status'], row))
+
+def write_checkpoint(dbapi_conn, file_path, file_size, file_hash, rows_read, rows_loaded, status):
+    """Upserts a file's checkpoint row (the caller commits)."""
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            UPSERT_CHECKPOINT_SQL,
+            (file_path, file_size, file_hash, int(rows_read), int(rows_loaded), status),
+        )
+
+def ingest_file(db_url, file_path, valid_station_keys, chunksize=CSV_CHUNK_SIZE, force=False,
+                load_mode=LOAD_MODE, high_water_marks=None):
+    """
+    Worker entry point: parses, transforms and COPYs one CSV file.
+
+    Runs in a separate process with its own engine and connection. Each chunk
+    is committed together with the file's checkpoint, so after a crash the
+    file resumes at the first uncommitted chunk. Files whose size and hash
+    match a completed checkpoint are skipped unless `force` is set. In
+    'upsert'/'incremental' mode chunks are merged on the natural key, and in
+    'incremental' mode rows before each station's high-water mark are dropped.
+
+    Returns:
+        Dict summarising the outcome for this file.
+    """
+    started = time.perf_counter()
+    engine = create_engine(db_url, poolclass=NullPool)
+    dbapi_conn = engine.raw_connection()
+    # Returned even on failure: committed chunks still need summaries and an ingest run record
+    affected_station_years = set()
+    loaded_date_range = None
+    try:
+        file_size, file_hash = file_fingerprint(file_path)
+        checkpoint = read_checkpoint(dbapi_conn, file_path)
+        rows_read = rows_loaded = 0
+
+        if checkpoint and not force and checkpoint['file_hash'] == file_hash:
+            if checkpoint['status'] == 'complete':
+                logger.info(f"Skipping {file_path}: already loaded ({checkpoint['rows_loaded']} rows)")
+                return {'file': file_path, 'status': 'skipped', 'rows_loaded': 0, 'seconds': 0.0,
+                        'station_years': set(), 'date_range': None}
+            rows_read, rows_loaded = checkpoint['rows_read'], checkpoint['rows_loaded']
+            logger.info(f"Resuming {file_path} after {rows_read} rows")
+        elif checkpoint and checkpoint['file_hash'] != file_hash:
+            logger.warning(f"{file_path} changed since its last checkpoint; loading it from the start")
+
+        write_checkpoint(dbapi_conn, file_path, file_size, file_hash, rows_read, rows_loaded, 'in_progress')
+        dbapi_conn.commit()
+
+        loaded_this_run = 0
+        for chunk in iter_hourly_chunks(file_path, chunksize=chunksize, skip_rows=rows_read):
+            prepared, _, _ = transform_hourly_chunk(chunk, valid_station_keys)
+            prepared, _ = filter_by_high_water_mark(prepared, high_water_marks)
+            affected_station_years |= station_years(prepared)
+            loaded_date_range = widen_date_range(loaded_date_range, chunk_date_range(prepared))
+            if ensure_partitions_for_chunk(dbapi_conn, prepared):
+                dbapi_conn.commit()  # Release the parent lock before the COPY
+            copied = copy_hourly_chunk(dbapi_conn, prepared, upsert=load_mode != 'append')
+            rows_read += len(chunk)
+            rows_loaded += copied
+            loaded_this_run += copied
+            # Data and progress commit atomically, so a resume never double-loads a chunk
+            write_checkpoint(dbapi_conn, file_path, file_size, file_hash, rows_read, rows_loaded, 'in_progress')
+            dbapi_conn.commit()
+
+        write_checkpoint(dbapi_conn, file_path, file_size, file_hash, rows_read, rows_loaded, 'complete')
+        dbapi_conn.commit()
+        elapsed = time.perf_counter() - started
+        logger.info(f"Loaded {loaded_this_run} rows from {file_path} in {elapsed:.1f}s")
+        return {'file': file_path, 'status': 'complete', 'rows_loaded': loaded_this_run, 'seconds': elapsed,
+                'station_years': affected_station_years, 'date_range': loaded_date_range}
+
+    except Exception as e:
+        dbapi_conn.rollback()
+        logger.error(f"Failed to ingest {file_path}: {e}", exc_info=True)
+        return {'file': file_path, 'status': 'failed', 'rows_loaded': 0, 'error': str(e),
+                'seconds': time.perf_counter() - started, 'station_years': affected_station_years,
+                'date_range': loaded_date_range}
+    finally:
+        dbapi_conn.close()
+        engine.dispose()
+
+def load_valid_station_keys(engine):
+    """Reads all station keys once so workers do not each query the stations table."""
+    with engine.connect() as conn:
+        keys = conn.execute(text("SELECT station_key FROM stations")).scalars().all()
+    return np.asarray(keys, dtype=np.int64)
+
+def prepare_incremental_load(engine, load_mode):
+    """Adds the natural-key constraint if needed and returns high-water marks for 'incremental' mode."""
+    dbapi_conn = engine.raw_connection()
+    try:
+        if load_mode != 'append':
+            ensure_hourly_natural_key(dbapi_conn)
+            dbapi_conn.commit()
+        return load_high_water_marks(dbapi_conn) if load_mode == 'incremental' else {}
+    finally:
+        dbapi_conn.close()
+
+def finalise_load(engine, station_year_pairs, date_range, rows_loaded):
+    """
+    Rebuilds the summary tables once for every station-year loaded by the
+    workers and records the ingest run, in one transaction, so the app
+    invalidates only cached results that overlap the loaded stations and dates.
+    """
+    if not station_year_pairs:
+        logger.info("No new rows loaded; summaries and dataset version left unchanged")
+        return
+    dbapi_conn = engine.raw_connection()
+    try:
+        refresh_station_summaries(dbapi_conn, station_year_pairs)
+        record_ingest_run(dbapi_conn, station_year_pairs, date_range, rows_loaded, source='parallel')
+        dbapi_conn.commit()
+    finally:
+        dbapi_conn.close()
+
+def run_parallel_ingestion(patterns, workers=DEFAULT_WORKERS, chunksize=CSV_CHUNK_SIZE, force=False,
+                           load_mode=LOAD_MODE, bulk=False):
+    """
+    Ingests every CSV matched by `patterns` using a pool of worker processes.
+    With `bulk`, secondary hourly_counts indexes are dropped for the load and
+    rebuilt in parallel (then analyzed) once every worker has finished.
+
+    Returns:
+        True if every file completed or was skipped, False otherwise.
+    """
+    files = resolve_input_files(patterns)
+    if not files:
+        logger.error("No input files found.")
+        return False
+
+    engine = get_engine()
+    if engine is None:
+        logger.error("Failed to create database engine")
+        return False
+
+    try:
+        IngestCheckpoint.__table__.create(engine, checkfirst=True)
+        ensure_summary_schema(engine)
+        ensure_ingest_run_tables(engine)
+        valid_station_keys = load_valid_station_keys(engine)
+        high_water_marks = prepare_incremental_load(engine, load_mode)
+        db_url = engine.url.render_as_string(hide_password=False)
+    except SQLAlchemyError as e:
+        logger.error(f"Could not prepare ingestion: {e}")
+        return False
+    finally:
+        engine.dispose()  # Close pooled connections before forking workers; the engine stays usable
+
+    logger.info(f"Ingesting {len(files)} files with {workers} workers ({len(valid_station_keys)} valid station keys)")
+    started = time.perf_counter()
+    total_rows = 0
+    failures = 0
+    affected_station_years = set()
+    loaded_date_range = None
+    try:
+        with bulk_load_mode(engine) if bulk else nullcontext():
+            engine.dispose()  # Bulk mode used the pool; close it again before forking
+            with ProcessPoolExecutor(max_workers=workers, initializer=setup_logging) as pool:
+                futures = [
+                    pool.submit(ingest_file, db_url, path, valid_station_keys, chunksize, force,
+                                load_mode, high_water_marks)
+                    for path in files
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    total_rows += result['rows_loaded']
+                    affected_station_years |= result['station_years']
+                    loaded_date_range = widen_date_range(loaded_date_range, result['date_range'])
+                    if result['status'] == 'failed':
+                        failures += 1
+                    print(f"{result['status']:>9}  {result['rows_loaded']:>12,} rows  {result['file']}")
+    except Exception as e:
+        # In bulk mode the index snapshot stays in app/logs; the next bulk run or `db_bulk_mode.py restore` rebuilds them
+        logger.error(f"Parallel load failed: {e}", exc_info=True)
+        failures += 1
+
+    # Summaries are refreshed once in the parent so workers never contend on the same station-year
+    try:
+        finalise_load(engine, affected_station_years, loaded_date_range, total_rows)
+    except Exception as e:
+        logger.error(f"Failed to refresh summary tables: {e}")
+        failures += 1
+    else:
+        try:
+            refresh_parquet_cache(engine)  # No-op unless a local Parquet export exists
+        except Exception as e:
+            logger.error(f"Failed to refresh the Parquet cache: {e}")
+    finally:
+        engine.dispose()
+
+    elapsed = time.perf_counter() - started
+    rate = total_rows / elapsed if elapsed else 0
+    print(f"\nLoaded {total_rows:,} rows from {len(files)} files in {elapsed:.1f}s ({rate:,.0f} rows/s), {failures} failed")
+    logger.info(f"Parallel ingestion finished: {total_rows} rows, {elapsed:.1f}s, {rate:,.0f} rows/s, {failures} failed files")
+    return failures == 0
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Parallel, resumable ingestion of RMS hourly count CSV files.")
+    parser.add_argument('paths', nargs='+', help="CSV files, directories or glob patterns (quote globs)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Number of worker processes")
+    parser.add_argument('--chunksize', type=int, default=CSV_CHUNK_SIZE, help="CSV rows per chunk")
+    parser.add_argument('--force', action='store_true', help="Reload files even if checkpointed as complete")
+    parser.add_argument('--mode', choices=['append', 'upsert', 'incremental'], default=LOAD_MODE,
+                        help="append: plain insert; upsert: merge on natural key; incremental: upsert rows at or after each station's high-water mark")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Drop secondary hourly_counts indexes during the load and rebuild them afterwards")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    return run_parallel_ingestion(args.paths, workers=args.workers, chunksize=args.chunksize,
+                                  force=args.force, load_mode=args.mode, bulk=args.bulk)
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
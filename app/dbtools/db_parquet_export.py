@@ -0,0 +1,286 @@
+import os
+import re
+import sys
+import json
+import shutil
+import logging
+import argparse
+import datetime
+import pandas as pd
+from sqlalchemy import text
+from db_utils import get_engine, compact_hourly_dtypes
+from data_sources import (
+    get_data_source_settings,
+    hourly_file_schema,
+    HOURLY_COLUMN_NAMES,
+    PARTITION_COLUMNS,
+    PARQUET_FILE_NAME,
+    PARQUET_ROW_GROUP_SIZE,
+    MANIFEST_FILE_NAME,
+    STATIONS_FILE_NAME,
+)
+from db_ingest_runs import DATASET_NAME
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # The export is skipped without pyarrow; ingestion still works
+    pa = pq = None
+
+try:
+    import duckdb
+except ImportError:  # Only needed to build the DuckDB database
+    duckdb = None
+
+# --- CONFIGURABLE PARAMETERS ---
+EXPORT_STATION_BATCH = 200  # Stations fetched per query when exporting a year
+# -----------------------------
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+PARTITION_DIR_PATTERN = re.compile(r'^station_key=(\d+)$')
+YEAR_DIR_PATTERN = re.compile(r'^year=(\d{4})$')
+FILE_COLUMNS = [col for col in HOURLY_COLUMN_NAMES if col not in PARTITION_COLUMNS]
+
+def read_manifest(root):
+    path = os.path.join(root, MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as infile:
+        return json.load(infile)
+
+def write_manifest(root, dataset_version, complete=True):
+    """Writes the manifest atomically; readers only use an export whose manifest is complete."""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_FILE_NAME)
+    with open(f"{path}.tmp", 'w') as outfile:
+        json.dump({'dataset_version': int(dataset_version), 'complete': complete,
+                   'updated_at': datetime.datetime.now().isoformat()}, outfile, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+def partition_dir(root, year, station_key):
+    return os.path.join(root, f"year={int(year)}", f"station_key={int(station_key)}")
+
+def existing_partitions(root):
+    """(station_key, year) pairs that have a partition directory under `root`."""
+    pairs = set()
+    if not os.path.isdir(root):
+        return pairs
+    for year_dir in os.listdir(root):
+        year_match = YEAR_DIR_PATTERN.match(year_dir)
+        if not year_match:
+            continue
+        for station_dir in os.listdir(os.path.join(root, year_dir)):
+            station_match = PARTITION_DIR_PATTERN.match(station_dir)
+            if station_match:
+                pairs.add((int(station_match.group(1)), int(year_match.group(1))))
+    return pairs
+
+def write_partition(root, year, station_key, df):
+    """Writes one station-year, sorted by date so row-group statistics prune date filters; replaced atomically."""
+    directory = partition_dir(root, year, station_key)
+    os.makedirs(directory, exist_ok=True)
+    df = df.sort_values(['count_date', 'traffic_direction_seq', 'classification_seq'])
+    table = pa.Table.from_pandas(df[FILE_COLUMNS], schema=hourly_file_schema(), preserve_index=False)
+    path = os.path.join(directory, PARQUET_FILE_NAME)
+    pq.write_table(table, f"{path}.tmp", row_group_size=PARQUET_ROW_GROUP_SIZE, compression='zstd')
+    os.replace(f"{path}.tmp", path)
+
+def remove_partition(root, year, station_key):
+    shutil.rmtree(partition_dir(root, year, station_key), ignore_errors=True)
+
+def export_stations(engine, root):
+    """Writes the stations table (geometry as the same hex EWKB PostgreSQL returns) to STATIONS_FILE_NAME."""
+    df = pd.read_sql(text("SELECT * FROM stations"), engine)
+    path = os.path.join(root, STATIONS_FILE_NAME)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    logger.info(f"Exported {len(df)} stations")
+
+def build_duckdb_database(root, database_path):
+    """
+    Loads the Parquet export into a DuckDB database file: hourly_counts
+    sorted by station and date (so DuckDB's zone maps skip blocks), stations,
+    and a `_meta` table with the export's dataset version. Built under a
+    temporary name and renamed, so readers never open a half-built file.
+    """
+    if duckdb is None:
+        logger.warning("duckdb is not installed; skipping the DuckDB build")
+        return False
+    manifest = read_manifest(root)
+    if manifest is None or not manifest.get('complete'):
+        logger.warning(f"No complete Parquet export at {root}; skipping the DuckDB build")
+        return False
+    temporary_path = f"{database_path}.tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    partitions = os.path.join(root, 'year=*', 'station_key=*', PARQUET_FILE_NAME).replace("'", "''")
+    stations = os.path.join(root, STATIONS_FILE_NAME).replace("'", "''")
+    connection = duckdb.connect(temporary_path)
+    try:
+        connection.execute(
+            f"CREATE TABLE hourly_counts AS SELECT {', '.join(HOURLY_COLUMN_NAMES)} FROM read_parquet('{partitions}', "
+            "hive_partitioning = true, hive_types = {'year': SMALLINT, 'station_key': INTEGER}) "
+            "ORDER BY station_key, count_date"
+        )
+        if os.path.exists(os.path.join(root, STATIONS_FILE_NAME)):
+            connection.execute(f"CREATE TABLE stations AS SELECT * FROM read_parquet('{stations}')")
+        connection.execute("CREATE TABLE _meta AS SELECT CAST(? AS BIGINT) AS dataset_version",
+                           [int(manifest['dataset_version'])])
+    finally:
+        connection.close()
+    os.replace(temporary_path, database_path)
+    logger.info(f"Built DuckDB database {database_path} at version {manifest['dataset_version']}")
+    return True
+
+def export_station_years(engine, root, station_year_pairs):
+    """
+    Re-exports the given (station_key, year) pairs from hourly_counts. Pairs
+    that no longer have rows lose their partition directory.
+
+    Returns:
+        Number of rows written.
+    """
+    by_year = {}
+    for station_key, year in station_year_pairs:
+        by_year.setdefault(int(year), set()).add(int(station_key))
+
+    rows_written = 0
+    query = text(f"SELECT {', '.join(HOURLY_COLUMN_NAMES)} FROM hourly_counts "
+                 "WHERE year = :year AND station_key = ANY(:station_keys)")
+    for year, station_keys in sorted(by_year.items()):
+        station_keys = sorted(station_keys)
+        for start in range(0, len(station_keys), EXPORT_STATION_BATCH):
+            batch = station_keys[start:start + EXPORT_STATION_BATCH]
+            df = compact_hourly_dtypes(pd.read_sql(query, engine, params={'year': year, 'station_keys': batch}))
+            df['count_date'] = pd.to_datetime(df['count_date']).dt.date
+            found = set()
+            for station_key, station_df in df.groupby('station_key'):
+                write_partition(root, year, station_key, station_df)
+                found.add(int(station_key))
+                rows_written += len(station_df)
+            for station_key in set(batch) - found:
+                remove_partition(root, year, station_key)
+        logger.info(f"Exported {len(station_keys)} stations for {year}")
+    return rows_written
+
+def changed_station_years(connection, root, after_version, up_to_version):
+    """
+    Station-years touched by the ingest runs in (after_version, up_to_version].
+    A run recorded for all stations expands to every station with rows, or
+    an existing partition, in its years.
+
+    Returns:
+        Set of pairs, or None if a version has no ingest run (the caller does a full export).
+    """
+    runs = connection.execute(text("""
+        SELECT version, station_keys, min_date, max_date FROM ingest_runs
+        WHERE dataset_name = :name AND version > :after AND version <= :up_to
+    """), {'name': DATASET_NAME, 'after': after_version, 'up_to': up_to_version}).all()
+    if len({run.version for run in runs}) < up_to_version - after_version:
+        return None
+
+    exported = existing_partitions(root)
+    pairs = set()
+    for _, station_keys, min_date, max_date in runs:
+        if min_date is None or max_date is None:
+            return None
+        years = range(min_date.year, max_date.year + 1)
+        if station_keys is None:
+            rows = connection.execute(
+                text("SELECT DISTINCT station_key, year FROM hourly_counts WHERE year BETWEEN :first AND :last"),
+                {'first': years[0], 'last': years[-1]}
+            ).all()
+            pairs |= {(int(key), int(year)) for key, year in rows}
+            pairs |= {(key, year) for key, year in exported if year in years}
+        else:
+            pairs |= {(int(key), year) for key in station_keys for year in years}
+    return pairs
+
+def refresh_parquet_cache(engine, root=None, full=False, duckdb_path=None):
+    """
+    Brings the Parquet export up to the current dataset version.
+
+    Incremental refreshes re-export only the station-years named by the
+    ingest runs since the manifest's version. A full export rewrites
+    everything and removes partitions with no rows left. Without an existing
+    export and `full`, nothing is done, so ingestion on a machine without a
+    local cache is unaffected. A DuckDB database is rebuilt afterwards if
+    `duckdb_path` is given or the configured one already exists.
+
+    Returns:
+        Number of rows written.
+    """
+    if pa is None:
+        logger.warning("pyarrow is not installed; skipping the Parquet export")
+        return 0
+    settings = get_data_source_settings()
+    root = root or settings['parquet_dir']
+    if duckdb_path is None and os.path.exists(settings['duckdb_path']):
+        duckdb_path = settings['duckdb_path']
+    manifest = read_manifest(root)
+    if manifest is None and not full:
+        logger.debug(f"No Parquet export at {root}; nothing to refresh")
+        return 0
+
+    with engine.connect() as connection:
+        version = connection.execute(
+            text("SELECT version FROM dataset_version WHERE name = :name"), {'name': DATASET_NAME}
+        ).scalar() or 0
+        pairs = None
+        if manifest is not None and not full:
+            if int(manifest['dataset_version']) >= version:
+                logger.info(f"Parquet export at {root} is current (version {version})")
+                return 0
+            pairs = changed_station_years(connection, root, int(manifest['dataset_version']), version)
+            if pairs is None:
+                logger.warning("Ingest history is incomplete since the last export; re-exporting everything")
+        if pairs is None:
+            full = True
+            pairs = {(int(key), int(year)) for key, year in connection.execute(
+                text("SELECT DISTINCT station_key, year FROM hourly_counts")).all()}
+
+    if full:
+        write_manifest(root, manifest['dataset_version'] if manifest else 0, complete=False)
+        for station_key, year in existing_partitions(root) - pairs:
+            remove_partition(root, year, station_key)
+    rows_written = export_station_years(engine, root, pairs)
+    export_stations(engine, root)
+    write_manifest(root, version)
+    logger.info(f"Parquet export at {root} refreshed to version {version}: "
+                f"{len(pairs)} station-years, {rows_written} rows")
+    if duckdb_path:
+        build_duckdb_database(root, duckdb_path)
+    return rows_written
+
+def main(argv=None):
+    """Command-line entry point: create (--full) or refresh the local Parquet export."""
+    from log_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Export hourly_counts to a local Parquet cache.")
+    parser.add_argument('--root', help="Export directory (default: data_source.parquet_dir setting)")
+    parser.add_argument('--full', action='store_true', help="Re-export every station-year")
+    parser.add_argument('--duckdb', nargs='?', const='', metavar='PATH',
+                        help="Also build a DuckDB database (default path: data_source.duckdb_path setting)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    engine = get_engine()
+    if engine is None:
+        logger.error("Failed to create database engine")
+        return False
+    try:
+        duckdb_path = (args.duckdb or get_data_source_settings()['duckdb_path']) if args.duckdb is not None else None
+        rows = refresh_parquet_cache(engine, root=args.root, full=args.full, duckdb_path=duckdb_path)
+        print(f"Wrote {rows:,} rows")
+        return True
+    except Exception as e:
+        logger.error(f"Parquet export failed: {e}", exc_info=True)
+        print(f"Error: {e}")
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,220 @@
+import re
+import sys
+import logging
+import argparse
+import datetime
+from sqlalchemy import MetaData, PrimaryKeyConstraint
+from models import Station, HourlyCount
+
+# --- CONFIGURABLE PARAMETERS ---
+PARTITION_NAME_TEMPLATE = 'hourly_counts_y{year}'  # One partition per calendar year of count_date
+PARTITION_LOCK_KEY = 7203911  # pg_advisory_xact_lock key serialising partition creation across workers
+# -----------------------------
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+PARTITION_NAME_PATTERN = re.compile(r'^hourly_counts_y(\d{4})$')
+
+# Per-process cache so ingestion only queries the catalog when it meets a new year
+_partition_state = {'partitioned': None, 'years': set()}
+
+def build_partitioned_hourly_table(metadata=None):
+    """
+    Returns a copy of the hourly_counts Table declared as
+    `PARTITION BY RANGE (count_date)`.
+
+    PostgreSQL requires every primary key and unique constraint of a
+    partitioned table to include the partition key, so the primary key
+    becomes (count_id, count_date); the natural key already contains
+    count_date. Indexes declared on the parent cascade to each partition.
+    """
+    metadata = metadata if metadata is not None else MetaData()
+    if 'stations' not in metadata.tables:
+        Station.__table__.to_metadata(metadata)  # Needed to resolve the station_key foreign key
+    table = HourlyCount.__table__.to_metadata(metadata)
+    table.c.count_id.autoincrement = True
+    table.c.count_date.primary_key = True
+    table.append_constraint(PrimaryKeyConstraint('count_id', 'count_date'))
+    table.dialect_options['postgresql']['partition_by'] = 'RANGE (count_date)'
+    return table
+
+def partition_name(year):
+    return PARTITION_NAME_TEMPLATE.format(year=int(year))
+
+def create_year_partition_sql(year):
+    """DDL for the partition holding count_date in [year-01-01, year+1-01-01)."""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF hourly_counts "
+        f"FOR VALUES FROM ('{datetime.date(int(year), 1, 1)}') TO ('{datetime.date(int(year) + 1, 1, 1)}')"
+    )
+
+def create_partitioned_hourly_counts(engine, years=()):
+    """
+    Creates hourly_counts as a range-partitioned parent plus one partition per
+    year in `years`. Fails if an unpartitioned hourly_counts already exists.
+    """
+    table = build_partitioned_hourly_table()
+    with engine.begin() as conn:
+        relkind = conn.exec_driver_sql(
+            "SELECT relkind FROM pg_class WHERE relname = 'hourly_counts' AND relkind IN ('r', 'p')"
+        ).scalar()
+        if relkind == 'r':
+            raise RuntimeError("hourly_counts already exists as a regular table; drop or rename it first")
+        table.create(conn, checkfirst=True)
+        for year in sorted(set(years)):
+            conn.exec_driver_sql(create_year_partition_sql(year))
+    logger.info(f"Created partitioned hourly_counts with {len(set(years))} yearly partitions")
+
+def is_partitioned(dbapi_conn):
+    """True if hourly_counts is a partitioned table."""
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = 'hourly_counts'"
+        )
+        return cursor.fetchone() is not None
+
+def existing_year_partitions(dbapi_conn):
+    """Returns {year: partition table name} for the partitions attached to hourly_counts."""
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = 'hourly_counts'"
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            partitions[int(match.group(1))] = name
+    return partitions
+
+def ensure_year_partitions(dbapi_conn, years):
+    """
+    Creates any missing yearly partitions for `years`. No-op when
+    hourly_counts is not partitioned.
+
+    Creating a partition locks the parent, so call this at the start of a
+    transaction (before any COPY into hourly_counts) and commit straight
+    after; an advisory lock stops parallel workers racing on the same year.
+
+    Returns:
+        List of years whose partitions were created.
+    """
+    if _partition_state['partitioned'] is None:
+        _partition_state['partitioned'] = is_partitioned(dbapi_conn)
+    if not _partition_state['partitioned']:
+        return []
+
+    wanted = {int(year) for year in years} - _partition_state['years']
+    if not wanted:
+        return []
+    existing = set(existing_year_partitions(dbapi_conn))
+    _partition_state['years'] |= existing
+    missing = sorted(wanted - existing)
+    if not missing:
+        return []
+
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_KEY,))
+        for year in missing:
+            cursor.execute(create_year_partition_sql(year))
+            logger.info(f"Created partition {partition_name(year)}")
+    _partition_state['years'] |= set(missing)
+    return missing
+
+def ensure_partitions_for_chunk(dbapi_conn, prepared):
+    """Ensures partitions exist for every year in a prepared hourly chunk; returns True if any were created."""
+    if prepared.empty:
+        return False
+    return bool(ensure_year_partitions(dbapi_conn, prepared['year'].unique()))
+
+def detach_year_partition(dbapi_conn, year, drop=False):
+    """
+    Detaches (and optionally drops) the partition for `year`, removing that
+    year from hourly_counts without a row-by-row DELETE. Summary rows for the
+    year are deleted too. The caller commits and records the change.
+
+    Returns:
+        True if a partition was detached.
+    """
+    name = partition_name(year)
+    if int(year) not in existing_year_partitions(dbapi_conn):
+        logger.warning(f"No attached partition {name}")
+        return False
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE hourly_counts DETACH PARTITION {name}")
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
+        for summary_table in ('station_year_metrics', 'station_profile_hourly'):
+            cursor.execute(f"DELETE FROM {summary_table} WHERE year = %s", (int(year),))
+    _partition_state['years'].discard(int(year))
+    logger.info(f"{'Dropped' if drop else 'Detached'} partition {name}")
+    return True
+
+def parse_years(values):
+    """Expands ['2019', '2021-2023'] into [2019, 2021, 2022, 2023]."""
+    years = set()
+    for value in values:
+        if '-' in value:
+            start, end = value.split('-', 1)
+            years.update(range(int(start), int(end) + 1))
+        else:
+            years.add(int(value))
+    return sorted(years)
+
+def main(argv=None):
+    """Command-line entry point for managing yearly hourly_counts partitions."""
+    from log_config import setup_logging
+    from db_utils import get_engine
+    from db_ingest_runs import record_ingest_run
+
+    parser = argparse.ArgumentParser(description="Manage yearly partitions of hourly_counts.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="List attached yearly partitions")
+    create_parser = subparsers.add_parser('create', help="Create partitions, e.g. 2006-2025")
+    create_parser.add_argument('years', nargs='+')
+    detach_parser = subparsers.add_parser('detach', help="Detach a year's partition")
+    detach_parser.add_argument('year', type=int)
+    detach_parser.add_argument('--drop', action='store_true', help="Drop the detached partition")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    engine = get_engine()
+    if engine is None:
+        logger.error("Failed to create database engine")
+        return False
+
+    dbapi_conn = engine.raw_connection()
+    try:
+        if not is_partitioned(dbapi_conn):
+            print("hourly_counts is not partitioned; recreate it with `python app/init_db.py --partitioned`.")
+            return False
+        if args.command == 'list':
+            for year, name in sorted(existing_year_partitions(dbapi_conn).items()):
+                print(f"{year}  {name}")
+        elif args.command == 'create':
+            created = ensure_year_partitions(dbapi_conn, parse_years(args.years))
+            dbapi_conn.commit()
+            print(f"Created {len(created)} partitions: {created}")
+        elif args.command == 'detach':
+            if detach_year_partition(dbapi_conn, args.year, drop=args.drop):
+                # Every station may have had data in that year
+                record_ingest_run(dbapi_conn, None, (datetime.date(args.year, 1, 1), datetime.date(args.year, 12, 31)),
+                                  0, source=f"detach {partition_name(args.year)}")
+            dbapi_conn.commit()
+        return True
+    except Exception as e:
+        dbapi_conn.rollback()
+        logger.error(f"Partition command failed: {e}", exc_info=True)
+        print(f"Error: {e}")
+        return False
+    finally:
+        dbapi_conn.close()
+        engine.dispose()
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,142 @@
+import logging
+from models import StationYearMetric, StationProfileHourly
+from db_ingest_runs import ensure_ingest_run_tables, record_ingest_run
+
+# --- CONFIGURABLE PARAMETERS ---
+MIN_HOURS_COUNTED = 19  # Days with fewer valid hours are excluded from every summary (project plan 2b)
+ALL_VEHICLES_CLASS = 1  # classification_seq for all vehicles
+HEAVY_VEHICLES_CLASS = 3  # classification_seq for heavy vehicles
+# -----------------------------
+
+# Set up logging
+logger = logging.getLogger(__name__) # Get logger for this module
+
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+
+# Rows that feed the summaries. hours_counted is NULL for rows loaded before
+# the column existed; those were complete days, so they are treated as 24.
+QUALITY_FILTER_SQL = f"COALESCE(hc.hours_counted, 24) >= {MIN_HOURS_COUNTED}"
+WEEKDAY_FILTER_SQL = "hc.day_of_week <= 5 AND NOT hc.is_public_holiday"
+
+# Restricts a refresh to the affected (station_key, year) pairs
+SCOPE_SQL = "(hc.station_key, hc.year) IN (SELECT * FROM unnest(%s::int[], %s::int[]))"
+
+REFRESH_YEAR_METRICS_SQL = f"""
+    INSERT INTO station_year_metrics (
+        station_key, year, traffic_direction_seq, aadt, aawt, hv_aadt, hv_percentage,
+        days_counted, weekdays_counted
+    )
+    SELECT station_key, year, traffic_direction_seq, aadt, aawt, hv_aadt,
+           100.0 * hv_aadt / NULLIF(aadt, 0), days_counted, weekdays_counted
+    FROM (
+        SELECT hc.station_key, hc.year, hc.traffic_direction_seq,
+               AVG(hc.daily_total) FILTER (WHERE hc.classification_seq = {ALL_VEHICLES_CLASS}) AS aadt,
+               AVG(hc.daily_total) FILTER (WHERE hc.classification_seq = {ALL_VEHICLES_CLASS}
+                                           AND {WEEKDAY_FILTER_SQL}) AS aawt,
+               AVG(hc.daily_total) FILTER (WHERE hc.classification_seq = {HEAVY_VEHICLES_CLASS}) AS hv_aadt,
+               COUNT(*) FILTER (WHERE hc.classification_seq = {ALL_VEHICLES_CLASS}) AS days_counted,
+               COUNT(*) FILTER (WHERE hc.classification_seq = {ALL_VEHICLES_CLASS}
+                                AND {WEEKDAY_FILTER_SQL}) AS weekdays_counted
+        FROM hourly_counts hc
+        WHERE {QUALITY_FILTER_SQL} AND {SCOPE_SQL}
+        GROUP BY hc.station_key, hc.year, hc.traffic_direction_seq
+    ) AS metrics
+"""
+
+# Unpivots the 24 hour columns with a LATERAL VALUES list and sums them per day type
+_HOUR_VALUES_SQL = ", ".join(f"({h}, hc.{col})" for h, col in enumerate(HOUR_COLUMNS))
+REFRESH_PROFILE_HOURLY_SQL = f"""
+    INSERT INTO station_profile_hourly (
+        station_key, year, traffic_direction_seq, classification_seq, day_type, hour,
+        volume_sum, day_count
+    )
+    SELECT hc.station_key, hc.year, hc.traffic_direction_seq, hc.classification_seq,
+           CASE WHEN hc.day_of_week >= 6 THEN 'weekend' ELSE 'weekday' END AS day_type,
+           h.hour, SUM(h.volume), COUNT(*)
+    FROM hourly_counts hc
+    CROSS JOIN LATERAL (VALUES {_HOUR_VALUES_SQL}) AS h(hour, volume)
+    WHERE {QUALITY_FILTER_SQL} AND NOT hc.is_public_holiday AND {SCOPE_SQL}
+    GROUP BY 1, 2, 3, 4, 5, 6
+"""
+
+def ensure_summary_schema(engine):
+    """
+    Brings an existing database up to date for the summary tables: adds
+    hourly_counts.hours_counted if it is missing and creates
+    station_year_metrics / station_profile_hourly.
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE hourly_counts ADD COLUMN IF NOT EXISTS hours_counted INTEGER")
+        StationYearMetric.__table__.create(conn, checkfirst=True)
+        StationProfileHourly.__table__.create(conn, checkfirst=True)
+
+def station_years(prepared):
+    """Returns the distinct (station_key, year) pairs in a prepared hourly chunk as a set of tuples."""
+    if prepared.empty:
+        return set()
+    pairs = prepared[['station_key', 'year']].drop_duplicates()
+    return set(zip(pairs['station_key'].astype(int), pairs['year'].astype(int)))
+
+def refresh_station_summaries(dbapi_conn, station_year_pairs):
+    """
+    Recomputes both summary tables for the given (station_key, year) pairs.
+
+    Existing summary rows for those pairs are deleted and rebuilt from
+    hourly_counts in the same transaction, so reloading or upserting a year
+    never leaves stale aggregates behind. The caller commits.
+
+    Args:
+        dbapi_conn: A psycopg2 connection.
+        station_year_pairs: Iterable of (station_key, year) tuples touched by a load.
+
+    Returns:
+        Number of station-years refreshed.
+    """
+    pairs = sorted(set(station_year_pairs))
+    if not pairs:
+        return 0
+    keys = [int(key) for key, _ in pairs]
+    years = [int(year) for _, year in pairs]
+    scope = "(station_key, year) IN (SELECT * FROM unnest(%s::int[], %s::int[]))"
+    with dbapi_conn.cursor() as cursor:
+        for table, refresh_sql in (
+            ('station_year_metrics', REFRESH_YEAR_METRICS_SQL),
+            ('station_profile_hourly', REFRESH_PROFILE_HOURLY_SQL),
+        ):
+            cursor.execute(f"DELETE FROM {table} WHERE {scope}", (keys, years))
+            cursor.execute(refresh_sql, (keys, years))
+            logger.debug(f"Refreshed {cursor.rowcount} rows in {table}")
+    logger.info(f"Refreshed summaries for {len(pairs)} station-years")
+    return len(pairs)
+
+def refresh_all_summaries(dbapi_conn):
+    """
+    Rebuilds the summaries for every station-year present in hourly_counts
+    (used for backfills) and records it as an all-stations ingest run, so
+    the app's cached results and profile cubes built from the old
+    summaries are refreshed. The caller commits.
+    """
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT station_key, year FROM hourly_counts")
+        pairs = cursor.fetchall()
+    refreshed = refresh_station_summaries(dbapi_conn, pairs)
+    record_ingest_run(dbapi_conn, None, None, 0, source='summary backfill')
+    return refreshed
+
+if __name__ == '__main__':
+    from log_config import setup_logging
+    from db_utils import get_engine
+
+    setup_logging()
+    engine = get_engine()
+    if engine is None:
+        logger.error("Failed to create database engine")
+        raise SystemExit(1)
+    ensure_summary_schema(engine)
+    ensure_ingest_run_tables(engine)
+    dbapi_conn = engine.raw_connection()
+    try:
+        refresh_all_summaries(dbapi_conn)
+        dbapi_conn.commit()
+    finally:
+        dbapi_conn.close()
@@ -0,0 +1,128 @@
+# app/downsampling.py
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+DEFAULT_CHART_WIDTH = 700  # Pixels assumed when a chart does not set its width
+POINTS_PER_PIXEL = 1  # Points kept per pixel of chart width, per line
+MAX_CHART_POINTS = 20000  # Cap across all lines of one chart, however many stations it shows
+MIN_LINE_POINTS = 50  # Per-line floor when many lines share MAX_CHART_POINTS
+DOWNSAMPLED_KINDS = ('line', 'area', 'step', 'scatter')  # hvplot kinds where dropping points keeps the shape
+# -----------------------------
+
+def point_budget(width=None, lines=1) -> int:
+    """Points to keep per line for a chart `width` pixels wide showing `lines` lines."""
+    per_line = int((width or DEFAULT_CHART_WIDTH) * POINTS_PER_PIXEL)
+    return max(MIN_LINE_POINTS, min(per_line, MAX_CHART_POINTS // max(lines, 1)))
+
+def lttb_indices(x, y, threshold) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep
+    the visual shape of the series. `x` must be ascending. The first and
+    last points are always kept; each bucket in between keeps the point
+    forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(int) + 1
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[end:edges[bucket + 2]].mean()
+            next_y = y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        prev_x, prev_y = x[previous], y[previous]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs((prev_x - next_x) * (y[start:end] - prev_y) - (prev_x - x[start:end]) * (next_y - prev_y))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def minmax_indices(y, threshold) -> np.ndarray:
+    """
+    Min/max bucketing: splits the series into threshold / 2 buckets and keeps
+    each bucket's lowest and highest point, in their original order, so peaks
+    and troughs survive. Cheaper than LTTB and better for spiky series.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        segment = y[start:end]
+        keep.extend((start + int(np.argmin(segment)), start + int(np.argmax(segment))))
+    return np.unique(keep)
+
+def _numeric_axis(values) -> np.ndarray:
+    """x values as floats; dates and datetimes become nanoseconds since the epoch."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype('int64').astype(float)
+
+def downsample_series(df, x, y, threshold, method='lttb'):
+    """
+    Reduces one series to at most `threshold` rows, sorted by `x`. Rows with
+    a missing x or y are dropped first. Returns `df` unchanged if it is
+    already within the budget.
+    """
+    if len(df) <= threshold:
+        return df
+    df = df.dropna(subset=[x, y]).sort_values(x, kind='stable')
+    if len(df) <= threshold:
+        return df
+    if method == 'minmax':
+        indices = minmax_indices(df[y], threshold)
+    elif method == 'lttb':
+        indices = lttb_indices(_numeric_axis(df[x]), df[y], threshold)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return df.iloc[indices]
+
+def downsample_frame(df, x, y, by=None, width=None, method='lttb'):
+    """
+    Downsamples every line of a chart frame (one per value of the `by`
+    column(s), or the whole frame) to the point budget for `width` pixels.
+
+    Returns:
+        The reduced frame, or `df` itself if every line is within budget.
+    """
+    groups = [df] if not by else [group for _, group in df.groupby(by, sort=False, observed=True)]
+    threshold = point_budget(width, len(groups))
+    if all(len(group) <= threshold for group in groups):
+        return df
+    reduced = pd.concat([downsample_series(group, x, y, threshold, method) for group in groups])
+    logger.debug(f"Downsampled {len(df)} points to {len(reduced)} across {len(groups)} lines ({method})")
+    return reduced
+
+def downsample_for_chart(df, kind, options, method='lttb'):
+    """
+    Applies downsample_frame to a frame about to be plotted with
+    `df.hvplot.<kind>(**options)`, when the plot has a single x and y column.
+    Other charts (bars, heatmaps, multiple y columns) are returned unchanged.
+    """
+    x, y, by = options.get('x'), options.get('y'), options.get('by')
+    if kind not in DOWNSAMPLED_KINDS or not isinstance(x, str) or not isinstance(y, str):
+        return df
+    if x not in df.columns or y not in df.columns or not pd.api.types.is_numeric_dtype(df[y]):
+        return df
+    if by is not None and not set([by] if isinstance(by, str) else by) <= set(df.columns):
+        return df
+    return downsample_frame(df, x, y, by=by, width=options.get('width'), method=method)
@@ -4,7 +4,6 @@ import numpy as np
 import datetime
 import panel as pn
 import holoviews as hv
-from holoviews import render
 from holoviews import opts
 import hvplot.pandas
 import folium
@@ -13,20 +12,16 @@ from streamlit_folium import st_folium
 import datetime as dt
 import logging
 from typing import List, Dict, Optional, Tuple, Any
-import streamlit.components.v1 as components
-from bokeh.plotting import save, output_file
-from bokeh.resources import CDN
-import tempfile
-import os
 
 hv.extension('bokeh')
 
 # Import utility functions - using relative import
+from ..charts import show_chart
+from ..station_index import get_station_index
 from ..db_utils import (
-    get_station_details,
     get_distinct_values,
     get_hourly_data_for_stations,
-    get_all_station_metadata,
+    get_hourly_profile,
     get_latest_data_date,
     get_db_session
 )
@@ -34,38 +29,6 @@ from ..db_utils import (
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
-def embed_bokeh_plot(hv_plot, height=450):
-    """Renders a HoloViews plot to Bokeh, saves as HTML, and returns HTML string."""
-    try:
-        bokeh_fig = render(hv_plot, backend='bokeh')
-        if not bokeh_fig:
-            logger.error("HoloViews render function returned None.")
-            return None
-
-        # Create a temporary HTML file
-        with tempfile.NamedTemporaryFile(suffix=".html", delete=False, mode='w', encoding='utf-8') as tmpfile:
-            output_file(tmpfile.name, title="", mode='cdn')
-            save(bokeh_fig)
-            tmpfile_path = tmpfile.name
-            logger.debug(f"Saved Bokeh plot to temporary file: {tmpfile_path}")
-
-        # Read the HTML content
-        with open(tmpfile_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-
-        # Clean up the temporary file
-        try:
-            os.remove(tmpfile_path)
-            logger.debug(f"Removed temporary file: {tmpfile_path}")
-        except OSError as e:
-            logger.warning(f"Could not remove temporary file {tmpfile_path}: {e}")
-
-        return html_content
-
-    except Exception as e:
-        logger.error(f"Failed to render or save Bokeh plot: {e}", exc_info=True)
-        return None
-
 def render_station_profile():
     """Renders the Traffic Station Profile Dashboard feature."""
     logger.info("Rendering Traffic Station Profile Dashboard")
@@ -81,12 +44,12 @@ def render_station_profile():
             session = get_db_session()
             if session:
                 try:
-                    station_df = get_all_station_metadata(session)
-                    if station_df is None:
-                        logger.error("get_all_station_metadata returned None, likely DB session issue.")
+                    station_index = get_station_index(session)
+                    if station_index is None:
+                        logger.error("get_station_index returned None, likely DB session issue.")
                         st.error("Error loading station data. Database connection might be unavailable.")
                         return
-                    logger.info(f"Retrieved {len(station_df)} station records")
+                    logger.info(f"Retrieved {len(station_index)} station records")
                 except Exception as e:
                     logger.error(f"Failed to fetch station metadata: {e}", exc_info=True)
                     st.error("Error loading station data. Check logs for details.")
@@ -101,15 +64,13 @@ def render_station_profile():
             st.error("Error loading station data. Check logs for details.")
             return
     
-    # Handle empty dataframe case
-    if station_df.empty:
+    # Handle empty station list
+    if not len(station_index):
         logger.warning("No station data available in the database")
         st.warning("No station data found matching criteria.")
     
-    # Create station selection options
-    station_options = [f"{row['station_id']} - {row['road_name']}" for _, row in station_df.iterrows()]
-    station_keys = station_df['station_key'].tolist()
-    station_map = dict(zip(station_options, station_keys))
+    # Station selection options come prebuilt with the index
+    station_options = list(station_index.labels)
     
     # 3. Create selectors in the first column
     with col1:
@@ -124,34 +85,15 @@ def render_station_profile():
         
         # Get selected station key from the map
         if selected_station_option:
-            selected_station_key = station_map[selected_station_option]
-            selected_station_id = selected_station_option.split(" - ")[0]
-            logger.info(f"User selected station: {selected_station_id} (key: {selected_station_key})")
-            
-            # Get station details for display and mapping
-            try:
-                session = get_db_session()
-                if session:
-                    try:
-                        station_details = get_station_details(session, selected_station_key)
-                        if station_details is None:
-                            logger.error(f"get_station_details returned None for key {selected_station_key}")
-                            st.error("Could not load details for the selected station.")
-                        else:
-                            logger.debug(f"Retrieved details for station key: {selected_station_key}")
-                    except Exception as e:
-                        logger.error(f"Failed to fetch station details: {e}", exc_info=True)
-                        st.error("Error loading station details. Check logs for details.")
-                        return
-                    finally:
-                        session.close()
-                else:
-                    st.error("Could not get database session.")
-                    return
-            except Exception as e:
-                logger.error(f"Failed to fetch station details: {e}", exc_info=True)
-                st.error("Error loading station details. Check logs for details.")
+            selected_station_key = station_index.key_for_label(selected_station_option)
+            # The index already holds the full station row; no extra round trip
+            station_details = station_index.get(selected_station_key)
+            if station_details is None:
+                logger.error(f"No station index entry for label {selected_station_option}")
+                st.error("Could not load details for the selected station.")
                 return
+            selected_station_id = station_details['station_id']
+            logger.info(f"User selected station: {selected_station_id} (key: {selected_station_key})")
             
             # Direction selector - create mapping for display
             directions = {
@@ -206,6 +148,7 @@ def render_station_profile():
 
             # Fetch hourly data only if a valid date range was determined
             hourly_data = pd.DataFrame()
+            hourly_profile = pd.DataFrame()
             if start_date and end_date and station_details:
                 with st.spinner("Loading traffic data..."):
                     logger.debug(f"Fetching hourly data for station key: {selected_station_key} from {start_date} to {end_date}")
@@ -213,14 +156,25 @@ def render_station_profile():
                         session = get_db_session()
                         if session:
                             try:
+                                # Raw rows are only needed for the 90-day trend; the yearly
+                                # profile is reduced to 24 averages per period in the database
                                 hourly_data = get_hourly_data_for_stations(
                                     session,
                                     [selected_station_key],
-                                    start_date,
+                                    start_date_90_days,
                                     end_date,
                                     directions=[selected_direction],
-                                    required_cols=None
+                                    required_cols=['count_date', 'daily_total']
+                                )
+                                hourly_profile = get_hourly_profile(
+                                    session,
+                                    [selected_station_key],
+                                    start_date_full_year,
+                                    end_date,
+                                    directions=[selected_direction]
                                 )
+                                if hourly_profile is None:
+                                    hourly_profile = pd.DataFrame()
                                 if hourly_data is None:
                                     logger.error(f"get_hourly_data_for_stations returned None for key {selected_station_key}")
                                     st.error("Could not load traffic data for the selected station.")
@@ -316,68 +270,38 @@ def render_station_profile():
                 logger.debug("Rendering traffic profiles tab")
                 st.subheader(f"Typical Hourly Traffic Profile ({selected_direction_desc})")
                 
-                if 'hourly_data' in locals() and not hourly_data.empty:
-                    logger.debug("Processing yearly hourly data for profiles")
-                    year_data = hourly_data[
-                        (hourly_data['count_date'] >= start_date_full_year) &
-                        (hourly_data['count_date'] <= end_date)
-                    ].copy()
-                    
-                    if not year_data.empty:
-                        year_data = year_data[~year_data['is_public_holiday']]
-                        year_data['is_weekend'] = year_data['day_of_week'].isin([6, 7])
-                        
-                        hourly_profiles = []
-                        
-                        weekday_data = year_data[~year_data['is_weekend']].copy()
-                        if not weekday_data.empty:
-                            logger.debug(f"Processing {len(weekday_data)} weekday records")
-                            weekday_profile = process_hourly_profile(weekday_data, 'Weekday')
-                            hourly_profiles.append(weekday_profile)
-                        
-                        weekend_data = year_data[year_data['is_weekend']].copy()
-                        if not weekend_data.empty:
-                            logger.debug(f"Processing {len(weekend_data)} weekend records")
-                            weekend_profile = process_hourly_profile(weekend_data, 'Weekend')
-                            hourly_profiles.append(weekend_profile)
-                        
-                        if hourly_profiles:
-                            profile_df = pd.concat(hourly_profiles)
+                if 'hourly_profile' in locals() and not hourly_profile.empty:
+                    logger.debug(f"Plotting hourly profile with periods: {list(hourly_profile.columns)}")
+                    profile_df = hourly_profile.reset_index().melt(
+                        id_vars='hour', var_name='Period', value_name='Average Volume'
+                    ).rename(columns={'hour': 'Hour'})
 
-                            logger.debug("Generating hourly profile chart")
-                            try:
-                                fig = profile_df.hvplot.line(
-                                    x='Hour',
-                                    y='Average Volume',
-                                    by='Period',
-                                    title=f"Typical Hourly Traffic Profile ({selected_direction_desc})",
-                                    xlabel="Hour of Day (0-23)",
-                                    ylabel="Average Traffic Volume",
-                                    legend='top_right',
-                                    grid=True,
-                                    width=700,
-                                    height=400,
-                                    line_width=3
-                                )
-
-                                html_plot = embed_bokeh_plot(fig, height=450)
-                                if html_plot:
-                                    components.html(html_plot, height=450)
-                                    logger.debug("Attempted to render hourly profile via st.components.html")
-                                else:
-                                    st.error("Failed to generate HTML for hourly profile plot.")
-                            except Exception as e:
-                                logger.error(f"Failed to create or render hourly profile chart: {e}", exc_info=True)
-                                st.error("Error creating hourly profile chart. Check logs for details.")
-                        else:
-                            logger.warning("Insufficient data to create hourly profiles")
-                            st.warning("Not enough data to create hourly profiles")
-                    else:
-                        logger.warning(f"No data available within the calculated last year ({start_date_full_year} to {end_date}) for station {selected_station_id}")
-                        st.warning(f"No data available within the calculated last year ({start_date_full_year.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')})")
+                    logger.debug("Generating hourly profile chart")
+                    try:
+                        rendered = show_chart(
+                            profile_df,
+                            'line',
+                            frame_height=450,
+                            x='Hour',
+                            y='Average Volume',
+                            by='Period',
+                            title=f"Typical Hourly Traffic Profile ({selected_direction_desc})",
+                            xlabel="Hour of Day (0-23)",
+                            ylabel="Average Traffic Volume",
+                            legend='top_right',
+                            grid=True,
+                            width=700,
+                            height=400,
+                            line_width=3
+                        )
+                        if not rendered:
+                            st.error("Failed to generate HTML for hourly profile plot.")
+                    except Exception as e:
+                        logger.error(f"Failed to create or render hourly profile chart: {e}", exc_info=True)
+                        st.error("Error creating hourly profile chart. Check logs for details.")
                 else:
-                    logger.warning(f"No hourly data fetched for station {selected_station_id}")
-                    st.warning("No hourly data available for this station and direction.")
+                    logger.warning(f"No data available within the calculated last year ({start_date_full_year} to {end_date}) for station {selected_station_id}")
+                    st.warning(f"No data available within the calculated last year ({start_date_full_year.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')})")
             
             # Tab 3: Recent Daily Volume Trend Chart
             with tab3:
@@ -401,7 +325,10 @@ def render_station_profile():
                             logger.debug(f"Generated daily trends for {len(daily_df)} days")
                             
                             try:
-                                fig = daily_df.hvplot.line(
+                                rendered = show_chart(
+                                    daily_df,
+                                    'line',
+                                    frame_height=450,
                                     x='Date',
                                     y='Total Daily Volume',
                                     title=f"Recent Daily Traffic Volume ({selected_direction_desc}) - Last 90 Days",
@@ -412,12 +339,7 @@ def render_station_profile():
                                     height=400,
                                     line_width=2
                                 )
-
-                                html_plot = embed_bokeh_plot(fig, height=450)
-                                if html_plot:
-                                    components.html(html_plot, height=450)
-                                    logger.debug("Attempted to render daily trends via st.components.html")
-                                else:
+                                if not rendered:
                                     st.error("Failed to generate HTML for daily trends plot.")
                             except Exception as e:
                                 logger.error(f"Failed to create or render daily trends chart: {e}", exc_info=True)
@@ -436,27 +358,3 @@ def render_station_profile():
         else:
             logger.info("No station selected or station details not available")
             st.warning("Please select a station to display data")
-
-def process_hourly_profile(data: pd.DataFrame, period_name: str) -> pd.DataFrame:
-    """
-    Process hourly count data to create an average hourly profile.
-    
-    Args:
-        data: DataFrame containing hourly counts
-        period_name: Name to assign to the period (e.g., 'Weekday', 'Weekend')
-    
-    Returns:
-        DataFrame with columns ['Hour', 'Average Volume', 'Period']
-    """
-    logger.debug(f"Processing hourly profile for {period_name}")
-    hourly_data = []
-    
-    for hour in range(24):
-        hour_col = f'hour_{hour:02d}'
-        if hour_col in data.columns:
-            avg_volume = data[hour_col].mean()
-            hourly_data.append({'Hour': hour, 'Average Volume': avg_volume, 'Period': period_name})
-    
-    result_df = pd.DataFrame(hourly_data)
-    logger.debug(f"Created hourly profile with {len(result_df)} data points")
-    return result_df
\ No newline at end of file
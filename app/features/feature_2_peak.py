@@ -1,6 +1,190 @@
 import streamlit as st
+import pandas as pd
+import datetime
+import logging
+
+from ..charts import show_chart
+from ..station_index import get_station_index
+from ..peak_metrics import (
+    AM_PEAK,
+    PM_PEAK,
+    ROLLING_WIDTHS,
+    TRUE_PEAK_PERIODS,
+    HOUR_COLUMNS,
+    station_peak_summary,
+    hour_label,
+)
+from ..db_utils import (
+    get_peak_volumes,
+    get_station_day_hours,
+    get_corridor_profiles,
+    get_db_session
+)
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+MAX_PEAK_STATIONS = 600  # Larger selections are refused rather than loaded
+DIRECTIONS = {1: "Prescribed Direction", 2: "Opposite Direction", 3: "Both Directions"}
+FIXED_MODE = "Fixed peak windows"
+TRUE_PEAK_MODE = "True peak hour"
+FILTERS = [('lga', "Select LGA(s)"), ('suburb', "Select Suburb(s)"), ('road_functional_hierarchy', "Select Road Type(s)")]
+# -----------------------------
+
+def select_stations(station_index):
+    """
+    Dependent LGA -> Suburb -> Road Type filters, each listing only the
+    values (with station counts) left by the selections before it. Returns
+    the matching station keys (empty if nothing is selected).
+    """
+    selections = {}
+    for (column, label), container in zip(FILTERS, st.columns(len(FILTERS))):
+        counts = station_index.option_counts(column, selections)
+        with container:
+            selections[column] = st.multiselect(label, options=list(counts),
+                                                format_func=lambda value, counts=counts: f"{value} ({counts[value]})")
+
+    if not any(selections.values()):
+        return ()
+    return station_index.filter_keys(**selections)
+
+def select_analysis_options():
+    """Date range, direction and peak mode controls; returns them as a dict."""
+    col1, col2, col3 = st.columns(3)
+    last_year = datetime.date.today().year - 1
+    with col1:
+        date_range = st.date_input("Select Date Range",
+                                   value=(datetime.date(last_year, 1, 1), datetime.date(last_year, 12, 31)))
+        direction = st.selectbox("Select Direction", options=list(DIRECTIONS), format_func=DIRECTIONS.get, index=2)
+    with col2:
+        mode = st.radio("Peak Mode", [FIXED_MODE, TRUE_PEAK_MODE])
+        width = st.selectbox("Peak Block Length (hours)", options=list(ROLLING_WIDTHS),
+                             disabled=mode != TRUE_PEAK_MODE)
+    with col3:
+        am_window = st.slider("AM Peak Hours", 0, 11, AM_PEAK, disabled=mode != FIXED_MODE)
+        pm_window = st.slider("PM Peak Hours", 12, 23, PM_PEAK, disabled=mode != FIXED_MODE)
+
+    if not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+        return None
+    return {
+        'start_date': date_range[0],
+        'end_date': date_range[1],
+        'direction': direction,
+        'mode': mode,
+        'width': width,
+        'windows': {'am_peak': tuple(am_window), 'pm_peak': tuple(pm_window)},
+    }
+
+def build_peak_table(station_index, summary, options):
+    """Joins station details onto the per-station peak summary for display."""
+    table = pd.DataFrame({
+        'Station ID': [station_index.get(key)['station_id'] for key in summary['station_key']],
+        'Road Name': [station_index.get(key)['road_name'] for key in summary['station_key']],
+    })
+    if options['mode'] == TRUE_PEAK_MODE:
+        width = options['width']
+        table['AM Peak Block'] = [hour_label(start, width) for start in summary['am_peak_start']]
+        table['Avg AM Peak Volume'] = summary['am_peak_volume'].round(0).to_numpy()
+        table['PM Peak Block'] = [hour_label(start, width) for start in summary['pm_peak_start']]
+        table['Avg PM Peak Volume'] = summary['pm_peak_volume'].round(0).to_numpy()
+    else:
+        table['Avg AM Peak Volume'] = summary['am_peak'].round(0).to_numpy()
+        table['Avg PM Peak Volume'] = summary['pm_peak'].round(0).to_numpy()
+    table['Days'] = summary['days'].to_numpy()
+    return table
+
+def load_peak_data(session, station_keys, options):
+    """
+    Returns (per-station summary, 24-hour weekday profile). Fixed windows are
+    summed in the database; the true peak mode reduces station-day hour
+    vectors with NumPy, and its profile comes from the same rows. In both
+    modes the profile averages station-days with the selected directions
+    added together, as the peak volumes are.
+    """
+    station_keys = list(station_keys)
+    directions = [options['direction']]
+    if options['mode'] == TRUE_PEAK_MODE:
+        station_days = get_station_day_hours(session, station_keys, options['start_date'], options['end_date'],
+                                             directions=directions)
+        if station_days is None or station_days.empty:
+            return pd.DataFrame(), pd.Series(dtype=float)
+        summary = station_peak_summary(station_days, TRUE_PEAK_PERIODS, rolling_width=options['width'])
+        profile = station_days[HOUR_COLUMNS].mean()
+        return summary.reset_index(), pd.Series(profile.to_numpy(), index=range(24))
+
+    summary = get_peak_volumes(session, station_keys, options['start_date'], options['end_date'],
+                               directions=directions, windows=options['windows'])
+    profiles = get_corridor_profiles(session, station_keys, options['start_date'], options['end_date'],
+                                     directions=directions, day_type='Weekday')
+    if summary is None or profiles is None or profiles.empty:
+        return pd.DataFrame() if summary is None else summary, pd.Series(dtype=float)
+    # Per-station averages weighted by their day counts give the mean over all station-days
+    days = profiles['days'].astype(float)
+    profile = profiles[HOUR_COLUMNS].mul(days, axis=0).sum() / days.sum()
+    return summary, pd.Series(profile.to_numpy(), index=range(24))
 
 def render_peak_analysis():
-    st.write("Hello World")  # Add this line
-    st.title("Peak Hour Analysis View")
-    st.write("Add your code for the Peak Hour Analysis View here")
\ No newline at end of file
+    """Renders the Peak Hour Analysis feature."""
+    logger.info("Rendering Peak Hour Analysis")
+    st.title("Peak Hour Analysis")
+
+    session = get_db_session()
+    if session is None:
+        st.error("Could not get database session.")
+        return
+    try:
+        station_index = get_station_index(session)
+        if station_index is None:
+            st.error("Error loading station data. Database connection might be unavailable.")
+            return
+
+        station_keys = select_stations(station_index)
+        options = select_analysis_options()
+        if not station_keys:
+            st.info("Select at least one LGA, suburb or road type to analyse peak periods.")
+            return
+        if options is None:
+            st.info("Select a start and end date.")
+            return
+        if len(station_keys) > MAX_PEAK_STATIONS:
+            st.warning(f"{len(station_keys)} stations match; narrow the filters to at most {MAX_PEAK_STATIONS}.")
+            return
+        logger.info(f"Peak analysis for {len(station_keys)} stations, {options['start_date']} to "
+                    f"{options['end_date']}, mode {options['mode']}")
+
+        with st.spinner("Calculating peak volumes..."):
+            summary, profile = load_peak_data(session, station_keys, options)
+        if summary.empty:
+            st.warning("No weekday traffic data found for the selected stations and dates.")
+            return
+
+        direction_desc = DIRECTIONS[options['direction']]
+        if not profile.empty:
+            profile_df = pd.DataFrame({'Hour': profile.index, 'Average Volume': profile.to_numpy()})
+            if not show_chart(
+                profile_df,
+                'line',
+                x='Hour',
+                y='Average Volume',
+                title=f"Average Weekday Hourly Profile ({direction_desc})",
+                xlabel="Hour of Day (0-23)",
+                ylabel="Average Traffic Volume",
+                grid=True,
+                width=700,
+                height=400,
+                line_width=3
+            ):
+                st.error("Failed to generate the hourly profile chart.")
+            if options['mode'] == FIXED_MODE:
+                am, pm = options['windows']['am_peak'], options['windows']['pm_peak']
+                st.caption(f"AM peak: {hour_label(am[0], am[1] - am[0] + 1)}, "
+                           f"PM peak: {hour_label(pm[0], pm[1] - pm[0] + 1)}")
+
+        st.markdown(f"### Average Peak Period Volumes ({direction_desc})")
+        st.dataframe(build_peak_table(station_index, summary, options), hide_index=True, use_container_width=True)
+    except Exception as e:
+        logger.error(f"Failed to render peak analysis: {e}", exc_info=True)
+        st.error("Error calculating peak volumes. Check logs for details.")
+    finally:
+        session.close()
@@ -1,6 +1,166 @@
 import streamlit as st
+import pandas as pd
+import datetime
+import logging
+import folium
+from folium.plugins import MarkerCluster
+from streamlit_folium import st_folium
+
+from ..charts import show_chart
+from ..station_index import get_station_index
+from ..corridor import corridor_station_keys, order_along_corridor, profiles_long
+from ..db_utils import (
+    get_corridor_profiles,
+    get_db_session
+)
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+MAX_CORRIDOR_STATIONS = 300  # Longer corridors are refused rather than loaded
+MAX_CHART_STATIONS = 30  # Profiles drawn on the chart; the table lists every station
+DIRECTIONS = {1: "Prescribed Direction", 2: "Opposite Direction", 3: "Both Directions"}
+DAY_TYPES = {"All Days": None, "Weekdays": 'Weekday', "Weekends": 'Weekend'}
+# -----------------------------
+
+def select_corridor(station_index):
+    """Road, optional LGA, date range, direction and day type; returns them as a dict (None if incomplete)."""
+    col1, col2, col3 = st.columns(3)
+    last_year = datetime.date.today().year - 1
+    roads = sorted(set(station_index.values('road_name')) | set(station_index.values('common_road_name')))
+    with col1:
+        road = st.selectbox("Select Road", options=roads, index=None, placeholder="Choose a road")
+        lgas = station_index.values_for('lga', corridor_station_keys(station_index, road)) if road else ()
+        lga = st.selectbox("Limit to LGA (optional)", options=lgas, index=None, placeholder="All LGAs")
+    with col2:
+        date_range = st.date_input("Select Date Range",
+                                   value=(datetime.date(last_year, 1, 1), datetime.date(last_year, 12, 31)))
+        direction = st.selectbox("Select Direction", options=list(DIRECTIONS), format_func=DIRECTIONS.get, index=2)
+    with col3:
+        day_type = st.radio("Days", list(DAY_TYPES))
+
+    if not road or not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+        return None
+    return {
+        'road': road,
+        'lga': lga,
+        'start_date': date_range[0],
+        'end_date': date_range[1],
+        'direction': direction,
+        'day_type': DAY_TYPES[day_type],
+    }
+
+def corridor_stations(station_index, station_keys) -> pd.DataFrame:
+    """Station details for the corridor, ordered along its line fit with a chainage column."""
+    rows = [station_index.get(key) for key in station_keys]
+    stations = pd.DataFrame(rows, columns=['station_key', 'station_id', 'full_name', 'road_name',
+                                           'wgs84_latitude', 'wgs84_longitude'])
+    stations[['wgs84_latitude', 'wgs84_longitude']] = stations[['wgs84_latitude', 'wgs84_longitude']].astype(float)
+    return order_along_corridor(stations)
+
+def render_corridor_map(stations: pd.DataFrame):
+    """Clustered markers for the corridor's stations, numbered in corridor order."""
+    located = stations.dropna(subset=['wgs84_latitude', 'wgs84_longitude'])
+    if located.empty:
+        st.info("None of the corridor's stations have location data.")
+        return
+    m = folium.Map(location=[located['wgs84_latitude'].mean(), located['wgs84_longitude'].mean()])
+    cluster = MarkerCluster().add_to(m)
+    for order, row in enumerate(located.itertuples(index=False), start=1):
+        popup_text = f"""
+        <b>{order}. Station ID:</b> {row.station_id}<br>
+        <b>Road:</b> {row.road_name or 'N/A'}<br>
+        <b>Full Name:</b> {row.full_name or 'N/A'}<br>
+        <b>Chainage:</b> {row.chainage_km:.1f} km
+        """
+        folium.Marker(
+            [row.wgs84_latitude, row.wgs84_longitude],
+            popup=folium.Popup(popup_text, max_width=300),
+            tooltip=f"{order}. Station ID: {row.station_id}",
+        ).add_to(cluster)
+    m.fit_bounds([[located['wgs84_latitude'].min(), located['wgs84_longitude'].min()],
+                  [located['wgs84_latitude'].max(), located['wgs84_longitude'].max()]])
+    st_folium(m, width=700, height=500, returned_objects=[])
+
+def build_corridor_table(stations: pd.DataFrame, profiles: pd.DataFrame) -> pd.DataFrame:
+    """One row per station in corridor order; stations without data in the range show blank volumes."""
+    table = stations.merge(profiles[['station_key', 'daily_total', 'days']], on='station_key', how='left')
+    return pd.DataFrame({
+        'Order': range(1, len(table) + 1),
+        'Station ID': table['station_id'],
+        'Full Name': table['full_name'],
+        'Chainage (km)': table['chainage_km'].round(1),
+        'Average Daily Total Volume': table['daily_total'].round(0),
+        'Days': table['days'],
+    })
 
 def render_corridor_comparison():
-    st.write("Hello World")  # Add this line
+    """Renders the Corridor Traffic Flow Comparison feature."""
+    logger.info("Rendering Corridor Comparison")
     st.title("Corridor Traffic Flow Comparison")
-    st.write("Add your code for the Corridor Traffic Flow Comparison here")
\ No newline at end of file
+
+    session = get_db_session()
+    if session is None:
+        st.error("Could not get database session.")
+        return
+    try:
+        station_index = get_station_index(session)
+        if station_index is None:
+            st.error("Error loading station data. Database connection might be unavailable.")
+            return
+
+        options = select_corridor(station_index)
+        if options is None:
+            st.info("Select a road and a start and end date to compare its stations.")
+            return
+        station_keys = corridor_station_keys(station_index, options['road'], options['lga'])
+        if not station_keys:
+            st.warning("No stations found on the selected road.")
+            return
+        if len(station_keys) > MAX_CORRIDOR_STATIONS:
+            st.warning(f"{len(station_keys)} stations match; limit the corridor to one LGA "
+                       f"or at most {MAX_CORRIDOR_STATIONS} stations.")
+            return
+        logger.info(f"Corridor comparison for {options['road']} ({len(station_keys)} stations), "
+                    f"{options['start_date']} to {options['end_date']}")
+
+        stations = corridor_stations(station_index, station_keys)
+        st.markdown(f"### {options['road']}: {len(stations)} stations")
+        render_corridor_map(stations)
+
+        with st.spinner("Loading corridor profiles..."):
+            profiles = get_corridor_profiles(session, list(station_keys), options['start_date'], options['end_date'],
+                                             directions=[options['direction']], day_type=options['day_type'])
+        if profiles is None or profiles.empty:
+            st.warning("No traffic data found for the corridor's stations and dates.")
+            return
+
+        direction_desc = DIRECTIONS[options['direction']]
+        ordered = stations[['station_key']].merge(profiles, on='station_key')
+        if len(ordered) > MAX_CHART_STATIONS:
+            st.caption(f"Chart shows the first {MAX_CHART_STATIONS} of {len(ordered)} stations along the corridor.")
+        labels = dict(zip(stations['station_key'], stations['station_id'].astype(str)))
+        if not show_chart(
+            profiles_long(ordered.head(MAX_CHART_STATIONS), labels),
+            'line',
+            x='Hour',
+            y='Average Volume',
+            by='Station ID',
+            title=f"Average Hourly Profiles along {options['road']} ({direction_desc})",
+            xlabel="Hour of Day (0-23)",
+            ylabel="Average Traffic Volume",
+            grid=True,
+            width=700,
+            height=450,
+            legend='right'
+        ):
+            st.error("Failed to generate the corridor profile chart.")
+
+        st.markdown(f"### Stations along {options['road']} ({direction_desc})")
+        st.dataframe(build_corridor_table(stations, profiles), hide_index=True, use_container_width=True)
+    except Exception as e:
+        logger.error(f"Failed to render corridor comparison: {e}", exc_info=True)
+        st.error("Error comparing corridor stations. Check logs for details.")
+    finally:
+        session.close()
@@ -1,6 +1,139 @@
 import streamlit as st
+import pandas as pd
+import datetime
+import logging
+
+from ..charts import show_charts
+from ..station_index import get_station_index
+from ..hv_metrics import TOP_HV_STATIONS, hv_hourly_profile, hv_station_summary, top_hv_stations
+from ..db_utils import (
+    get_heavy_vehicle_pivot,
+    get_db_session
+)
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+MAX_HV_STATIONS = 600  # Larger selections are refused rather than loaded
+DIRECTIONS = {1: "Prescribed Direction", 2: "Opposite Direction", 3: "Both Directions"}
+DAY_TYPES = {"Weekdays": 'Weekday', "Weekends": 'Weekend', "All Days": None}
+RANKINGS = {"Avg Daily HV Volume": 'hv_daily', "Avg Daily HV Percentage": 'hv_percentage'}
+FILTERS = [('lga', "Select LGA(s)"), ('road_functional_hierarchy', "Select Road Type(s)")]
+CLASSIFIER_SELECTION = {'vehicle_classifier': [True]}  # Only classifying stations count heavy vehicles
+# -----------------------------
+
+def select_stations(station_index):
+    """
+    Dependent LGA -> Road Type filters over classifier stations, options
+    labelled with station counts. Returns the matching station keys (empty
+    if nothing is selected).
+    """
+    selections = dict(CLASSIFIER_SELECTION)
+    for (column, label), container in zip(FILTERS, st.columns(len(FILTERS))):
+        counts = station_index.option_counts(column, selections)
+        with container:
+            selections[column] = st.multiselect(label, options=list(counts),
+                                                format_func=lambda value, counts=counts: f"{value} ({counts[value]})")
+
+    if not any(selections[column] for column, _ in FILTERS):
+        return ()
+    return station_index.filter_keys(**selections)
+
+def select_analysis_options():
+    """Date range, direction, day type and ranking controls; returns them as a dict (None if incomplete)."""
+    col1, col2, col3 = st.columns(3)
+    last_year = datetime.date.today().year - 1
+    with col1:
+        date_range = st.date_input("Select Date Range",
+                                   value=(datetime.date(last_year, 1, 1), datetime.date(last_year, 12, 31)))
+        direction = st.selectbox("Select Direction", options=list(DIRECTIONS), format_func=DIRECTIONS.get, index=2)
+    with col2:
+        day_type = st.radio("Days", list(DAY_TYPES))
+    with col3:
+        ranking = st.selectbox("Rank Stations By", options=list(RANKINGS))
+        top_n = st.number_input("Stations to List", min_value=1, max_value=MAX_HV_STATIONS, value=TOP_HV_STATIONS)
+
+    if not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+        return None
+    return {
+        'start_date': date_range[0],
+        'end_date': date_range[1],
+        'direction': direction,
+        'day_type': DAY_TYPES[day_type],
+        'period': day_type,
+        'ranking': ranking,
+        'top_n': int(top_n),
+    }
+
+def build_ranking_table(station_index, ranked: pd.DataFrame) -> pd.DataFrame:
+    """Joins station details onto the ranked per-station HV summary for display."""
+    return pd.DataFrame({
+        'Station ID': [station_index.get(key)['station_id'] for key in ranked['station_key']],
+        'Road Name': [station_index.get(key)['road_name'] for key in ranked['station_key']],
+        'Avg Daily HV Volume': ranked['hv_daily'].round(0).to_numpy(),
+        'Avg Daily HV Percentage': ranked['hv_percentage'].round(1).to_numpy(),
+        'Avg Daily Total Volume': ranked['total_daily'].round(0).to_numpy(),
+        'Days': ranked['days'].to_numpy(),
+    })
 
 def render_heavy_vehicle_explorer():
-    st.write("Hello World")  # Add this line
+    """Renders the Heavy Vehicle Pattern Explorer feature."""
+    logger.info("Rendering Heavy Vehicle Pattern Explorer")
     st.title("Heavy Vehicle Pattern Explorer")
-    st.write("Add your code for the Heavy Vehicle Pattern Explorer here")
\ No newline at end of file
+
+    session = get_db_session()
+    if session is None:
+        st.error("Could not get database session.")
+        return
+    try:
+        station_index = get_station_index(session)
+        if station_index is None:
+            st.error("Error loading station data. Database connection might be unavailable.")
+            return
+        if 'vehicle_classifier' not in station_index.facets:
+            st.error("Station classifier flags are unavailable.")
+            return
+
+        station_keys = select_stations(station_index)
+        options = select_analysis_options()
+        if not station_keys:
+            st.info("Select at least one LGA or road type to explore heavy vehicle patterns at classifier stations.")
+            return
+        if options is None:
+            st.info("Select a start and end date.")
+            return
+        if len(station_keys) > MAX_HV_STATIONS:
+            st.warning(f"{len(station_keys)} stations match; narrow the filters to at most {MAX_HV_STATIONS}.")
+            return
+        logger.info(f"Heavy vehicle analysis for {len(station_keys)} stations, {options['start_date']} to "
+                    f"{options['end_date']}")
+
+        with st.spinner("Calculating heavy vehicle volumes..."):
+            pivot = get_heavy_vehicle_pivot(session, list(station_keys), options['start_date'], options['end_date'],
+                                            directions=[options['direction']], day_type=options['day_type'])
+        if pivot is None or pivot.empty:
+            st.warning("No classified traffic data found for the selected stations and dates.")
+            return
+
+        direction_desc = DIRECTIONS[options['direction']]
+        profile = hv_hourly_profile(pivot)
+        common = dict(x='Hour', xlabel="Hour of Day (0-23)", grid=True, width=700, height=400, line_width=3)
+        if not show_charts([
+            (profile[['Hour', 'Average HV Volume']], 'line', dict(
+                common, y='Average HV Volume', ylabel="Average Heavy Vehicle Volume",
+                title=f"Average Hourly Heavy Vehicle Profile ({direction_desc}, {options['period']})")),
+            (profile[['Hour', 'HV Percentage (%)']], 'line', dict(
+                common, y='HV Percentage (%)', ylabel="Heavy Vehicle Percentage (%)",
+                title=f"Average Hourly Heavy Vehicle Percentage ({direction_desc}, {options['period']})")),
+        ]):
+            st.error("Failed to generate the heavy vehicle charts.")
+
+        ranked = top_hv_stations(hv_station_summary(pivot), options['top_n'], by=RANKINGS[options['ranking']])
+        st.markdown(f"### Top Heavy Vehicle Stations ({direction_desc}, {options['period']})")
+        st.dataframe(build_ranking_table(station_index, ranked), hide_index=True, use_container_width=True)
+    except Exception as e:
+        logger.error(f"Failed to render heavy vehicle explorer: {e}", exc_info=True)
+        st.error("Error calculating heavy vehicle patterns. Check logs for details.")
+    finally:
+        session.close()
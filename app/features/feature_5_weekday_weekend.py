@@ -1,6 +1,114 @@
 import streamlit as st
+import pandas as pd
+import logging
+
+from ..charts import show_chart
+from ..station_index import get_station_index
+from ..profile_cube import get_profile_cube, profile_metrics
+from ..models import StationProfileHourly
+from ..db_utils import (
+    get_distinct_values,
+    get_db_session
+)
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+DIRECTIONS = {1: "Prescribed Direction", 2: "Opposite Direction", 3: "Both Directions"}
+SELECT_BY = {"Station": None, "LGA": 'lga', "Hierarchy": 'road_functional_hierarchy'}  # Mode -> station column
+SELECT_LABELS = {"Station": "Select Station(s)", "LGA": "Select LGA(s)", "Hierarchy": "Select Road Type(s)"}
+# -----------------------------
+
+def select_stations(station_index):
+    """
+    "Select By" mode and its multiselect (stations, LGAs or road types).
+    Returns (station keys, description of the selection); no keys if
+    nothing is selected.
+    """
+    mode = st.radio("Select By", list(SELECT_BY), horizontal=True)
+    column = SELECT_BY[mode]
+    if column is None:
+        labels = st.multiselect(SELECT_LABELS[mode], options=station_index.labels)
+        keys = tuple(station_index.key_for_label(label) for label in labels)
+        names = [station_index.get(key)['station_id'] for key in keys]
+    else:
+        names = st.multiselect(SELECT_LABELS[mode], options=station_index.values(column))
+        keys = station_index.filter_keys(**{column: names}) if names else ()
+    description = ", ".join(str(name) for name in names[:3]) + (f" +{len(names) - 3} more" if len(names) > 3 else "")
+    return keys, description
+
+def profile_chart_data(profile: pd.DataFrame) -> pd.DataFrame:
+    """The Weekday/Weekend profile as ['Hour', 'Average Volume', 'Period'] rows for a two-line chart."""
+    long = profile.rename_axis('Hour').reset_index().melt(id_vars='Hour', var_name='Period',
+                                                           value_name='Average Volume')
+    return long[['Hour', 'Average Volume', 'Period']]
 
 def render_weekday_weekend_comparison():
-    st.write("Hello World")  # Add this line
+    """Renders the Weekday vs. Weekend Traffic Comparison feature."""
+    logger.info("Rendering Weekday vs. Weekend Comparison")
     st.title("Weekday vs. Weekend Traffic Comparison")
-    st.write("Add your code for the Weekday vs. Weekend Traffic Comparison here")
\ No newline at end of file
+
+    session = get_db_session()
+    if session is None:
+        st.error("Could not get database session.")
+        return
+    try:
+        station_index = get_station_index(session)
+        years = get_distinct_values(session, 'year', table=StationProfileHourly)
+        if station_index is None or years is None:
+            st.error("Error loading station data. Database connection might be unavailable.")
+            return
+        if not years:
+            st.warning("No profile summaries found. Run the summary table refresh first.")
+            return
+
+        station_keys, selection_desc = select_stations(station_index)
+        col1, col2 = st.columns(2)
+        with col1:
+            direction = st.selectbox("Select Direction", options=list(DIRECTIONS), format_func=DIRECTIONS.get,
+                                     index=2)
+        with col2:
+            year = st.selectbox("Select Year", options=sorted(years, reverse=True))
+        if not station_keys:
+            st.info("Select at least one station, LGA or road type to compare weekdays and weekends.")
+            return
+
+        with st.spinner("Loading profile summaries..."):
+            cube = get_profile_cube(session, year)
+        if cube is None:
+            st.error("Failed to load hourly profile data.")
+            return
+        profile = cube.profile(station_keys, directions=[direction], classification_seq=1)
+        if profile.isna().all().all():
+            st.warning("No traffic data found for the selected stations in this year.")
+            return
+        logger.info(f"Weekday/weekend comparison for {len(station_keys)} stations in {year}")
+
+        direction_desc = DIRECTIONS[direction]
+        profiles_tab, metrics_tab = st.tabs(["Hourly Profiles", "Key Metrics"])
+        with profiles_tab:
+            if not show_chart(
+                profile_chart_data(profile),
+                'line',
+                x='Hour',
+                y='Average Volume',
+                by='Period',
+                title=f"Weekday vs Weekend Hourly Profile ({selection_desc}, {direction_desc}, {year})",
+                xlabel="Hour of Day (0-23)",
+                ylabel="Average Traffic Volume",
+                legend='top_left',
+                grid=True,
+                width=700,
+                height=400,
+                line_width=3
+            ):
+                st.error("Failed to generate the hourly profile chart.")
+        with metrics_tab:
+            st.markdown(f"### Weekday vs Weekend Key Metrics ({selection_desc}, {direction_desc}, {year})")
+            st.dataframe(profile_metrics(profile).round(0), use_container_width=True)
+    except Exception as e:
+        logger.error(f"Failed to render weekday/weekend comparison: {e}", exc_info=True)
+        st.error("Error comparing weekday and weekend traffic. Check logs for details.")
+    finally:
+        session.close()
@@ -0,0 +1,119 @@
+# app/hv_metrics.py
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+ALL_CLASS = 1  # classification_seq of the all-vehicles count
+HV_CLASS = 3  # classification_seq of the heavy-vehicle count
+CLASS_PREFIXES = {ALL_CLASS: 'all', HV_CLASS: 'hv'}  # Column prefix per class in the pivoted layout
+TOP_HV_STATIONS = 20  # Default length of the station ranking
+# -----------------------------
+
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+VALUE_COLUMNS = HOUR_COLUMNS + ['daily_total']
+CLASS_INDEX = {seq: position for position, seq in enumerate(CLASS_PREFIXES)}
+
+def pivot_column(classification_seq, column) -> str:
+    """Name of `column` for one class in the pivoted layout, e.g. 'hv_hour_07'."""
+    return f"{CLASS_PREFIXES[classification_seq]}_{column}"
+
+def pivot_columns() -> list:
+    """The pivoted layout: station_key, then per class a day count and the summed VALUE_COLUMNS."""
+    columns = ['station_key']
+    for seq in CLASS_PREFIXES:
+        columns.append(pivot_column(seq, 'days'))
+        columns.extend(pivot_column(seq, col) for col in VALUE_COLUMNS)
+    return columns
+
+def class_cube(station_days: pd.DataFrame):
+    """
+    Reshapes class rows (station_key, count_date, classification_seq,
+    hour_00..hour_23, daily_total; one row per station, day and class) into
+    a (station, class, value) array of sums and a (station, class) array of
+    day counts, with one scatter-add each instead of a merge per class.
+
+    Returns:
+        (station_keys, sums, days), classes in CLASS_PREFIXES order.
+    """
+    rows = station_days[station_days['classification_seq'].isin(list(CLASS_PREFIXES))]
+    keys, station_codes = np.unique(rows['station_key'].to_numpy(dtype=np.int64), return_inverse=True)
+    class_codes = rows['classification_seq'].map(CLASS_INDEX).to_numpy(dtype=np.int64)
+    values = rows[VALUE_COLUMNS].to_numpy(dtype=float, na_value=np.nan)
+
+    sums = np.zeros((len(keys), len(CLASS_PREFIXES), len(VALUE_COLUMNS)))
+    days = np.zeros((len(keys), len(CLASS_PREFIXES)), dtype=np.int64)
+    np.add.at(sums, (station_codes, class_codes), np.nan_to_num(values, nan=0.0))  # SUM skips NULLs
+    np.add.at(days, (station_codes, class_codes), 1)
+    return keys, sums, days
+
+def class_pivot(station_days: pd.DataFrame) -> pd.DataFrame:
+    """class_cube flattened into the pivoted layout returned by the SQL reader."""
+    keys, sums, days = class_cube(station_days)
+    data = {'station_key': keys}
+    for position, seq in enumerate(CLASS_PREFIXES):
+        data[pivot_column(seq, 'days')] = days[:, position]
+        for column, values in zip(VALUE_COLUMNS, sums[:, position, :].T):
+            data[pivot_column(seq, column)] = values
+    return pd.DataFrame(data, columns=pivot_columns())
+
+def pivot_arrays(pivot: pd.DataFrame):
+    """The pivoted layout back as (station_keys, sums, days) arrays shaped like class_cube's."""
+    sums = np.stack([pivot[[pivot_column(seq, col) for col in VALUE_COLUMNS]].to_numpy(dtype=float, na_value=0.0)
+                     for seq in CLASS_PREFIXES], axis=1)
+    days = np.stack([pivot[pivot_column(seq, 'days')].to_numpy(dtype=float, na_value=0.0)
+                     for seq in CLASS_PREFIXES], axis=1)
+    return pivot['station_key'].to_numpy(dtype=np.int64), sums, days
+
+def _ratio(numerator, denominator):
+    """numerator / denominator, NaN where the denominator is zero."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+def hv_hourly_profile(pivot: pd.DataFrame) -> pd.DataFrame:
+    """
+    Average HV and total volume per hour across every station-day in
+    `pivot`, and the HV percentage as 100 * average HV / average total.
+
+    Returns:
+        DataFrame ['Hour', 'Average HV Volume', 'Average Total Volume', 'HV Percentage (%)'].
+    """
+    _, sums, days = pivot_arrays(pivot)
+    hv, total = CLASS_INDEX[HV_CLASS], CLASS_INDEX[ALL_CLASS]
+    hv_volume = _ratio(sums[:, hv, :24].sum(axis=0), days[:, hv].sum())
+    total_volume = _ratio(sums[:, total, :24].sum(axis=0), days[:, total].sum())
+    return pd.DataFrame({
+        'Hour': range(24),
+        'Average HV Volume': hv_volume,
+        'Average Total Volume': total_volume,
+        'HV Percentage (%)': 100 * _ratio(hv_volume, total_volume),
+    })
+
+def hv_station_summary(pivot: pd.DataFrame) -> pd.DataFrame:
+    """
+    Average daily HV and total volume per station and the HV percentage of
+    those averages.
+
+    Returns:
+        DataFrame [station_key, hv_daily, total_daily, hv_percentage, days].
+    """
+    keys, sums, days = pivot_arrays(pivot)
+    hv, total = CLASS_INDEX[HV_CLASS], CLASS_INDEX[ALL_CLASS]
+    hv_daily = _ratio(sums[:, hv, -1], days[:, hv])
+    total_daily = _ratio(sums[:, total, -1], days[:, total])
+    return pd.DataFrame({
+        'station_key': keys,
+        'hv_daily': hv_daily,
+        'total_daily': total_daily,
+        'hv_percentage': 100 * _ratio(hv_daily, total_daily),
+        'days': days[:, total].astype(np.int64),
+    })
+
+def top_hv_stations(summary: pd.DataFrame, n: int = TOP_HV_STATIONS, by: str = 'hv_daily') -> pd.DataFrame:
+    """The `n` stations with the highest `by` ('hv_daily' or 'hv_percentage'), stations without HV data last."""
+    return summary.sort_values([by, 'station_key'], ascending=[False, True], na_position='last').head(n) \
+        .reset_index(drop=True)
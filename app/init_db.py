@@ -1,15 +1,18 @@
 import os
 import logging
+import argparse
+import datetime
 from log_config import setup_logging
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from models import Base
+from dbtools.db_partitions import create_partitioned_hourly_counts, parse_years
 
 # For TOML parsing
 import tomli
 
 # Set up logging
-setup_logging(script_name="init_db")
+setup_logging()
 logger = logging.getLogger(__name__)
 
 def get_database_url():
@@ -35,8 +38,14 @@ def get_database_url():
 
     raise RuntimeError("DATABASE_URL not found in environment or .streamlit/secrets.toml")
 
-def init_db():
-    """Initialize the database with station reference data"""
+def init_db(partitioned=False, years=()):
+    """
+    Initialize the database with station reference data.
+
+    With `partitioned`, hourly_counts is created as a table range-partitioned
+    on count_date with one partition per year in `years`; ingestion adds
+    partitions for new years automatically.
+    """
     logger.info("Starting database initialization process")
     DATABASE_URL = get_database_url()
     logger.info(f"Using database URL: {DATABASE_URL}")
@@ -60,7 +69,13 @@ def init_db():
 
             print("\nCreating new tables...")
             logger.info("Creating new database tables")
-            Base.metadata.create_all(engine)
+            if partitioned:
+                other_tables = [t for t in Base.metadata.sorted_tables if t.name != 'hourly_counts']
+                Base.metadata.create_all(engine, tables=other_tables)
+                create_partitioned_hourly_counts(engine, years)
+                print(f"Created partitioned hourly_counts with {len(years)} yearly partitions")
+            else:
+                Base.metadata.create_all(engine)
             print("New tables created successfully")
 
             print("\nDatabase initialization completed successfully!")
@@ -79,4 +94,10 @@ def init_db():
         logger.info("Database engine disposed")
 
 if __name__ == '__main__':
-    init_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the PostGIS extension and all tables.")
+    parser.add_argument('--partitioned', action='store_true',
+                        help="Create hourly_counts range-partitioned by year of count_date")
+    parser.add_argument('--years', nargs='*', default=[f"2006-{datetime.date.today().year}"],
+                        help="Years to pre-create partitions for, e.g. 2006-2025 2030 (default: 2006 to this year)")
+    args = parser.parse_args()
+    init_db(partitioned=args.partitioned, years=parse_years(args.years) if args.partitioned else ())
\ No newline at end of file
@@ -2,6 +2,8 @@ import sys
 from pathlib import Path
 import logging
 import os
+import time
+import importlib
 
 # Set environment variable to disable the welcome message
 # Must be set before importing streamlit
@@ -23,6 +25,21 @@ from app.db_utils import init_db_resources
 # --- Constants ---
 LOGO_PATH = Path("app/gfx/ptc-logo-white.svg")
 
+# Feature pages in navigation order: page name -> (module, render function).
+# Modules are imported only when their page is selected (see resolve_page).
+FEATURE_PAGES = {
+    "Station Profile": ("app.features.feature_1_profile", "render_station_profile"),
+    "Peak Hour Analysis": ("app.features.feature_2_peak", "render_peak_analysis"),
+    "Corridor Comparison": ("app.features.feature_3_corridor", "render_corridor_comparison"),
+    "Heavy Vehicle Explorer": ("app.features.feature_4_heavy_vehicle", "render_heavy_vehicle_explorer"),
+    "Weekday vs Weekend": ("app.features.feature_5_weekday_weekend", "render_weekday_weekend_comparison"),
+    "Data Quality Overview": ("app.features.feature_6_quality", "render_data_quality_overview"),
+    "LGA/Suburb Snapshot": ("app.features.feature_7_snapshot", "render_lga_suburb_snapshot"),
+    "Directional Flow Analysis": ("app.features.feature_8_directional", "render_directional_flow_analysis"),
+    "Hierarchy Benchmarking": ("app.features.feature_9_hierarchy", "render_hierarchy_benchmarking"),
+    "Seasonal Trends": ("app.features.feature_10_seasonal", "render_seasonal_trend_analyzer"),
+}
+
 # --- Core Functions ---
 
 def configure_page():
@@ -49,7 +66,7 @@ def initialize_database(logger):
     """
     logger.info("Attempting to initialize database resources...")
     try:
-        # init_db_resources is cached via @st.cache_resource in db_utils
+        # init_db_resources returns a process-wide engine and session factory cached in db_utils
         engine, SessionFactory = init_db_resources()
         if engine is None or SessionFactory is None:
             raise ConnectionError("Database Engine or Session Factory failed to initialize.")
@@ -61,40 +78,39 @@ def initialize_database(logger):
         st.stop() # Stop script execution
 
 def load_feature_modules(logger):
-    """Dynamically imports and returns the feature rendering functions."""
-    logger.info("Loading feature modules...")
+    """
+    Returns the page registry without importing any feature module.
+
+    Each feature page maps to the (module, function) that renders it; the
+    module, and the plotting libraries it pulls in, are imported by
+    resolve_page only when the page is first selected. Home renders locally.
+    """
+    logger.info("Registering feature pages...")
+    pages = {"Home": render_home_page} # Reference the local function
+    pages.update(FEATURE_PAGES)
+    return pages
+
+def resolve_page(page_name, pages_dict, logger):
+    """
+    Returns the render function for `page_name`, importing its feature module
+    on first use. Modules stay in sys.modules, so later reruns reuse them.
+    Returns None if the page is unknown or its module fails to import.
+    """
+    entry = pages_dict.get(page_name)
+    if entry is None or callable(entry):
+        return entry
+    module_name, function_name = entry
     try:
-        # Import feature functions *after* potential st.stop() in DB init
-        from app.features.feature_1_profile import render_station_profile
-        from app.features.feature_2_peak import render_peak_analysis
-        from app.features.feature_3_corridor import render_corridor_comparison
-        from app.features.feature_4_heavy_vehicle import render_heavy_vehicle_explorer
-        from app.features.feature_5_weekday_weekend import render_weekday_weekend_comparison
-        from app.features.feature_6_quality import render_data_quality_overview
-        from app.features.feature_7_snapshot import render_lga_suburb_snapshot
-        from app.features.feature_8_directional import render_directional_flow_analysis
-        from app.features.feature_9_hierarchy import render_hierarchy_benchmarking
-        from app.features.feature_10_seasonal import render_seasonal_trend_analyzer
-
-        pages = {
-            "Home": render_home_page, # Reference the local function
-            "Station Profile": render_station_profile,
-            "Peak Hour Analysis": render_peak_analysis,
-            "Corridor Comparison": render_corridor_comparison,
-            "Heavy Vehicle Explorer": render_heavy_vehicle_explorer,
-            "Weekday vs Weekend": render_weekday_weekend_comparison,
-            "Data Quality Overview": render_data_quality_overview,
-            "LGA/Suburb Snapshot": render_lga_suburb_snapshot,
-            "Directional Flow Analysis": render_directional_flow_analysis,
-            "Hierarchy Benchmarking": render_hierarchy_benchmarking,
-            "Seasonal Trends": render_seasonal_trend_analyzer,
-        }
-        logger.info("Feature modules loaded successfully.")
-        return pages
-    except ImportError as e:
-        logger.error(f"Failed to import one or more feature modules: {e}", exc_info=True)
+        started = time.perf_counter()
+        already_loaded = module_name in sys.modules
+        feature_function = getattr(importlib.import_module(module_name), function_name)
+        if not already_loaded:
+            logger.info(f"Loaded feature module {module_name} in {time.perf_counter() - started:.2f}s")
+        return feature_function
+    except (ImportError, AttributeError) as e:
+        logger.error(f"Failed to import feature module for '{page_name}': {e}", exc_info=True)
         st.error("Error loading application features. Check logs.")
-        return {} # Return empty dict on failure
+        return None
 
 # --- UI Rendering Functions ---
 
@@ -178,8 +194,8 @@ def render_home_page():
     """, unsafe_allow_html=True)
 
 def render_feature_page(page_name, pages_dict, logger):
-    """Renders the selected feature page."""
-    feature_function = pages_dict.get(page_name)
+    """Renders the selected feature page, importing its module on first selection."""
+    feature_function = resolve_page(page_name, pages_dict, logger)
     if feature_function:
         logger.info(f"Rendering feature: {page_name}")
         try:
@@ -1,8 +1,9 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Float, Date, ForeignKey,
-    Index, BigInteger
+    Column, Integer, String, Boolean, Float, Date, DateTime, ForeignKey,
+    Index, BigInteger, UniqueConstraint, func
 )
 from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.dialects.postgresql import ARRAY
 from geoalchemy2 import Geometry
 
 Base = declarative_base()
@@ -38,14 +39,14 @@ class HourlyCount(Base):
     __tablename__ = 'hourly_counts'
     
     count_id = Column(BigInteger, primary_key=True)
-    station_key = Column(Integer, ForeignKey('stations.station_key'), nullable=False, index=True)
+    station_key = Column(Integer, ForeignKey('stations.station_key'), nullable=False)
     traffic_direction_seq = Column(Integer, nullable=False)
     cardinal_direction_seq = Column(Integer)
-    classification_seq = Column(Integer, nullable=False, index=True)
-    count_date = Column(Date, nullable=False, index=True)
-    year = Column(Integer, nullable=False, index=True)
-    month = Column(Integer, nullable=False, index=True)
-    day_of_week = Column(Integer, nullable=False, index=True)
+    classification_seq = Column(Integer, nullable=False)
+    count_date = Column(Date, nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    day_of_week = Column(Integer, nullable=False)
     is_public_holiday = Column(Boolean, default=False)
     is_school_holiday = Column(Boolean, default=False)
     
@@ -76,6 +77,7 @@ class HourlyCount(Base):
     hour_23 = Column(BigInteger)
     
     daily_total = Column(BigInteger)
+    hours_counted = Column(Integer)  # Hours with a valid count in the source row (quality rule: >= 19)
     
     # Relationship with Station
     station = relationship("Station", back_populates="hourly_counts")
@@ -89,7 +91,80 @@ class HourlyCount(Base):
         Index('ix_hourly_counts_month', 'month'),
         Index('ix_hourly_counts_day_of_week', 'day_of_week'),
         Index('idx_hourly_composite', 'station_key', 'count_date', 'classification_seq'),
+        # Natural key of a count row; makes re-ingestion idempotent via ON CONFLICT upserts
+        UniqueConstraint('station_key', 'count_date', 'traffic_direction_seq', 'classification_seq',
+                         name='uq_hourly_counts_natural_key'),
     )
 
+class StationYearMetric(Base):
+    """
+    Pre-aggregated yearly metrics per station and direction, maintained at
+    ingest time from days with >= 19 counted hours.
+    """
+    __tablename__ = 'station_year_metrics'
+
+    station_key = Column(Integer, ForeignKey('stations.station_key'), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    traffic_direction_seq = Column(Integer, primary_key=True)
+    aadt = Column(Float)             # Average daily_total, all vehicles (classification_seq = 1)
+    aawt = Column(Float)             # As AADT, Mon-Fri excluding public holidays
+    hv_aadt = Column(Float)          # Average daily_total, heavy vehicles (classification_seq = 3)
+    hv_percentage = Column(Float)    # 100 * hv_aadt / aadt, classifier stations only
+    days_counted = Column(Integer)
+    weekdays_counted = Column(Integer)
+
+class StationProfileHourly(Base):
+    """
+    Weekday/weekend hourly volume sums per station, year, direction and class
+    (public holidays excluded, >= 19 counted hours). Average = volume_sum / day_count.
+    """
+    __tablename__ = 'station_profile_hourly'
+
+    station_key = Column(Integer, ForeignKey('stations.station_key'), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    traffic_direction_seq = Column(Integer, primary_key=True)
+    classification_seq = Column(Integer, primary_key=True)
+    day_type = Column(String, primary_key=True)  # 'weekday' or 'weekend'
+    hour = Column(Integer, primary_key=True)     # 0-23
+    volume_sum = Column(BigInteger, nullable=False)
+    day_count = Column(Integer, nullable=False)
+
+class IngestCheckpoint(Base):
+    """Per-file progress of hourly CSV ingestion, used to resume interrupted runs."""
+    __tablename__ = 'ingest_checkpoints'
+
+    file_path = Column(String, primary_key=True)
+    file_size = Column(BigInteger, nullable=False)
+    file_hash = Column(String, nullable=False)
+    rows_read = Column(BigInteger, nullable=False, default=0)    # CSV data rows consumed
+    rows_loaded = Column(BigInteger, nullable=False, default=0)  # Rows written to hourly_counts
+    status = Column(String, nullable=False, default='in_progress')  # 'in_progress' or 'complete'
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class DatasetVersion(Base):
+    """Version stamp bumped by every ingestion run; the app's query cache keys on it."""
+    __tablename__ = 'dataset_version'
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class IngestRun(Base):
+    """
+    One completed ingestion run: the dataset version it produced and the
+    stations/dates it touched, so cached results outside that range stay valid.
+    """
+    __tablename__ = 'ingest_runs'
+
+    run_id = Column(Integer, primary_key=True, autoincrement=True)
+    dataset_name = Column(String, nullable=False)
+    version = Column(BigInteger, nullable=False, index=True)
+    station_keys = Column(ARRAY(Integer))  # NULL means every station may have changed
+    min_date = Column(Date)  # NULL means unbounded
+    max_date = Column(Date)
+    rows_loaded = Column(BigInteger)
+    source = Column(String)  # e.g. CSV path or 'parallel'
+    finished_at = Column(DateTime, server_default=func.now())
+
 # Create indexes
 Index('idx_station_composite', Station.lga, Station.suburb, Station.road_name)
@@ -0,0 +1,131 @@
+# app/peak_metrics.py
+import logging
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+AM_PEAK = (6, 9)  # Inclusive hour range: hour_06..hour_09
+PM_PEAK = (15, 18)  # Inclusive hour range: hour_15..hour_18
+DEFAULT_PEAK_WINDOWS = {'am_peak': AM_PEAK, 'pm_peak': PM_PEAK}
+ROLLING_WIDTHS = (1, 4)  # Widths (hours) offered for the true peak hour mode
+TRUE_PEAK_PERIODS = {'am_peak': (0, 11), 'pm_peak': (12, 23)}  # Where the true peak blocks are searched for
+# -----------------------------
+
+HOUR_COLUMNS = [f'hour_{h:02d}' for h in range(24)]
+
+def validate_window(window: Tuple[int, int]) -> Tuple[int, int]:
+    """Checks an inclusive (first_hour, last_hour) window and returns it as ints."""
+    first, last = int(window[0]), int(window[1])
+    if not 0 <= first <= last <= 23:
+        raise ValueError(f"Invalid peak window {window}: hours must satisfy 0 <= first <= last <= 23")
+    return first, last
+
+def window_columns(window: Tuple[int, int]) -> list:
+    first, last = validate_window(window)
+    return HOUR_COLUMNS[first:last + 1]
+
+def window_sum_expression(columns, window: Tuple[int, int]):
+    """
+    SQL expression adding the window's hour columns, e.g. hour_06 + ... + hour_09.
+    `columns` is anything exposing the hour columns as attributes (an ORM
+    model or a table/subquery's `.c`).
+    """
+    hours = [getattr(columns, col) for col in window_columns(window)]
+    expression = hours[0]
+    for hour in hours[1:]:
+        expression = expression + hour
+    return expression
+
+def hour_matrix(df: pd.DataFrame) -> np.ndarray:
+    """The 24 hour columns as an (n_rows, 24) float matrix; missing counts are NaN."""
+    return df[HOUR_COLUMNS].to_numpy(dtype=float, na_value=np.nan)
+
+def window_sums(matrix: np.ndarray, window: Tuple[int, int]) -> np.ndarray:
+    """Per-row sum over an inclusive hour window. A row missing any hour in it gets NaN."""
+    first, last = validate_window(window)
+    return matrix[:, first:last + 1].sum(axis=1)
+
+def rolling_peak(matrix: np.ndarray, width: int = 1, search: Tuple[int, int] = (0, 23)):
+    """
+    The busiest `width`-hour block lying inside the inclusive hour range
+    `search`, for every row at once: rolling sums come from one cumulative
+    sum along the hour axis. Blocks with a missing hour are skipped; rows
+    where every block has one get NaN.
+
+    Returns:
+        (start_hours, volumes) arrays, start hour -1 where volume is NaN.
+    """
+    width = int(width)
+    if not 1 <= width <= 24:
+        raise ValueError(f"Invalid rolling width {width}: must be 1-24 hours")
+    first, last = validate_window(search)
+    last = last - width + 1
+    if first > last:
+        raise ValueError(f"No {width}-hour block fits within hours {search}")
+
+    filled = np.nan_to_num(matrix, nan=0.0)
+    missing = np.isnan(matrix).astype(np.int64)
+    zeros = np.zeros((len(matrix), 1))
+    totals = np.concatenate([zeros, filled.cumsum(axis=1)], axis=1)
+    gaps = np.concatenate([zeros.astype(np.int64), missing.cumsum(axis=1)], axis=1)
+    starts = np.arange(first, last + 1)
+    sums = totals[:, starts + width] - totals[:, starts]
+    sums[(gaps[:, starts + width] - gaps[:, starts]) > 0] = -np.inf
+
+    best = sums.argmax(axis=1) if len(sums) else np.zeros(0, dtype=int)
+    volumes = sums[np.arange(len(sums)), best]
+    valid = np.isfinite(volumes)
+    return np.where(valid, starts[best], -1), np.where(valid, volumes, np.nan)
+
+def station_day_peaks(station_days: pd.DataFrame, windows: Dict[str, Tuple[int, int]] = None,
+                      rolling_width: int = None) -> pd.DataFrame:
+    """
+    Peak volumes for every station-day row (station_key, count_date,
+    hour_00..hour_23). Adds one column per entry of `windows` (fixed window
+    sums) and, with `rolling_width`, `<name>_start`/`<name>_volume` per
+    window (the busiest `rolling_width`-hour block inside it).
+    """
+    windows = windows or DEFAULT_PEAK_WINDOWS
+    matrix = hour_matrix(station_days)
+    result = station_days[['station_key', 'count_date']].copy()
+    for name, window in windows.items():
+        result[name] = window_sums(matrix, window)
+        if rolling_width:
+            starts, volumes = rolling_peak(matrix, rolling_width, window)
+            result[f'{name}_start'] = starts
+            result[f'{name}_volume'] = volumes
+    return result
+
+def station_peak_summary(station_days: pd.DataFrame, windows: Dict[str, Tuple[int, int]] = None,
+                         rolling_width: int = None) -> pd.DataFrame:
+    """
+    Averages station_day_peaks per station: mean fixed-window sums, and in
+    rolling mode the mean peak block volume plus the most common start hour.
+
+    Returns:
+        DataFrame indexed by station_key with a `days` column.
+    """
+    windows = windows or DEFAULT_PEAK_WINDOWS
+    peaks = station_day_peaks(station_days, windows, rolling_width)
+    grouped = peaks.groupby('station_key')
+    summary = grouped[list(windows)].mean()
+    summary['days'] = grouped.size()
+    if rolling_width:
+        for name in windows:
+            summary[f'{name}_volume'] = grouped[f'{name}_volume'].mean()
+            # Most common start hour per station (earliest on ties); days without a complete block are left out
+            column = f'{name}_start'
+            counts = peaks.loc[peaks[column] >= 0].groupby(['station_key', column]).size().reset_index(name='n')
+            modal = counts.sort_values(['station_key', 'n', column], ascending=[True, False, True])
+            summary[column] = modal.drop_duplicates('station_key').set_index('station_key')[column]
+    return summary
+
+def hour_label(start_hour, width: int = 1) -> str:
+    """'07:00-08:00' style label for a block; '' for a missing start."""
+    if pd.isna(start_hour) or start_hour < 0:
+        return ''
+    start_hour = int(start_hour)
+    return f"{start_hour:02d}:00-{(start_hour + width) % 24:02d}:00"
@@ -0,0 +1,227 @@
+# app/profile_cube.py
+import os
+import logging
+import threading
+from typing import Optional
+import numpy as np
+import pandas as pd
+from app.db_utils import get_profile_hourly_rows, get_profile_hourly_checksum
+from app.query_cache import get_dataset_version, build_scope, changed_stations
+from app.peak_metrics import DEFAULT_PEAK_WINDOWS
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+DEFAULT_CUBE_DIR = os.path.join("app", "data", "cubes")  # Override with the TRAFFIC_CUBE_DIR environment variable
+CUBE_FILE_NAME = 'profile_cube_{year}.npz'  # One file per year
+DAY_TYPES = ('weekday', 'weekend')  # station_profile_hourly.day_type values, in axis order
+# -----------------------------
+
+PERIOD_LABELS = {'weekday': 'Weekday', 'weekend': 'Weekend'}
+ROW_COLUMNS = ['station_key', 'traffic_direction_seq', 'classification_seq', 'day_type', 'hour',
+               'volume_sum', 'day_count']
+
+_lock = threading.Lock()
+_cubes = {}  # year -> ProfileCube
+
+def cube_path(year) -> str:
+    return os.path.join(os.environ.get('TRAFFIC_CUBE_DIR', DEFAULT_CUBE_DIR), CUBE_FILE_NAME.format(year=int(year)))
+
+class ProfileCube:
+    """
+    One year of station_profile_hourly as dense NumPy arrays with axes
+    (station, direction, class, day type, hour): `sums` holds volume_sum
+    and `counts` day_count. Any selection of stations is answered by
+    summing their slices, with no database round trip.
+    """
+
+    def __init__(self, year, keys, directions, classes, sums, counts, version=0):
+        self.year = int(year)
+        self.version = int(version)
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.directions = np.asarray(directions, dtype=np.int64)
+        self.classes = np.asarray(classes, dtype=np.int64)
+        self.sums = sums
+        self.counts = counts
+        self._rows = {int(key): row for row, key in enumerate(self.keys)}
+
+    @classmethod
+    def from_rows(cls, year, rows: pd.DataFrame, version=0, directions=None, classes=None) -> 'ProfileCube':
+        """Builds the cube from station_profile_hourly rows; axes default to the values present in `rows`."""
+        rows = rows[rows['day_type'].isin(DAY_TYPES)]
+        keys, station_codes = np.unique(rows['station_key'].to_numpy(dtype=np.int64), return_inverse=True)
+        directions = np.unique(rows['traffic_direction_seq']) if directions is None else np.asarray(directions)
+        classes = np.unique(rows['classification_seq']) if classes is None else np.asarray(classes)
+        index = (
+            station_codes,
+            np.searchsorted(directions, rows['traffic_direction_seq'].to_numpy()),
+            np.searchsorted(classes, rows['classification_seq'].to_numpy()),
+            rows['day_type'].map({day_type: code for code, day_type in enumerate(DAY_TYPES)}).to_numpy(dtype=np.int64),
+            rows['hour'].to_numpy(dtype=np.int64),
+        )
+        shape = (len(keys), len(directions), len(classes), len(DAY_TYPES), 24)
+        sums = np.zeros(shape, dtype=np.int64)
+        counts = np.zeros(shape, dtype=np.int32)
+        sums[index] = rows['volume_sum'].to_numpy(dtype=np.int64)
+        counts[index] = rows['day_count'].to_numpy(dtype=np.int32)
+        return cls(year, keys, directions, classes, sums, counts, version)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def checksum(self) -> tuple:
+        """(rows, total volume_sum, total day_count) as get_profile_hourly_checksum reports them for the year."""
+        return int(np.count_nonzero(self.counts)), int(self.sums.sum()), int(self.counts.sum())
+
+    def covers(self, rows: pd.DataFrame) -> bool:
+        """True if every direction and class in `rows` already has an axis position."""
+        return set(rows['traffic_direction_seq']) <= set(self.directions.tolist()) and \
+            set(rows['classification_seq']) <= set(self.classes.tolist())
+
+    def patched(self, station_keys, rows: pd.DataFrame, version) -> 'ProfileCube':
+        """
+        A new cube with the slices of `station_keys` replaced by `rows` (their
+        complete, current station_profile_hourly rows); stations left without
+        rows are dropped. Raises ValueError if `rows` need a new axis position.
+        """
+        if not self.covers(rows):
+            raise ValueError("Profile rows add a direction or class the cube has no axis for")
+        update = ProfileCube.from_rows(self.year, rows, version, self.directions, self.classes)
+        keep = ~np.isin(self.keys, np.asarray(list(station_keys), dtype=np.int64))
+        keys = np.concatenate([self.keys[keep], update.keys])
+        order = np.argsort(keys, kind='stable')
+        return ProfileCube(self.year, keys[order], self.directions, self.classes,
+                           np.concatenate([self.sums[keep], update.sums])[order],
+                           np.concatenate([self.counts[keep], update.counts])[order], version)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temporary = f"{path}.tmp.npz"
+        np.savez_compressed(temporary, year=self.year, version=self.version, keys=self.keys,
+                            directions=self.directions, classes=self.classes, sums=self.sums, counts=self.counts)
+        os.replace(temporary, path)  # Readers never see a half-written file
+
+    @classmethod
+    def load(cls, path) -> 'ProfileCube':
+        with np.load(path) as data:
+            return cls(data['year'], data['keys'], data['directions'], data['classes'],
+                       data['sums'], data['counts'], data['version'])
+
+    def profile(self, station_keys, directions=None, classification_seq=1) -> pd.DataFrame:
+        """
+        Average hourly volume per day type over the selected stations' days:
+        per direction, summed volumes over summed day counts, then the
+        selected directions added together (so 'both directions' is a
+        two-way volume). Stations without data are ignored.
+
+        Returns:
+            DataFrame indexed by hour (0-23) with 'Weekday' and 'Weekend'
+            columns (NaN where no days were counted), like get_hourly_profile.
+        """
+        rows = [self._rows[key] for key in station_keys if key in self._rows]
+        direction_mask = np.ones(len(self.directions), dtype=bool) if not directions or 3 in directions \
+            else np.isin(self.directions, directions)
+        class_position = np.flatnonzero(self.classes == classification_seq)
+        if not rows or not direction_mask.any() or not len(class_position):
+            averages = np.full((len(DAY_TYPES), 24), np.nan)
+        else:
+            sums = self.sums[rows][:, direction_mask, class_position[0]].sum(axis=0, dtype=np.float64)
+            counts = self.counts[rows][:, direction_mask, class_position[0]].sum(axis=0, dtype=np.float64)
+            per_direction = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+            counted = (counts > 0).any(axis=0)
+            averages = np.where(counted, np.nansum(per_direction, axis=0), np.nan)
+        return pd.DataFrame(averages.T, index=pd.RangeIndex(24, name='hour'),
+                            columns=[PERIOD_LABELS[day_type] for day_type in DAY_TYPES])
+
+def profile_metrics(profile: pd.DataFrame, windows=None) -> pd.DataFrame:
+    """
+    Key metrics per period from an hourly profile: the average daily volume
+    (the 24 hourly averages added up) and the average volume in each peak
+    window.
+
+    Returns:
+        DataFrame indexed by period with 'Average Daily Volume' and
+        'Average <AM/PM> Peak Volume' columns.
+    """
+    windows = windows or DEFAULT_PEAK_WINDOWS
+    metrics = pd.DataFrame({'Average Daily Volume': profile.sum(min_count=24)})
+    for name, (first, last) in windows.items():
+        label = name.replace('_peak', '').upper()
+        metrics[f'Average {label} Peak Volume'] = profile.loc[first:last].sum(min_count=last - first + 1)
+    return metrics
+
+def _patch(_session, year, cube, version) -> Optional[ProfileCube]:
+    """
+    Brings `cube` up to `version` by re-reading only the stations touched
+    by ingest runs in this year. Returns None when that is not possible
+    (unknown or unscoped runs, new axis values, a failed read).
+    """
+    scope = build_scope({'year': year}, years='year')
+    stations = changed_stations({'version': cube.version, 'scope': scope}, version)
+    if stations is None:
+        return None
+    if not stations:
+        return ProfileCube(year, cube.keys, cube.directions, cube.classes, cube.sums, cube.counts, version)
+    rows = get_profile_hourly_rows(_session, year, sorted(stations))
+    if rows is None or not cube.covers(rows):
+        return None
+    logger.info(f"Patching profile cube {year} for {len(stations)} changed stations")
+    return cube.patched(stations, rows, version)
+
+def _build(_session, year, version) -> Optional[ProfileCube]:
+    rows = get_profile_hourly_rows(_session, year)
+    if rows is None:
+        return None
+    logger.info(f"Building profile cube {year} from {len(rows)} rows")
+    return ProfileCube.from_rows(year, rows, version)
+
+def get_profile_cube(_session, year) -> Optional[ProfileCube]:
+    """
+    The profile cube for `year` at the current dataset version: kept in
+    memory, persisted to cube_path(year), and refreshed incrementally when
+    the version moves on. Whenever a cube is loaded from disk or refreshed,
+    its totals are checked against get_profile_hourly_checksum and it is
+    rebuilt on a mismatch. Returns None if it cannot be built.
+    """
+    if _session is None:
+        logger.error("Database session is None in get_profile_cube.")
+        return None
+    year = int(year)
+    version = get_dataset_version(_session)
+    cube = _cubes.get(year)
+    if cube is not None and cube.version == version:
+        return cube
+    with _lock:
+        cube = _cubes.get(year)
+        if cube is not None and cube.version == version:
+            return cube
+        checksum = get_profile_hourly_checksum(_session, year)
+        if checksum is None:
+            return None
+        path = cube_path(year)
+        if cube is None and os.path.exists(path):
+            try:
+                cube = ProfileCube.load(path)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable profile cube {path}: {e}")
+        loaded = cube
+        if cube is not None and cube.version != version:
+            cube = _patch(_session, year, cube, version)
+        if cube is not None and cube.checksum() != checksum:
+            logger.warning(f"Profile cube {year} does not match station_profile_hourly; rebuilding")
+            cube = None
+        if cube is None:
+            cube = _build(_session, year, version)
+            if cube is None:
+                return None
+        if cube is not loaded:
+            try:
+                cube.save(path)
+            except OSError as e:
+                logger.warning(f"Could not save profile cube to {path}: {e}")
+        _cubes[year] = cube
+        return cube
+
+def clear_profile_cubes():
+    with _lock:
+        _cubes.clear()
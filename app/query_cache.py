@@ -0,0 +1,283 @@
+# app/query_cache.py
+import copy
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from sqlalchemy import select
+from app.models import DatasetVersion, IngestRun
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+DEFAULT_TTL_SECONDS = 24 * 3600  # Safe to keep long: ingestion runs invalidate overlapping entries
+DEFAULT_MAX_ENTRIES = 256  # Per reader; least recently used entries are evicted first
+VERSION_CHECK_SECONDS = 30  # How often the dataset version stamp is re-read from the database
+DATASET_NAME = 'traffic'  # Row in dataset_version bumped by ingestion
+# -----------------------------
+
+_lock = threading.RLock()
+_stores = {}  # reader qualname -> OrderedDict of key -> entry dict
+_version_state = {'value': None, 'checked_at': 0.0}
+_known_runs = {}  # dataset version -> change scope of the ingest run that produced it
+_call_state = threading.local()
+
+def skip_cache():
+    """Called by a reader's error path so its fallback result (None/empty) is not cached."""
+    _call_state.skip = True
+
+def _fetch_runs(conn, after_version, up_to_version):
+    """Loads the ingest_runs rows for versions in (after_version, up_to_version] into _known_runs."""
+    rows = conn.execute(
+        select(IngestRun.version, IngestRun.station_keys, IngestRun.min_date, IngestRun.max_date)
+        .where(IngestRun.dataset_name == DATASET_NAME,
+               IngestRun.version > after_version,
+               IngestRun.version <= up_to_version)
+    ).all()
+    for version, station_keys, min_date, max_date in rows:
+        _known_runs[int(version)] = {
+            'stations': frozenset(station_keys) if station_keys is not None else None,
+            'start': min_date,
+            'end': max_date,
+        }
+    logger.debug(f"Loaded {len(rows)} ingest runs after version {after_version}")
+
+def get_dataset_version(_session) -> int:
+    """
+    Returns the current dataset version stamp, re-reading it at most every
+    VERSION_CHECK_SECONDS. When it has moved on, the ingest_runs describing
+    the new versions are fetched in the same round trip. The query runs on
+    its own connection so a missing table cannot abort the caller's
+    transaction; in that case the version is 0. A version lower than the
+    last one seen means the database was rebuilt, so every cached result
+    and known ingest run is dropped.
+    """
+    with _lock:
+        previous = _version_state['value']
+        now = time.monotonic()
+        if previous is not None and now - _version_state['checked_at'] < VERSION_CHECK_SECONDS:
+            return previous
+        try:
+            with _session.get_bind().connect() as conn:
+                version = conn.execute(
+                    select(DatasetVersion.version).where(DatasetVersion.name == DATASET_NAME)
+                ).scalar()
+                version = int(version or 0)
+                if previous is not None and version > previous:
+                    _fetch_runs(conn, previous, version)
+        except Exception as e:
+            logger.debug(f"Could not read dataset version, assuming {previous or 0}: {e}")
+            version = previous or 0
+        if previous is not None and version < previous:
+            logger.warning(f"Dataset version went back {previous} -> {version}; clearing every cached query")
+            for store in _stores.values():
+                store.clear()
+            _known_runs.clear()
+        elif previous is not None and version != previous:
+            logger.info(f"Dataset version changed {previous} -> {version}; overlapping cached queries will refresh")
+        _version_state.update(value=version, checked_at=now)
+        return version
+
+def _to_date(value):
+    """Parses a date-like argument; anything unparseable is treated as unbounded."""
+    try:
+        return None if value is None else pd.Timestamp(value).date()
+    except (ValueError, TypeError):
+        return None
+
+def _as_set(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return frozenset(int(v) for v in value)
+    return frozenset([int(value)])
+
+def build_scope(params, stations=None, dates=None, years=None):
+    """
+    Describes which data a cached result depends on.
+
+    Args:
+        params: The reader's arguments by name.
+        stations: Name of the argument holding a station key or list of keys.
+        dates: (start, end) argument names of an inclusive date range.
+        years: Name of the argument holding a year or list of years.
+
+    Returns:
+        Dict with 'stations' (frozenset or None = all) and 'start'/'end'
+        (date or None = unbounded).
+    """
+    scope = {'stations': None, 'start': None, 'end': None}
+    if stations:
+        scope['stations'] = _as_set(params.get(stations))
+    if dates:
+        scope['start'], scope['end'] = _to_date(params.get(dates[0])), _to_date(params.get(dates[1]))
+    if years and params.get(years) is not None:
+        year_values = _as_set(params.get(years))
+        scope['start'] = pd.Timestamp(year=min(year_values), month=1, day=1).date()
+        scope['end'] = pd.Timestamp(year=max(year_values), month=12, day=31).date()
+    return scope
+
+def scopes_overlap(change, scope) -> bool:
+    """True if an ingest run's change scope can affect a cached result's scope."""
+    if change['stations'] is not None and scope['stations'] is not None \
+            and not change['stations'] & scope['stations']:
+        return False
+    if change['end'] is not None and scope['start'] is not None and change['end'] < scope['start']:
+        return False
+    if change['start'] is not None and scope['end'] is not None and change['start'] > scope['end']:
+        return False
+    return True
+
+def is_entry_current(entry, version) -> bool:
+    """
+    An entry computed at an older version is still current when every ingest
+    run since then is known and none overlaps its scope. Unknown versions
+    (e.g. runs recorded before ingest_runs existed) invalidate everything,
+    as does a version lower than the entry's (a rebuilt database).
+    """
+    if version < entry['version']:
+        return False
+    for changed_version in range(entry['version'] + 1, version + 1):
+        change = _known_runs.get(changed_version)
+        if change is None or scopes_overlap(change, entry['scope']):
+            return False
+    return True
+
+def changed_stations(entry, version):
+    """
+    Station keys touched by the ingest runs since an entry's version that
+    overlap its scope (an empty set if none did), or None when a run is
+    unknown or not limited to stations, or the version went back, so the
+    entry must be rebuilt whole.
+    """
+    if version < entry['version']:
+        return None
+    stations = set()
+    for changed_version in range(entry['version'] + 1, version + 1):
+        change = _known_runs.get(changed_version)
+        if change is None:
+            return None
+        if scopes_overlap(change, entry['scope']):
+            if change['stations'] is None:
+                return None
+            stations |= change['stations']
+    return frozenset(stations)
+
+def _freeze(value):
+    """Turns reader arguments into a hashable cache key component."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+def cached_query(ttl: int = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 stations: str = None, dates: tuple = None, years: str = None):
+    """
+    Decorator for db_utils readers taking `_session` as their first argument.
+
+    Results are cached in-process, keyed on the reader's other arguments
+    (normalised by name, defaults applied), with TTL and LRU eviction. Each
+    entry remembers the dataset version it was computed at and its scope
+    (see `build_scope`); after an ingest run only entries whose stations and
+    dates overlap the run are recomputed. Readers without a scope are
+    refreshed by any run. Calls with a None session bypass the cache, None
+    results and results flagged with `skip_cache` are not stored, and every
+    call returns a deep copy so callers cannot mutate cached results.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        store = _stores.setdefault(f"{func.__module__}.{func.__qualname__}", OrderedDict())
+
+        @functools.wraps(func)
+        def wrapper(_session, *args, **kwargs):
+            if _session is None:
+                return func(_session, *args, **kwargs)
+            bound = signature.bind(_session, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            params.pop('_session')
+            key = _freeze(params)
+            version = get_dataset_version(_session)
+            now = time.monotonic()
+
+            with _lock:
+                entry = store.get(key)
+                if entry is not None and entry['expires_at'] > now and is_entry_current(entry, version):
+                    entry['version'] = version
+                    store.move_to_end(key)
+                    return copy.deepcopy(entry['value'])
+
+            _call_state.skip = False
+            value = func(_session, **params)
+            if value is None or _call_state.skip:
+                return value
+            with _lock:
+                store[key] = {
+                    'value': value,
+                    'version': version,
+                    'scope': build_scope(params, stations, dates, years),
+                    'expires_at': now + ttl,
+                }
+                store.move_to_end(key)
+                while len(store) > max_entries:
+                    store.popitem(last=False)
+            return copy.deepcopy(value)
+
+        def clear():
+            with _lock:
+                store.clear()
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+def per_dataset_version(func):
+    """
+    Decorator for builders of in-process structures derived from the
+    database, called as `func(_session, version)`. The decorated function
+    takes only `_session` and returns the structure built for the current
+    dataset version, rebuilding it under a lock only when the version has
+    changed (in either direction). None results (a failed build) are not
+    kept, and a None session returns None. `.clear()` drops the structure.
+    """
+    lock = threading.Lock()
+    state = {'entry': None}  # (version, structure)
+
+    @functools.wraps(func)
+    def wrapper(_session):
+        if _session is None:
+            logger.error(f"Database session is None in {func.__name__}.")
+            return None
+        version = get_dataset_version(_session)
+        entry = state['entry']
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with lock:
+            entry = state['entry']
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            value = func(_session, version)
+            if value is not None:
+                state['entry'] = (version, value)
+            return value
+
+    def clear():
+        with lock:
+            state['entry'] = None
+
+    wrapper.clear = clear
+    return wrapper
+
+def clear_query_cache():
+    """Drops every cached query result and forces the version stamp to be re-read."""
+    with _lock:
+        for store in _stores.values():
+            store.clear()
+        _known_runs.clear()
+        _version_state.update(value=None, checked_at=0.0)
@@ -0,0 +1,195 @@
+# app/station_index.py
+import logging
+from types import MappingProxyType
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from app.db_utils import get_all_station_metadata
+from app.query_cache import per_dataset_version
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURABLE PARAMETERS ---
+INDEXED_COLUMNS = ('road_name', 'common_road_name', 'lga', 'suburb', 'road_functional_hierarchy')  # Inverted indexes
+FACET_COLUMNS = ('lga', 'suburb', 'road_functional_hierarchy', 'quality_rating',
+                 'vehicle_classifier', 'permanent_station', 'device_type')  # Station columns with a mask per value
+DEFAULT_CASCADE = ('lga', 'suburb', 'road_functional_hierarchy')  # Each selector's options follow the ones before it
+LABEL_SEPARATOR = ' - '  # Between station_id and road_name in selector labels
+# -----------------------------
+
+def _plain(value):
+    """NumPy scalars as Python values, so options compare and display like the database's."""
+    return value.item() if isinstance(value, np.generic) else value
+
+class StationIndex:
+    """
+    Read-only lookups over the stations table, built once per dataset version.
+
+    Holds the selector labels (in station_df order), a station_key -> row
+    mapping, station_id and label -> station_key mappings, for each of
+    INDEXED_COLUMNS an inverted index from value to station keys, and for
+    each of FACET_COLUMNS one read-only NumPy boolean mask per value, aligned
+    with `keys`. Every lookup is a dict access and every filter a few mask
+    ORs/ANDs; nothing queries the database after the build.
+
+    A selection is {column: [values]}: values of one column are OR-ed and
+    columns are AND-ed.
+    """
+
+    def __init__(self, station_df: pd.DataFrame, version: int = 0):
+        df = station_df.drop(columns=['location_geom'], errors='ignore').reset_index(drop=True)
+        # Missing values become None so callers can test them like ORM attributes
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        keys = df['station_key'].astype(int).tolist()
+
+        self.version = version
+        self.keys = tuple(keys)
+        self.labels = tuple(df['station_id'].astype(str) + LABEL_SEPARATOR + df['road_name'].fillna('').astype(str))
+        self._rows = MappingProxyType(dict(zip(keys, records)))
+        self._key_by_id = MappingProxyType(dict(zip(df['station_id'].astype(str), keys)))
+        self._key_by_label = MappingProxyType(dict(zip(self.labels, keys)))
+        inverted = {}
+        for column in INDEXED_COLUMNS:
+            if column in df.columns:
+                groups = df.groupby(column, sort=True)['station_key'].agg(lambda s: tuple(int(k) for k in s))
+                inverted[column] = MappingProxyType(groups.to_dict())
+        self._inverted = MappingProxyType(inverted)
+
+        self._key_array = np.asarray(keys, dtype=np.int64)
+        self._key_array.setflags(write=False)
+        masks = {}
+        for column in FACET_COLUMNS:
+            if column not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[column], sort=True)  # Missing values get code -1 and no mask
+            column_masks = {}
+            for code, value in enumerate(uniques):
+                mask = codes == code
+                mask.setflags(write=False)
+                column_masks[_plain(value)] = mask
+            masks[column] = MappingProxyType(column_masks)
+        self._masks = MappingProxyType(masks)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, station_key):
+        return station_key in self._rows
+
+    def get(self, station_key) -> Optional[dict]:
+        """The station's column values as a new dict (geometry excluded), or None if unknown."""
+        row = self._rows.get(station_key)
+        return dict(row) if row is not None else None
+
+    def key_for_id(self, station_id) -> Optional[int]:
+        return self._key_by_id.get(str(station_id))
+
+    def key_for_label(self, label) -> Optional[int]:
+        return self._key_by_label.get(label)
+
+    def label_for(self, station_key) -> Optional[str]:
+        row = self._rows.get(station_key)
+        if row is None:
+            return None
+        return f"{row['station_id']}{LABEL_SEPARATOR}{row['road_name'] or ''}"
+
+    def keys_for(self, column, value) -> tuple:
+        """Station keys whose `column` equals `value` (column must be in INDEXED_COLUMNS)."""
+        return self._inverted[column].get(value, ())
+
+    def values(self, column) -> tuple:
+        """Distinct non-null values of an indexed column, sorted; for filter lists."""
+        return tuple(self._inverted[column].keys())
+
+    @property
+    def facets(self) -> tuple:
+        """FACET_COLUMNS present in the station data."""
+        return tuple(self._masks)
+
+    def _column_mask(self, column, values) -> np.ndarray:
+        """Stations whose `column` is any of `values`; unknown values match nothing."""
+        masks = self._masks.get(column)
+        if masks is None:  # An indexed column without facet masks
+            return np.isin(self._key_array, [key for value in values for key in self.keys_for(column, value)])
+        result = np.zeros(len(self.keys), dtype=bool)
+        for value in values:
+            mask = masks.get(value)
+            if mask is not None:
+                result |= mask
+        return result
+
+    def mask(self, selections: Dict[str, Sequence] = None, exclude: str = None) -> np.ndarray:
+        """Boolean mask of stations matching `selections`, ignoring the `exclude` column and empty selections."""
+        result = np.ones(len(self.keys), dtype=bool)
+        for column, values in (selections or {}).items():
+            if values and column != exclude:
+                result &= self._column_mask(column, values)
+        return result
+
+    def filter_keys(self, **criteria) -> tuple:
+        """
+        Station keys, in station order, matching every given column (in
+        FACET_COLUMNS or INDEXED_COLUMNS) on any of its listed values, e.g.
+        filter_keys(lga=['Hornsby'], suburb=[]). Empty or None criteria are
+        ignored; with none at all, every key matches.
+        """
+        return tuple(self._key_array[self.mask(criteria)].tolist())
+
+    def option_counts(self, column, selections: Dict[str, Sequence] = None) -> Dict:
+        """
+        {value: station count} for a facet column among the stations matching
+        the other columns' selections, values with no stations left out. The
+        column's own selection is ignored, so picking one value does not
+        hide its alternatives.
+        """
+        base = self.mask(selections, exclude=column)
+        counts = {}
+        for value, mask in self._masks[column].items():
+            count = int(np.count_nonzero(mask & base))
+            if count:
+                counts[value] = count
+        return counts
+
+    def options(self, column, selections: Dict[str, Sequence] = None) -> tuple:
+        """Sorted values of a facet column available under the other columns' selections."""
+        return tuple(self.option_counts(column, selections))
+
+    def cascade(self, selections: Dict[str, Sequence], order: Sequence[str] = DEFAULT_CASCADE):
+        """
+        Resolves dependent selectors in `order`: each column's options are
+        limited by the selections of the columns before it, and selected
+        values that are no longer options are dropped.
+
+        Returns:
+            (options, selections): {column: tuple of options} and the
+            cleaned {column: list of values}.
+        """
+        options = {}
+        cleaned = {}
+        for column in order:
+            options[column] = self.options(column, cleaned)
+            available = set(options[column])
+            cleaned[column] = [value for value in selections.get(column) or () if value in available]
+        return options, cleaned
+
+    def values_for(self, column, station_keys) -> tuple:
+        """Distinct non-null values of `column` among `station_keys`, sorted; for dependent filter lists."""
+        return tuple(sorted({self._rows[key][column] for key in station_keys
+                             if key in self._rows and self._rows[key][column] is not None}))
+
+@per_dataset_version
+def get_station_index(_session, version: int = 0) -> Optional[StationIndex]:
+    """
+    Returns the station index for the current dataset version, rebuilding it
+    from get_all_station_metadata only when the version has moved on.
+    Returns None if the station metadata cannot be loaded.
+    """
+    station_df = get_all_station_metadata(_session)
+    if station_df is None:
+        return None
+    index = StationIndex(station_df, version)
+    logger.info(f"Built station index for {len(index)} stations at dataset version {version}")
+    return index
+
+def clear_station_index():
+    get_station_index.clear()
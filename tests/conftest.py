@@ -25,6 +25,9 @@ warnings.filterwarnings(
 # Add the project root to the PYTHONPATH AFTER initial imports and filters
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))
+# The dbtools scripts import their siblings and app modules by bare name (run from app/dbtools)
+sys.path.append(str(PROJECT_ROOT / "app"))
+sys.path.append(str(PROJECT_ROOT / "app" / "dbtools"))
 
 # Now it's safe to import other modules if needed
 
@@ -43,6 +46,17 @@ def suppress_geoalchemy2_warnings() -> None:
         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_query_cache():
+    """
+    Cached db_utils readers ignore the mocked _session, so results would leak
+    between tests that reuse the same arguments. Start every test with an empty cache.
+    """
+    from app.query_cache import clear_query_cache as _clear
+    _clear()
+    yield
+
+
 def pytest_configure(config):
     """Configure pytest with custom settings including warning filters."""
     # The filter is already applied at the top level, this is redundant but harmless
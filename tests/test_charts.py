@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import patch
+import pandas as pd
+from app import charts
+
+
+@pytest.fixture(autouse=True)
+def empty_chart_cache():
+    charts.clear_chart_cache()
+    yield
+    charts.clear_chart_cache()
+
+
+def make_frame(scale=1):
+    return pd.DataFrame({'Hour': range(24), 'Average Volume': [scale * hour for hour in range(24)]})
+
+
+class TestChartCache:
+    """Tests for caching rendered Bokeh items by data hash and options"""
+
+    @patch('app.charts._build_item', return_value={'doc': {}, 'root_id': '1'})
+    def test_identical_chart_is_rendered_once(self, mock_build):
+        first = charts.render_chart_item(make_frame(), 'line', x='Hour', y='Average Volume')
+        second = charts.render_chart_item(make_frame(), 'line', y='Average Volume', x='Hour')
+
+        assert first is second
+        mock_build.assert_called_once()
+
+    @patch('app.charts._build_item', return_value={'doc': {}, 'root_id': '1'})
+    def test_changed_data_or_options_render_again(self, mock_build):
+        charts.render_chart_item(make_frame(), 'line', x='Hour', y='Average Volume')
+        charts.render_chart_item(make_frame(scale=2), 'line', x='Hour', y='Average Volume')
+        charts.render_chart_item(make_frame(), 'line', x='Hour', y='Average Volume', line_width=3)
+        charts.render_chart_item(make_frame(), 'scatter', x='Hour', y='Average Volume')
+
+        assert mock_build.call_count == 4
+
+    @patch('app.charts.CHART_CACHE_ENTRIES', 2)
+    @patch('app.charts._build_item', return_value={'doc': {}, 'root_id': '1'})
+    def test_least_recently_used_chart_is_evicted(self, mock_build):
+        for scale in (1, 2, 3):
+            charts.render_chart_item(make_frame(scale), 'line', x='Hour')
+        charts.render_chart_item(make_frame(1), 'line', x='Hour')
+
+        assert mock_build.call_count == 4
+
+
+class TestChartsHtml:
+    """Tests for embedding json_items in one document"""
+
+    @patch('app.charts.bokeh_bundle_html', return_value='<script src="bokeh.min.js"></script>')
+    def test_one_bundle_for_all_charts(self, mock_bundle):
+        items = [{'doc': {'title': 'a'}, 'root_id': '1'}, {'doc': {'title': '</script>'}, 'root_id': '2'}]
+
+        html = charts.charts_html(items)
+
+        assert html.count('bokeh.min.js') == 1
+        assert html.count('Bokeh.embed.embed_item(') == 2
+        assert '<div id="chart-1"></div>' in html
+        assert html.count('</script>') == 2
+
+    @patch('app.charts.components')
+    @patch('app.charts.bokeh_bundle_html', return_value='')
+    @patch('app.charts._build_item', side_effect=RuntimeError('bad option'))
+    def test_show_chart_reports_failure(self, mock_build, mock_bundle, mock_components):
+        assert charts.show_chart(make_frame(), 'line', x='Hour') is False
+        mock_components.html.assert_not_called()
+
+    @patch('app.charts.components')
+    @patch('app.charts.bokeh_bundle_html', return_value='')
+    @patch('app.charts._build_item', return_value={'doc': {}, 'root_id': '1'})
+    def test_show_charts_sizes_frame_per_chart(self, mock_build, mock_bundle, mock_components):
+        frames = [(make_frame(), 'line', {'x': 'Hour'}), (make_frame(2), 'line', {'x': 'Hour'})]
+
+        assert charts.show_charts(frames, frame_height=300) is True
+        assert mock_components.html.call_args.kwargs['height'] == 600
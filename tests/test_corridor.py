@@ -0,0 +1,101 @@
+import datetime
+import numpy as np
+import pandas as pd
+from unittest.mock import patch, MagicMock
+from app import corridor, db_utils
+from app.station_index import StationIndex
+
+
+def stations(points):
+    """Station frame with one row per (station_key, lat, lon)."""
+    return pd.DataFrame([{'station_key': key, 'station_id': f'S{key}', 'road_name': 'Pacific Hwy',
+                          'common_road_name': None, 'lga': 'Hornsby' if key < 3 else 'Ku-ring-gai',
+                          'wgs84_latitude': lat, 'wgs84_longitude': lon} for key, lat, lon in points])
+
+
+class TestCorridorOrdering:
+    """Tests for ordering stations along a corridor's line fit"""
+
+    def test_north_south_road_ordered_south_to_north(self):
+        df = stations([(1, -33.70, 151.10), (2, -33.80, 151.11), (3, -33.75, 151.105), (4, -33.90, 151.12)])
+
+        ordered = corridor.order_along_corridor(df)
+
+        assert ordered['station_key'].tolist() == [4, 2, 3, 1]
+        assert ordered['chainage_km'].iloc[0] == 0
+        # 0.2 degrees of latitude plus a little longitude is roughly 22.4 km
+        assert 22 < ordered['chainage_km'].iloc[-1] < 23
+
+    def test_east_west_road_ordered_west_to_east(self):
+        df = stations([(1, -33.80, 151.20), (2, -33.801, 151.00), (3, -33.799, 151.10)])
+
+        ordered = corridor.order_along_corridor(df)
+
+        assert ordered['station_key'].tolist() == [2, 3, 1]
+
+    def test_stations_without_coordinates_go_last(self):
+        df = stations([(1, np.nan, np.nan), (2, -33.80, 151.10), (3, -33.70, 151.10)])
+
+        ordered = corridor.order_along_corridor(df)
+
+        assert ordered['station_key'].tolist() == [2, 3, 1]
+        assert np.isnan(ordered['chainage_km'].iloc[-1])
+
+    def test_corridor_keys_match_either_road_column(self):
+        df = stations([(1, -33.70, 151.10), (2, -33.80, 151.11), (3, -33.75, 151.105)])
+        df.loc[df['station_key'] == 2, 'road_name'] = 'Other Rd'
+        df.loc[df['station_key'] == 2, 'common_road_name'] = 'Pacific Hwy'
+        index = StationIndex(df)
+
+        assert corridor.corridor_station_keys(index, 'Pacific Hwy') == (1, 2, 3)
+        assert corridor.corridor_station_keys(index, 'Pacific Hwy', lga='Hornsby') == (1, 2)
+
+    def test_profiles_long_keeps_corridor_order(self):
+        profiles = pd.DataFrame({'station_key': [3, 1], **{col: [float(h), 0.0]
+                                                           for h, col in enumerate(corridor.HOUR_COLUMNS)}})
+
+        long = corridor.profiles_long(profiles, {1: 'S1', 3: 'S3'})
+
+        assert len(long) == 48
+        assert long['Station ID'].iloc[0] == 'S3'
+        assert long['Hour'].iloc[:24].tolist() == list(range(24))
+        assert long['Average Volume'].iloc[23] == 23.0
+
+
+class TestCorridorProfiles:
+    """Tests for the batched corridor profile reader"""
+
+    @patch('app.db_utils.get_local_source', return_value=None)
+    @patch('app.db_utils.pd.read_sql')
+    def test_all_stations_in_one_grouped_statement(self, mock_read_sql, mock_source):
+        mock_read_sql.return_value = pd.DataFrame({'station_key': [1, 2], 'daily_total': [900.0, 1200.0],
+                                                   'days': [20, 21]})
+
+        df = db_utils.get_corridor_profiles(MagicMock(), list(range(1, 61)), '2023-02-01', '2023-02-28',
+                                            day_type='Weekday')
+
+        assert df['daily_total'].tolist() == [900.0, 1200.0]
+        mock_read_sql.assert_called_once()
+        sql = str(mock_read_sql.call_args.args[0])
+        assert 'GROUP BY hourly_counts.station_key, hourly_counts.count_date' in sql
+        assert 'avg(' in sql and 'count(*)' in sql
+        assert 'day_of_week' in sql
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_local_source_averaged_per_station(self, mock_get_source, mock_read_sql):
+        rows = pd.DataFrame([{'station_key': key, 'count_date': datetime.date(2023, 3, day), 'classification_seq': 1,
+                              'day_of_week': 1, 'is_public_holiday': False, 'daily_total': 24.0 * volume,
+                              **{col: volume for col in corridor.HOUR_COLUMNS}}
+                             for key, day, volume in [(1, 6, 10.0), (1, 6, 10.0), (1, 13, 30.0), (2, 6, 5.0)]])
+        source = MagicMock()
+        source.read_hourly.return_value = rows
+        source.read_station_days.return_value = None  # Parquet: rows only, grouped by db_utils
+        mock_get_source.return_value = source
+
+        df = db_utils.get_corridor_profiles(MagicMock(), [1, 2], '2023-03-01', '2023-03-31')
+
+        # Station 1: both directions of 6 March add to 20, averaged with 30 on 13 March
+        assert df.set_index('station_key')['hour_08'].to_dict() == {1: 25.0, 2: 5.0}
+        assert df['days'].tolist() == [2, 1]
+        mock_read_sql.assert_not_called()
@@ -0,0 +1,257 @@
+import json
+import os
+import datetime
+import pytest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app import data_sources, db_utils
+
+
+def write_station_year(root, station_key, year, days=10, directions=(1, 2)):
+    """Writes a partition file the way dbtools/db_parquet_export.py does."""
+    rows = []
+    for day in range(days):
+        for direction in directions:
+            row = {col: 0 for col in data_sources.HOURLY_COLUMN_NAMES}
+            row.update(count_id=len(rows) + 1, station_key=station_key, year=year,
+                       traffic_direction_seq=direction, cardinal_direction_seq=direction,
+                       classification_seq=1, count_date=datetime.date(year, 1, 1) + datetime.timedelta(days=day),
+                       month=1, day_of_week=1, is_public_holiday=False, is_school_holiday=False,
+                       daily_total=100 * direction + day, hours_counted=24)
+            rows.append(row)
+    df = pd.DataFrame(rows)
+    file_columns = [col for col in data_sources.HOURLY_COLUMN_NAMES if col not in data_sources.PARTITION_COLUMNS]
+    table = pa.Table.from_pandas(df[file_columns], schema=data_sources.hourly_file_schema(), preserve_index=False)
+    directory = os.path.join(root, f"year={year}", f"station_key={station_key}")
+    os.makedirs(directory)
+    pq.write_table(table, os.path.join(directory, data_sources.PARQUET_FILE_NAME))
+
+
+def write_manifest(root, version, complete=True):
+    with open(os.path.join(root, data_sources.MANIFEST_FILE_NAME), 'w') as outfile:
+        json.dump({'dataset_version': version, 'complete': complete}, outfile)
+
+
+@pytest.fixture
+def parquet_root(tmp_path):
+    write_station_year(str(tmp_path), 1, 2023)
+    write_station_year(str(tmp_path), 2, 2023)
+    write_station_year(str(tmp_path), 1, 2024)
+    write_manifest(str(tmp_path), 5)
+    return str(tmp_path)
+
+
+class TestParquetHourlySource:
+    """Tests for reading hourly_counts from the local Parquet export"""
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_filters_stations_dates_and_directions(self, mock_version, parquet_root):
+        source = data_sources.ParquetHourlySource(parquet_root)
+
+        df = source.read_hourly(MagicMock(), [1], '2023-01-03', '2023-01-05', directions=[2],
+                                columns=['station_key', 'count_date', 'daily_total'])
+
+        assert list(df.columns) == ['station_key', 'count_date', 'daily_total']
+        assert len(df) == 3
+        assert set(df['station_key']) == {1}
+        assert df['daily_total'].tolist() == [202, 203, 204]
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_reads_across_years_with_all_columns(self, mock_version, parquet_root):
+        source = data_sources.ParquetHourlySource(parquet_root)
+
+        df = source.read_hourly(MagicMock(), [1, 2], '2023-01-01', '2024-12-31')
+
+        assert list(df.columns) == data_sources.HOURLY_COLUMN_NAMES
+        assert len(df) == 60
+        assert sorted(df['year'].unique()) == [2023, 2024]
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_missing_partition_is_empty_not_none(self, mock_version, parquet_root):
+        source = data_sources.ParquetHourlySource(parquet_root)
+
+        df = source.read_hourly(MagicMock(), [99], '2023-01-01', '2023-12-31', columns=['daily_total'])
+
+        assert df is not None and df.empty
+
+    @patch('app.data_sources.get_dataset_version', return_value=6)
+    def test_stale_export_defers_to_database(self, mock_version, parquet_root):
+        source = data_sources.ParquetHourlySource(parquet_root)
+
+        assert source.read_hourly(MagicMock(), [1], '2023-01-01', '2023-12-31') is None
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_incomplete_export_is_ignored(self, mock_version, parquet_root):
+        write_manifest(parquet_root, 5, complete=False)
+        source = data_sources.ParquetHourlySource(parquet_root)
+
+        assert source.read_hourly(MagicMock(), [1], '2023-01-01', '2023-12-31') is None
+
+
+class TestLocalSourceSelection:
+    """Tests for choosing the local data backend and db_utils fallbacks"""
+
+    @pytest.fixture(autouse=True)
+    def reset_source(self):
+        data_sources._source_state.update(settings=None, source=None)
+        yield
+        data_sources._source_state.update(settings=None, source=None)
+
+    def test_defaults_to_postgres(self, monkeypatch):
+        monkeypatch.delenv('TRAFFIC_DATA_SOURCE', raising=False)
+        assert data_sources.get_local_source() is None
+
+    def test_parquet_from_environment(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('TRAFFIC_DATA_SOURCE', 'parquet')
+        monkeypatch.setenv('TRAFFIC_PARQUET_DIR', str(tmp_path))
+
+        source = data_sources.get_local_source()
+
+        assert isinstance(source, data_sources.ParquetHourlySource)
+        assert source.root == str(tmp_path)
+        assert data_sources.get_local_source() is source
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_db_utils_prefers_local_source(self, mock_get_source, mock_read_sql):
+        source = MagicMock()
+        source.read_hourly.return_value = pd.DataFrame({'station_key': [1], 'daily_total': [10]})
+        mock_get_source.return_value = source
+
+        df = db_utils.get_hourly_data_for_stations(MagicMock(), [1], '2023-01-01', '2023-01-31',
+                                                   required_cols=['station_key', 'daily_total'])
+
+        assert df['daily_total'].tolist() == [10]
+        assert df['station_key'].dtype == 'int32'
+        mock_read_sql.assert_not_called()
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_db_utils_falls_back_when_source_declines(self, mock_get_source, mock_read_sql):
+        source = MagicMock()
+        source.read_hourly.return_value = None
+        mock_get_source.return_value = source
+        mock_read_sql.return_value = pd.DataFrame({'daily_total': [7]})
+
+        df = db_utils.get_hourly_data_for_stations(MagicMock(), [1], '2023-01-01', '2023-01-31',
+                                                   required_cols=['daily_total'])
+
+        assert df['daily_total'].tolist() == [7]
+        mock_read_sql.assert_called_once()
+
+    @patch('app.data_sources.duckdb', None)
+    def test_duckdb_without_package_uses_postgres(self, monkeypatch):
+        monkeypatch.setenv('TRAFFIC_DATA_SOURCE', 'duckdb')
+        assert data_sources.get_local_source() is None
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_hourly_profile_uses_local_rows(self, mock_get_source, mock_read_sql):
+        rows = {'period': ['Weekday', 'Weekend']}
+        rows.update({col: [2.0, 1.0] for col in db_utils.HOUR_COLUMNS})
+        source = MagicMock()
+        source.read_hourly_profile_rows.return_value = pd.DataFrame(rows)
+        mock_get_source.return_value = source
+
+        profile = db_utils.get_hourly_profile(MagicMock(), [1], '2023-01-01', '2023-12-31')
+
+        assert profile.shape == (24, 2)
+        assert profile['Weekday'].eq(2.0).all()
+        mock_read_sql.assert_not_called()
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_station_days_aggregated_by_source(self, mock_get_source, mock_read_sql):
+        station_days = pd.DataFrame({'station_key': [1], 'count_date': [datetime.date(2023, 1, 2)]})
+        station_days = station_days.assign(**{col: [2] for col in db_utils.HOUR_COLUMNS})
+        source = MagicMock()
+        source.read_station_days.return_value = station_days
+        mock_get_source.return_value = source
+
+        df = db_utils.get_station_day_hours(MagicMock(), [1], '2023-01-01', '2023-12-31', directions=[3])
+
+        assert df['hour_07'].tolist() == [2]
+        assert source.read_station_days.call_args.args[4:] == ([3], 1, 'Weekday', True, db_utils.HOUR_COLUMNS, False)
+        source.read_hourly.assert_not_called()
+        mock_read_sql.assert_not_called()
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_station_metadata_falls_back_when_source_fails(self, mock_get_source, mock_read_sql):
+        source = MagicMock()
+        source.read_station_metadata.side_effect = RuntimeError('corrupt file')
+        mock_get_source.return_value = source
+        mock_read_sql.return_value = pd.DataFrame({'station_key': [1]})
+
+        df = db_utils.get_all_station_metadata(MagicMock())
+
+        assert df['station_key'].tolist() == [1]
+
+
+class TestDuckDBSource:
+    """DuckDB backend over the Parquet export; skipped when duckdb is not installed"""
+
+    @pytest.fixture(autouse=True)
+    def require_duckdb(self):
+        pytest.importorskip('duckdb')
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_matches_parquet_source(self, mock_version, parquet_root):
+        parquet = data_sources.ParquetHourlySource(parquet_root)
+        duck = data_sources.DuckDBSource(parquet_root, os.path.join(parquet_root, 'missing.duckdb'))
+
+        expected = parquet.read_hourly(MagicMock(), [1, 2], '2023-01-02', '2024-01-03', directions=[2])
+        result = duck.read_hourly(MagicMock(), [1, 2], '2023-01-02', '2024-01-03', directions=[2])
+
+        sort_cols = ['station_key', 'count_date']
+        pd.testing.assert_frame_equal(
+            result.sort_values(sort_cols).reset_index(drop=True).astype(str),
+            expected.sort_values(sort_cols).reset_index(drop=True).astype(str),
+        )
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_hourly_profile_rows(self, mock_version, parquet_root):
+        duck = data_sources.DuckDBSource(parquet_root, os.path.join(parquet_root, 'missing.duckdb'))
+
+        rows = duck.read_hourly_profile_rows(MagicMock(), [1, 2], '2023-01-01', '2023-12-31', by_station=True)
+
+        assert sorted(rows['station_key']) == [1, 2]
+        assert list(rows.columns[:2]) == ['station_key', 'period']
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_station_days_match_parquet_grouping(self, mock_version, parquet_root):
+        duck = data_sources.DuckDBSource(parquet_root, os.path.join(parquet_root, 'missing.duckdb'))
+        columns = db_utils.HOUR_COLUMNS + ['daily_total']
+
+        with patch('app.db_utils.get_local_source', return_value=data_sources.ParquetHourlySource(parquet_root)):
+            expected = db_utils._local_station_days(MagicMock(), [1, 2], '2023-01-01', '2023-01-05', [3], 1,
+                                                    'Weekday', value_columns=columns)
+        result = duck.read_station_days(MagicMock(), [1, 2], '2023-01-01', '2023-01-05', [3], 1, 'Weekday',
+                                        value_columns=columns)
+
+        sort_cols = ['station_key', 'count_date']
+        assert len(result) == 10
+        assert result['daily_total'].dtype == 'int64'
+        pd.testing.assert_frame_equal(
+            result.sort_values(sort_cols).reset_index(drop=True).astype(str),
+            expected.sort_values(sort_cols).reset_index(drop=True).astype(str),
+        )
+
+    @patch('app.data_sources.get_dataset_version', return_value=5)
+    def test_heavy_vehicle_pivot_matches_class_pivot(self, mock_version, parquet_root):
+        from app.hv_metrics import class_pivot, pivot_columns
+        duck = data_sources.DuckDBSource(parquet_root, os.path.join(parquet_root, 'missing.duckdb'))
+
+        with patch('app.db_utils.get_local_source', return_value=data_sources.ParquetHourlySource(parquet_root)):
+            station_days = db_utils._local_station_days(MagicMock(), [1, 2], '2023-01-01', '2023-12-31', None, None,
+                                                        'Weekday', value_columns=data_sources.HV_VALUE_COLUMNS,
+                                                        by_class=True)
+        expected = class_pivot(station_days)
+        result = duck.read_heavy_vehicle_pivot(MagicMock(), [1, 2], '2023-01-01', '2023-12-31')
+
+        assert result.columns.tolist() == pivot_columns()
+        assert result['all_days'].tolist() == [10, 10]
+        assert result['hv_days'].tolist() == [0, 0]
+        assert result['all_daily_total'].tolist() == expected['all_daily_total'].tolist()
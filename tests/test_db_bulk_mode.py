@@ -0,0 +1,154 @@
+import json
+import re
+import threading
+import pytest
+import db_bulk_mode
+
+
+INDEXES = [
+    {'name': 'ix_hourly_counts_count_date',
+     'definition': 'CREATE INDEX ix_hourly_counts_count_date ON ONLY public.hourly_counts USING btree (count_date)'},
+    {'name': 'ix_hourly_counts_station_key',
+     'definition': 'CREATE INDEX ix_hourly_counts_station_key ON public.hourly_counts USING btree (station_key)'},
+]
+
+
+class FakeConnection:
+    """
+    A pooled PostgreSQL connection: plain SET changes its session settings,
+    SET LOCAL lasts until the transaction commits or rolls back.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.settings = {'statement_timeout': '30s'}
+        self.local = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.local = {}  # Closing rolls back an open transaction
+        self.engine.release(self)
+
+    def execute(self, statement, parameters=None):
+        sql = str(statement).strip()
+        self.engine.statements.append(sql)
+        if sql.startswith('SELECT'):
+            return FakeResult([(index['name'], index['definition']) for index in INDEXES])
+        setting = re.match(r"SET (LOCAL )?(\w+) = '?([^']*)'?$", sql)
+        if setting:
+            (self.local if setting.group(1) else self.settings)[setting.group(2)] = setting.group(3)
+        elif sql.startswith('CREATE') and any(name in sql for name in self.engine.failing):
+            raise RuntimeError('could not create index')
+
+    def commit(self):
+        self.local = {}
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeEngine:
+    """Hands out pooled FakeConnections, reusing released ones like a QueuePool."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.statements = []
+        self.pool = []
+        self.created = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        with self._lock:
+            if self.pool:
+                return self.pool.pop()
+            connection = FakeConnection(self)
+            self.created.append(connection)
+            return connection
+
+    begin = connect
+
+    def release(self, connection):
+        with self._lock:
+            self.pool.append(connection)
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_bulk_mode, 'SNAPSHOT_DIR', str(tmp_path))
+    return tmp_path
+
+
+def built(engine):
+    return sorted(sql for sql in engine.statements if sql.startswith('CREATE'))
+
+
+class TestBulkLoadMode:
+    """Tests for the drop / snapshot / rebuild round trip around a bulk load"""
+
+    def test_failed_load_still_rebuilds_every_index(self):
+        engine = FakeEngine()
+
+        with pytest.raises(ValueError):
+            with db_bulk_mode.bulk_load_mode(engine, workers=2) as indexes:
+                with open(db_bulk_mode.snapshot_path()) as infile:
+                    assert json.load(infile)['indexes'] == INDEXES
+                assert [sql for sql in engine.statements if sql.startswith('DROP')] == [
+                    'DROP INDEX IF EXISTS ix_hourly_counts_count_date',
+                    'DROP INDEX IF EXISTS ix_hourly_counts_station_key']
+                raise ValueError('load failed')
+
+        assert indexes == INDEXES
+        assert built(engine) == [
+            'CREATE INDEX IF NOT EXISTS ix_hourly_counts_count_date ON public.hourly_counts USING btree (count_date)',
+            'CREATE INDEX IF NOT EXISTS ix_hourly_counts_station_key ON public.hourly_counts USING btree (station_key)']
+        assert engine.statements[-1] == 'ANALYZE hourly_counts'
+        assert db_bulk_mode.load_snapshot() is None
+
+    def test_statement_timeout_restored_on_pooled_connections(self):
+        engine = FakeEngine()
+
+        with pytest.raises(ValueError):
+            with db_bulk_mode.bulk_load_mode(engine, workers=2):
+                raise ValueError('load failed')
+
+        assert 'SET LOCAL statement_timeout = 0' in engine.statements
+        assert all(connection.settings == {'statement_timeout': '30s'} for connection in engine.created)
+
+    def test_failed_rebuild_keeps_snapshot_and_timeout(self):
+        engine = FakeEngine(failing={'ix_hourly_counts_count_date'})
+
+        with pytest.raises(RuntimeError, match='ix_hourly_counts_count_date'):
+            with db_bulk_mode.bulk_load_mode(engine, workers=2):
+                pass
+
+        assert any('ix_hourly_counts_station_key' in sql for sql in built(engine))
+        assert db_bulk_mode.load_snapshot() == INDEXES  # Retried by the next bulk run or `restore`
+        assert all(connection.settings == {'statement_timeout': '30s'} for connection in engine.created)
+
+    def test_load_error_not_masked_by_failed_rebuild(self):
+        engine = FakeEngine(failing={'ix_hourly_counts_count_date'})
+
+        with pytest.raises(ValueError, match='load failed'):
+            with db_bulk_mode.bulk_load_mode(engine, workers=2):
+                raise ValueError('load failed')
+
+        assert any('ix_hourly_counts_station_key' in sql for sql in built(engine))
+        assert db_bulk_mode.load_snapshot() == INDEXES
+
+    def test_interrupted_load_reuses_snapshot(self):
+        db_bulk_mode.save_snapshot(db_bulk_mode.BULK_TABLE, INDEXES[:1])
+        engine = FakeEngine()
+
+        with db_bulk_mode.bulk_load_mode(engine) as indexes:
+            pass
+
+        assert indexes == INDEXES[:1]
+        assert not any(sql.startswith('SELECT') for sql in engine.statements)  # pg_indexes not re-read
+        assert len(built(engine)) == 1
@@ -0,0 +1,118 @@
+import datetime
+from unittest.mock import patch, MagicMock
+import numpy as np
+import pandas as pd
+import db_data_ingestion
+
+
+class TestIngestionSession:
+    """Tests for the session the hourly ingestion runs on"""
+
+    @patch('db_data_ingestion.load_station_reference_data', return_value=False)
+    @patch('db_data_ingestion.get_maintenance_session')
+    def test_ingestion_uses_session_without_app_timeout(self, mock_session, mock_load_stations):
+        with patch('db_utils.init_db_resources') as mock_init_db_resources:
+            assert db_data_ingestion.ingest_hourly_data('unused.csv') is False
+
+        mock_session.assert_called_once_with()
+        mock_load_stations.assert_called_once_with(mock_session.return_value)
+        mock_init_db_resources.assert_not_called()
+
+    @patch('db_data_ingestion.get_maintenance_session', return_value=None)
+    def test_missing_session_aborts(self, mock_session):
+        assert db_data_ingestion.ingest_hourly_data('unused.csv') is False
+
+
+def raw_chunk(**overrides):
+    """A raw CSV chunk as iter_hourly_chunks yields it: three rows, all hours 10."""
+    data = {
+        'station_key': [1, 2, 3],
+        'traffic_direction_seq': [1, 2, 1],
+        'cardinal_direction_seq': [1, 5, 3],
+        'classification_seq': [1, 1, 3],
+        'date': ['2023-05-01', '2023-05-06T00:00:00', '2023-05-07'],
+        'is_public_holiday': ['false', 'TRUE', '0'],
+        'is_school_holiday': [0, 1, 0],
+    }
+    data.update({col: [10, 10, 10] for col in db_data_ingestion.HOUR_COLUMNS})
+    data.update(overrides)
+    return pd.DataFrame(data)
+
+
+class TestHourMatrix:
+    """Tests for the vectorised hour matrix"""
+
+    def test_nan_and_invalid_hours_count_as_zero_and_uncounted(self):
+        chunk = raw_chunk(hour_00=[np.nan, 'x', 5], hour_23=[7, None, 8])
+
+        hours, hours_counted = db_data_ingestion.hour_matrix(chunk)
+
+        assert hours.dtype == np.int64 and hours.shape == (3, 24)
+        assert hours[:, 0].tolist() == [0, 0, 5]
+        assert hours[:, 23].tolist() == [7, 0, 8]
+        assert hours_counted.tolist() == [23, 22, 24]
+
+    def test_missing_hour_columns(self):
+        hours, hours_counted = db_data_ingestion.hour_matrix(raw_chunk().drop(columns=['hour_12', 'hour_13']))
+
+        assert hours[:, 12].tolist() == [0, 0, 0]
+        assert hours_counted.tolist() == [22, 22, 22]
+
+
+class TestTransformHourlyChunk:
+    """Tests for turning a raw CSV chunk into hourly_counts rows"""
+
+    def test_derived_columns(self):
+        prepared, skipped_keys, skipped_dates = db_data_ingestion.transform_hourly_chunk(raw_chunk(), [1, 2, 3])
+
+        assert (skipped_keys, skipped_dates) == (0, 0)
+        assert prepared['count_date'].tolist() == [datetime.date(2023, 5, 1), datetime.date(2023, 5, 6),
+                                                   datetime.date(2023, 5, 7)]
+        assert prepared['day_of_week'].tolist() == [1, 6, 7]  # ISO: Monday, Saturday, Sunday
+        assert prepared['year'].tolist() == [2023] * 3 and prepared['month'].tolist() == [5] * 3
+        assert prepared['is_public_holiday'].tolist() == [False, True, False]
+        assert prepared['is_school_holiday'].tolist() == [False, True, False]
+        assert prepared['daily_total'].tolist() == [240] * 3
+        assert prepared['hours_counted'].tolist() == [24] * 3
+
+    def test_hours_counted_and_total_with_missing_hours(self):
+        prepared, _, _ = db_data_ingestion.transform_hourly_chunk(raw_chunk(hour_05=[np.nan, 4, None]), [1, 2, 3])
+
+        assert prepared['hours_counted'].tolist() == [23, 24, 23]
+        assert prepared['daily_total'].tolist() == [230, 234, 230]
+
+    def test_unknown_station_keys_and_bad_dates_skipped(self):
+        chunk = raw_chunk(station_key=[1, 99, 3], date=['2023-05-01', '2023-05-02', 'not a date'])
+
+        prepared, skipped_keys, skipped_dates = db_data_ingestion.transform_hourly_chunk(chunk, np.array([1, 3]))
+
+        assert prepared['station_key'].tolist() == [1]
+        assert (skipped_keys, skipped_dates) == (1, 1)
+
+    def test_bad_date_on_unknown_station_counted_once(self):
+        chunk = raw_chunk(station_key=[99, 2, 3], date=['bad', '2023-05-02', '2023-05-03'])
+
+        _, skipped_keys, skipped_dates = db_data_ingestion.transform_hourly_chunk(chunk, [2, 3])
+
+        assert (skipped_keys, skipped_dates) == (1, 0)
+
+
+class TestHighWaterMark:
+    """Tests for the incremental load's high-water filter"""
+
+    def test_rows_before_mark_dropped_and_mark_day_kept(self):
+        prepared, _, _ = db_data_ingestion.transform_hourly_chunk(raw_chunk(), [1, 2, 3])
+        marks = {1: datetime.date(2023, 5, 2), 2: datetime.date(2023, 5, 6)}
+
+        filtered, dropped = db_data_ingestion.filter_by_high_water_mark(prepared, marks)
+
+        # Station 1 is behind its mark, station 2 is on it, station 3 has none
+        assert filtered['station_key'].tolist() == [2, 3]
+        assert dropped == 1
+
+    def test_no_marks_keeps_everything(self):
+        prepared, _, _ = db_data_ingestion.transform_hourly_chunk(raw_chunk(), [1, 2, 3])
+
+        filtered, dropped = db_data_ingestion.filter_by_high_water_mark(prepared, {})
+
+        assert filtered is prepared and dropped == 0
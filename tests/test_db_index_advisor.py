@@ -0,0 +1,158 @@
+import datetime
+from unittest.mock import patch, MagicMock
+import db_index_advisor
+from db_index_advisor import candidate_from_scan, is_covered, propose_indexes, index_name
+
+
+def seq_scan(relation='hourly_counts_y2023', filter_text=None, output=None):
+    """An EXPLAIN (VERBOSE, FORMAT JSON) Seq Scan node as PostgreSQL reports it."""
+    return {
+        'Node Type': 'Seq Scan', 'Relation Name': relation, 'Alias': 'hourly_counts',
+        'Output': output or ['hourly_counts.count_date', 'hourly_counts.daily_total'],
+        'Filter': filter_text or ("((hourly_counts.count_date >= '2023-01-01'::date) AND "
+                                  "(hourly_counts.station_key = ANY ('{1,2}'::integer[])) AND "
+                                  "(hourly_counts.traffic_direction_seq = 1) AND (NOT hourly_counts.is_public_holiday))"),
+        'Actual Rows': 10, 'Actual Loops': 1, 'Rows Removed by Filter': 5000,
+    }
+
+
+def explained(*nodes, name='get_hourly_data_for_stations'):
+    """An explain_workload entry whose plan appends `nodes` under a Sort."""
+    return {'name': name, 'sql': 'SELECT ...', 'params': {},
+            'plan': {'Node Type': 'Sort', 'Plans': [{'Node Type': 'Append', 'Plans': list(nodes)}]},
+            'execution_ms': 12.5}
+
+
+def inventory_index(columns, include=(), where=None, name='ix_existing'):
+    return {'name': name, 'unique': False, 'columns': list(columns), 'include': list(include),
+            'where': where, 'size_bytes': 8192, 'scans': 3}
+
+
+class TestCandidateFromScan:
+    """Tests for deriving an index candidate from an EXPLAIN plan node"""
+
+    def test_equality_then_range_with_include_and_predicate(self):
+        candidate = candidate_from_scan(seq_scan())
+
+        assert candidate == {'table': 'hourly_counts',
+                             'columns': ['station_key', 'traffic_direction_seq', 'count_date'],
+                             'include': ['daily_total'], 'where': 'NOT is_public_holiday'}
+
+    def test_wide_output_gets_no_include(self):
+        output = [f'hourly_counts.hour_{h:02d}' for h in range(24)]
+
+        candidate = candidate_from_scan(seq_scan(output=output))
+
+        assert candidate['include'] == []
+
+    def test_bitmap_index_conditions_are_used(self):
+        node = {'Node Type': 'Bitmap Heap Scan', 'Relation Name': 'hourly_counts', 'Output': [],
+                'Recheck Cond': '', 'Plans': [{'Node Type': 'Bitmap Index Scan',
+                                               'Index Cond': '(hourly_counts.station_key = 7)'}]}
+
+        assert candidate_from_scan(node)['columns'] == ['station_key']
+
+    def test_nothing_indexable(self):
+        assert candidate_from_scan(seq_scan(filter_text='(hourly_counts.daily_total IS NOT NULL)')) is None
+
+
+class TestIsCovered:
+    """Tests for matching candidates against existing indexes"""
+
+    candidate = {'table': 'hourly_counts', 'columns': ['station_key', 'count_date'],
+                 'include': ['daily_total'], 'where': 'NOT is_public_holiday'}
+
+    def test_predicate_from_pg_get_expr_matches(self):
+        # pg_get_expr(indpred) wraps the predicate in parentheses
+        index = inventory_index(['station_key', 'count_date'], ['daily_total'], where='(NOT is_public_holiday)')
+
+        assert is_covered(self.candidate, [index])
+
+    def test_longer_key_without_predicate_covers(self):
+        index = inventory_index(['station_key', 'count_date', 'daily_total'])
+
+        assert is_covered(self.candidate, [index])
+
+    def test_other_predicate_does_not_cover(self):
+        index = inventory_index(['station_key', 'count_date'], ['daily_total'], where='(NOT is_school_holiday)')
+
+        assert not is_covered(self.candidate, [index])
+
+    def test_missing_include_does_not_cover(self):
+        assert not is_covered(self.candidate, [inventory_index(['station_key', 'count_date'])])
+
+    def test_different_leading_column_does_not_cover(self):
+        assert not is_covered(self.candidate, [inventory_index(['count_date', 'station_key'], ['daily_total'])])
+
+
+class TestProposeIndexes:
+    """Tests for turning explained queries into index proposals"""
+
+    def test_partition_scans_merge_into_one_proposal(self):
+        plans = [explained(seq_scan('hourly_counts_y2022'), seq_scan('hourly_counts_y2023')),
+                 explained(seq_scan(), name='get_hourly_profile')]
+
+        proposals = propose_indexes(plans, [])
+
+        assert len(proposals) == 1
+        assert proposals[0]['name'] == index_name(candidate_from_scan(seq_scan()))
+        assert proposals[0]['queries'] == ['get_hourly_data_for_stations', 'get_hourly_profile']
+        assert proposals[0]['reasons'] == ['sequential scan']
+
+    def test_index_created_by_advisor_is_not_proposed_again(self):
+        candidate = candidate_from_scan(seq_scan())
+        existing = inventory_index(candidate['columns'], candidate['include'],
+                                   where=f"({candidate['where']})", name=index_name(candidate))
+
+        assert propose_indexes([explained(seq_scan())], [existing]) == []
+
+    def test_other_tables_ignored(self):
+        assert propose_indexes([explained(seq_scan(relation='stations'))], []) == []
+
+
+class TestIndexName:
+    """Tests for proposed index names"""
+
+    def test_short_name(self):
+        candidate = {'table': 'hourly_counts', 'columns': ['station_key', 'count_date'], 'include': [], 'where': None}
+
+        assert index_name(candidate) == 'ix_hourly_counts_station_key_count_date'
+
+    def test_long_name_is_hashed_within_limit(self):
+        candidate = {'table': 'hourly_counts', 'columns': ['station_key', 'traffic_direction_seq', 'count_date'],
+                     'include': ['daily_total'], 'where': 'NOT is_public_holiday'}
+        other = dict(candidate, where='NOT is_school_holiday')
+
+        name = index_name(candidate)
+
+        assert len(name) <= 63
+        assert name.startswith('ix_hourly_counts_station_key_traffic_direction')
+        assert name != index_name(other)
+
+
+class TestCaptureAppWorkload:
+    """Tests for replaying the db_utils readers"""
+
+    @patch('db_index_advisor.event')
+    @patch('db_index_advisor.Session')
+    def test_replay_bypasses_local_source(self, mock_session, mock_event):
+        import db_utils
+        sources_seen = []
+
+        def reader(func):
+            def replay(_session, *args, **kwargs):
+                sources_seen.append(db_utils.get_local_source())
+                replayed.append(func.__name__)
+            return replay
+
+        replayed = []
+        source = MagicMock()
+        with patch('db_utils.get_local_source', return_value=source), \
+                patch('db_index_advisor._reader', side_effect=reader):
+            db_index_advisor.capture_app_workload(MagicMock(), [1, 2], datetime.date(2023, 1, 1),
+                                                  datetime.date(2023, 12, 31))
+            assert db_utils.get_local_source() is source  # Restored after the replay
+
+        assert sources_seen == [None] * len(replayed)
+        assert {'get_station_day_hours', 'get_peak_volumes', 'get_corridor_profiles',
+                'get_heavy_vehicle_pivot'} <= set(replayed)
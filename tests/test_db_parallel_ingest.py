@@ -0,0 +1,107 @@
+import datetime
+import pytest
+from unittest.mock import patch, MagicMock
+import db_parallel_ingest
+from db_data_ingestion import HOUR_COLUMNS
+
+
+def write_csv(path, station_keys):
+    """An hourly counts CSV with one row per station key, dated 1-N May 2023."""
+    header = ['station_key', 'traffic_direction_seq', 'cardinal_direction_seq', 'classification_seq', 'date',
+              'is_public_holiday', 'is_school_holiday'] + HOUR_COLUMNS
+    lines = [','.join(header)]
+    for day, key in enumerate(station_keys, start=1):
+        lines.append(','.join([str(key), '1', '1', '1', f'2023-05-{day:02d}', 'false', 'false'] + ['1'] * 24))
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+@pytest.fixture
+def loader():
+    """Patches the worker's database calls; records copied station keys and checkpoint writes."""
+    copied, checkpoints = [], []
+
+    def copy(dbapi_conn, prepared, upsert):
+        copied.append(prepared['station_key'].tolist())
+        return len(prepared)
+
+    def write(dbapi_conn, file_path, file_size, file_hash, rows_read, rows_loaded, status):
+        checkpoints.append((rows_read, rows_loaded, status))
+
+    with patch('db_parallel_ingest.create_engine') as mock_engine, \
+            patch('db_parallel_ingest.read_checkpoint') as mock_read, \
+            patch('db_parallel_ingest.write_checkpoint', side_effect=write), \
+            patch('db_parallel_ingest.copy_hourly_chunk', side_effect=copy) as mock_copy, \
+            patch('db_parallel_ingest.ensure_partitions_for_chunk', return_value=False):
+        yield {'read': mock_read, 'copy': mock_copy, 'copied': copied, 'checkpoints': checkpoints,
+               'dbapi_conn': mock_engine.return_value.raw_connection.return_value}
+
+
+class TestIngestFileCheckpoints:
+    """Tests for the worker's checkpointed, resumable load of one file"""
+
+    def test_fresh_file_checkpointed_per_chunk(self, loader, tmp_path):
+        path = write_csv(tmp_path / 'counts.csv', [1, 2, 3, 4, 5])
+        loader['read'].return_value = None
+
+        result = db_parallel_ingest.ingest_file('postgresql://', path, [1, 2, 3, 4, 5], chunksize=2)
+
+        assert result['status'] == 'complete' and result['rows_loaded'] == 5
+        assert loader['copied'] == [[1, 2], [3, 4], [5]]
+        assert loader['checkpoints'] == [(0, 0, 'in_progress'), (2, 2, 'in_progress'), (4, 4, 'in_progress'),
+                                         (5, 5, 'in_progress'), (5, 5, 'complete')]
+
+    def test_resume_skips_committed_rows(self, loader, tmp_path):
+        path = write_csv(tmp_path / 'counts.csv', [1, 2, 3, 4, 5])
+        _, file_hash = db_parallel_ingest.file_fingerprint(path)
+        loader['read'].return_value = {'file_size': 0, 'file_hash': file_hash, 'rows_read': 2,
+                                       'rows_loaded': 2, 'status': 'in_progress'}
+
+        result = db_parallel_ingest.ingest_file('postgresql://', path, [1, 2, 3, 4, 5], chunksize=2)
+
+        assert loader['copied'] == [[3, 4], [5]]
+        assert result['rows_loaded'] == 3
+        assert loader['checkpoints'][-1] == (5, 5, 'complete')
+
+    def test_completed_file_skipped(self, loader, tmp_path):
+        path = write_csv(tmp_path / 'counts.csv', [1, 2])
+        _, file_hash = db_parallel_ingest.file_fingerprint(path)
+        loader['read'].return_value = {'file_size': 0, 'file_hash': file_hash, 'rows_read': 2,
+                                       'rows_loaded': 2, 'status': 'complete'}
+
+        result = db_parallel_ingest.ingest_file('postgresql://', path, [1, 2])
+
+        assert result['status'] == 'skipped'
+        loader['copy'].assert_not_called()
+
+    def test_changed_file_reloaded_from_start(self, loader, tmp_path):
+        path = write_csv(tmp_path / 'counts.csv', [1, 2, 3])
+        loader['read'].return_value = {'file_size': 0, 'file_hash': 'old', 'rows_read': 2,
+                                       'rows_loaded': 2, 'status': 'complete'}
+
+        db_parallel_ingest.ingest_file('postgresql://', path, [1, 2, 3], chunksize=2)
+
+        assert loader['copied'] == [[1, 2], [3]]
+
+    def test_failed_chunk_leaves_last_committed_checkpoint(self, loader, tmp_path):
+        path = write_csv(tmp_path / 'counts.csv', [1, 2, 3, 4])
+        loader['read'].return_value = None
+        loader['copy'].side_effect = [2, RuntimeError('connection lost')]
+
+        result = db_parallel_ingest.ingest_file('postgresql://', path, [1, 2, 3, 4], chunksize=2)
+
+        assert result['status'] == 'failed'
+        assert loader['checkpoints'][-1] == (2, 2, 'in_progress')
+        loader['dbapi_conn'].rollback.assert_called_once_with()
+        assert result['station_years'] == {(1, 2023), (2, 2023), (3, 2023), (4, 2023)}
+
+    def test_high_water_marks_applied(self, loader, tmp_path):
+        path = write_csv(tmp_path / 'counts.csv', [1, 2, 3])
+        loader['read'].return_value = None
+
+        result = db_parallel_ingest.ingest_file('postgresql://', path, [1, 2, 3], load_mode='incremental',
+                                                high_water_marks={1: datetime.date(2023, 5, 2)})
+
+        assert loader['copied'] == [[2, 3]]
+        assert loader['copy'].call_args.kwargs == {'upsert': True}
+        assert result['rows_loaded'] == 2
@@ -1,8 +1,8 @@
 import pytest
+from contextlib import contextmanager
 from unittest.mock import patch, MagicMock
 import pandas as pd
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.sql.elements import Update
 from app import db_utils
 from app.models import Station, HourlyCount
 
@@ -55,11 +55,13 @@ class TestDBUtilsData:
 
     def test_get_station_details_found(self):
         session = MagicMock()
-        station = Station()
+        station = Station(station_key=42, station_id='S42', name='Test', road_name='Main Rd')
         session.query.return_value.filter.return_value.first.return_value = station
 
         result = db_utils.get_station_details(session, 42)
-        assert result is station
+        assert isinstance(result, dict)
+        assert result['station_id'] == 'S42'
+        assert 'location_geom' not in result
 
     @patch('app.db_utils.logger', autospec=True)
     def test_get_station_details_not_found(self, mock_logger):
@@ -118,6 +120,7 @@ class TestDBUtilsData:
         mock_read_sql.return_value = dummy_df
         # simulate query building
         query = MagicMock(statement='stmt')
+        query.filter.return_value = query  # direction filter chains onto the same query
         session.query.return_value.filter.return_value = query
         session.bind = 'bind'
 
@@ -190,7 +193,7 @@ class TestDBUtilsData:
             session.close.assert_called_once()
 
     def test_update_station_geometries_none(self):
-        with patch('app.db_utils.session_scope', lambda: (yield None)):
+        with patch('app.db_utils.session_scope', contextmanager(lambda: (yield None))):
             with patch('app.db_utils.st', autospec=True) as mock_st:
                 db_utils.update_station_geometries()
                 mock_st.error.assert_called_once_with(
@@ -199,6 +202,7 @@ class TestDBUtilsData:
 
     def test_update_station_geometries_success(self):
         session = MagicMock()
+        @contextmanager
         def fake_scope():
             yield session
         with patch('app.db_utils.session_scope', fake_scope):
@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+from app import db_utils
+from app.models import HourlyCount
+
+
+class TestHourlyDataProjection:
+    """Tests for column projection and dtype compaction in get_hourly_data_for_stations"""
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_required_cols_are_projected(self, mock_read_sql):
+        session = MagicMock()
+        mock_read_sql.return_value = pd.DataFrame({'month': [1], 'daily_total': [100]})
+
+        db_utils.get_hourly_data_for_stations(
+            session, [1], '2023-01-01', '2023-12-31', required_cols=['month', 'daily_total', 'month']
+        )
+
+        session.query.assert_called_once_with(HourlyCount.month, HourlyCount.daily_total)
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_all_columns_without_required_cols(self, mock_read_sql):
+        session = MagicMock()
+        mock_read_sql.return_value = pd.DataFrame()
+
+        db_utils.get_hourly_data_for_stations(session, [2], '2023-01-01', '2023-12-31')
+
+        session.query.assert_called_once_with(HourlyCount)
+
+    @patch('app.db_utils.st', autospec=True)
+    @patch('app.db_utils.logger', autospec=True)
+    def test_invalid_required_cols(self, mock_logger, mock_st):
+        session = MagicMock()
+
+        result = db_utils.get_hourly_data_for_stations(
+            session, [3], '2023-01-01', '2023-12-31', required_cols=['daily_total', 'not_a_column']
+        )
+
+        assert result is None
+        session.query.assert_not_called()
+        mock_logger.error.assert_called_once()
+        mock_st.error.assert_called_once()
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_result_is_downcast(self, mock_read_sql):
+        mock_read_sql.return_value = pd.DataFrame({
+            'station_key': [1, 2],
+            'month': [1, 12],
+            'daily_total': [1000, None],
+            'hour_08': [50, 60],
+            'is_school_holiday': [True, False],
+        })
+
+        df = db_utils.get_hourly_data_for_stations(
+            MagicMock(), [4], '2023-01-01', '2023-12-31',
+            required_cols=['station_key', 'month', 'daily_total', 'hour_08', 'is_school_holiday']
+        )
+
+        assert df['station_key'].dtype == 'int32'
+        assert df['month'].dtype == 'int8'
+        assert df['daily_total'].dtype == 'Int32'
+        assert df['hour_08'].dtype == 'int32'
+        assert df['is_school_holiday'].dtype == 'bool'
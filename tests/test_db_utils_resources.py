@@ -1,6 +1,15 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from app.db_utils import init_db_resources, get_db_session
+from app import db_utils
+from app.db_utils import init_db_resources, get_db_session, dispose_db_resources
+
+
+@pytest.fixture(autouse=True)
+def reset_db_resources():
+    """init_db_resources caches its result at module level, so start each test clean."""
+    dispose_db_resources()
+    yield
+    dispose_db_resources()
 
 
 class TestDBResources:
@@ -80,3 +89,64 @@ class TestDBResources:
         mock_logger.error.assert_called_once_with(
             "Session Factory not available, cannot create session."
         )
+
+    @patch('app.db_utils.get_engine', autospec=True)
+    @patch('app.db_utils.create_session_factory', autospec=True)
+    def test_init_db_resources_reuses_engine(self, mock_create_session_factory, mock_get_engine):
+        """Test the engine and session factory are created once and then reused."""
+        mock_engine = MagicMock()
+        mock_get_engine.return_value = mock_engine
+        mock_create_session_factory.return_value = MagicMock()
+
+        first = init_db_resources()
+        second = init_db_resources()
+
+        assert first == second
+        mock_get_engine.assert_called_once()
+        mock_engine.connect.assert_called_once()
+
+    @patch('app.db_utils.get_engine', autospec=True)
+    @patch('app.db_utils.create_session_factory', autospec=True)
+    def test_init_db_resources_failure_not_cached(self, mock_create_session_factory, mock_get_engine):
+        """Test a failed initialisation is retried on the next call."""
+        mock_engine = MagicMock()
+        mock_get_engine.side_effect = [None, mock_engine]
+        mock_create_session_factory.side_effect = [None, MagicMock()]
+
+        assert init_db_resources() == (None, None)
+        engine, _ = init_db_resources()
+
+        assert engine is mock_engine
+
+    @patch('app.db_utils.get_engine', autospec=True)
+    @patch('app.db_utils.create_session_factory', autospec=True)
+    def test_dispose_db_resources(self, mock_create_session_factory, mock_get_engine):
+        """Test disposing closes the pool and clears the cached resources."""
+        mock_engine = MagicMock()
+        mock_get_engine.return_value = mock_engine
+        mock_create_session_factory.return_value = MagicMock()
+        init_db_resources()
+
+        dispose_db_resources()
+
+        mock_engine.dispose.assert_called_once()
+        assert db_utils._engine is None and db_utils._session_factory is None
+
+
+class TestMaintenanceSession:
+    """Tests for the timeout-free session used by the dbtools scripts"""
+
+    @patch('app.db_utils.init_db_resources', autospec=True)
+    @patch('app.db_utils.create_session_factory', autospec=True)
+    @patch('app.db_utils.get_engine', autospec=True)
+    def test_no_statement_timeout(self, mock_get_engine, mock_create_session_factory, mock_init_db_resources):
+        session = db_utils.get_maintenance_session()
+
+        mock_get_engine.assert_called_once_with()
+        assert session == mock_create_session_factory.return_value.return_value
+        mock_init_db_resources.assert_not_called()
+
+    @patch('app.db_utils.create_session_factory', return_value=None, autospec=True)
+    @patch('app.db_utils.get_engine', return_value=None, autospec=True)
+    def test_failure_returns_none(self, mock_get_engine, mock_create_session_factory):
+        assert db_utils.get_maintenance_session() is None
@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+from app import db_utils
+
+
+class TestSummaryQueries:
+    """Tests for the pre-aggregated summary table readers"""
+
+    @patch('app.db_utils.logger', autospec=True)
+    def test_get_station_year_metrics_none_session(self, mock_logger):
+        assert db_utils.get_station_year_metrics(None, [1]) is None
+        mock_logger.error.assert_called_once_with(
+            "Database session is None in get_station_year_metrics."
+        )
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_get_station_year_metrics_success(self, mock_read_sql):
+        session = MagicMock()
+        dummy_df = pd.DataFrame({'station_key': [1], 'year': [2023], 'aadt': [1200.0]})
+        mock_read_sql.return_value = dummy_df
+
+        result = db_utils.get_station_year_metrics(session, [1], years=[2023], directions=[1])
+
+        assert result.equals(dummy_df)
+        session.query.assert_called_once_with(db_utils.StationYearMetric)
+        mock_read_sql.assert_called_once()
+
+    @patch('app.db_utils.pd.read_sql', side_effect=Exception('fail'))
+    @patch('app.db_utils.logger', autospec=True)
+    @patch('app.db_utils.st', autospec=True)
+    def test_get_station_year_metrics_error(self, mock_st, mock_logger, mock_read_sql):
+        result = db_utils.get_station_year_metrics(MagicMock(), [2])
+
+        assert result.empty
+        mock_logger.error.assert_called_once()
+        mock_st.error.assert_called_once()
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_get_station_profile_hourly_adds_average(self, mock_read_sql):
+        mock_read_sql.return_value = pd.DataFrame({
+            'hour': [0, 1, 2],
+            'volume_sum': [100, 300, 0],
+            'day_count': [10, 20, 0],
+        })
+
+        result = db_utils.get_station_profile_hourly(MagicMock(), [1], 2023)
+
+        assert result['avg_volume'].iloc[0] == 10.0
+        assert result['avg_volume'].iloc[1] == 15.0
+        assert pd.isna(result['avg_volume'].iloc[2])
+
+    @patch('app.db_utils.logger', autospec=True)
+    def test_get_station_profile_hourly_none_session(self, mock_logger):
+        assert db_utils.get_station_profile_hourly(None, [1], 2023) is None
+        mock_logger.error.assert_called_once_with(
+            "Database session is None in get_station_profile_hourly."
+        )
+
+
+class TestHourlyProfile:
+    """Tests for the server-side hourly profile aggregation"""
+
+    @patch('app.db_utils.logger', autospec=True)
+    def test_get_hourly_profile_none_session(self, mock_logger):
+        assert db_utils.get_hourly_profile(None, [1], '2023-01-01', '2023-12-31') is None
+        mock_logger.error.assert_called_once_with(
+            "Database session is None in get_hourly_profile."
+        )
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_get_hourly_profile_returns_24_by_period(self, mock_read_sql):
+        rows = {'period': ['Weekend', 'Weekday']}
+        rows.update({col: [float(h), float(h) * 2] for h, col in enumerate(db_utils.HOUR_COLUMNS)})
+        mock_read_sql.return_value = pd.DataFrame(rows)
+
+        profile = db_utils.get_hourly_profile(MagicMock(), [1, 2], '2023-01-01', '2023-12-31')
+
+        assert profile.shape == (24, 2)
+        assert list(profile.columns) == ['Weekday', 'Weekend']
+        assert profile.loc[7, 'Weekday'] == 14.0
+        assert profile.loc[7, 'Weekend'] == 7.0
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_get_hourly_profile_by_station(self, mock_read_sql):
+        rows = {'station_key': [1, 1, 2], 'period': ['Weekday', 'Weekend', 'Weekday']}
+        rows.update({col: [1.0, 2.0, 3.0] for col in db_utils.HOUR_COLUMNS})
+        mock_read_sql.return_value = pd.DataFrame(rows)
+
+        profile = db_utils.get_hourly_profile(MagicMock(), [1, 2], '2023-01-01', '2023-12-31', by_station=True)
+
+        assert profile.shape == (24, 3)
+        assert profile[(2, 'Weekday')].eq(3.0).all()
+
+    @patch('app.db_utils.pd.read_sql')
+    def test_get_hourly_profile_query_excludes_public_holidays(self, mock_read_sql):
+        mock_read_sql.return_value = pd.DataFrame(columns=['period'] + db_utils.HOUR_COLUMNS)
+
+        db_utils.get_hourly_profile(MagicMock(), [5], '2022-01-01', '2022-12-31', directions=[1])
+
+        sql = str(mock_read_sql.call_args[0][0])
+        assert 'avg(hourly_counts.hour_23)' in sql
+        assert 'is_public_holiday IS false' in sql
+        assert 'GROUP BY' in sql
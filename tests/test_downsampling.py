@@ -0,0 +1,92 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from app import downsampling
+
+
+def daily_series(days, station_key=1):
+    dates = [datetime.date(2020, 1, 1) + datetime.timedelta(days=day) for day in range(days)]
+    volumes = 1000 + 200 * np.sin(np.arange(days) / 7.0)
+    return pd.DataFrame({'station_key': station_key, 'Date': dates, 'Total Daily Volume': volumes})
+
+
+class TestLttb:
+    """Tests for the largest-triangle-three-buckets selection"""
+
+    def test_keeps_endpoints_and_threshold(self):
+        x = np.arange(1000)
+        y = np.random.default_rng(0).normal(size=1000)
+
+        indices = downsampling.lttb_indices(x, y, 100)
+
+        assert len(indices) == 100
+        assert indices[0] == 0 and indices[-1] == 999
+        assert np.all(np.diff(indices) > 0)
+
+    def test_keeps_isolated_spike(self):
+        y = np.zeros(1000)
+        y[437] = 50.0
+
+        indices = downsampling.lttb_indices(np.arange(1000), y, 40)
+
+        assert 437 in indices
+
+    def test_short_series_unchanged(self):
+        assert downsampling.lttb_indices([1, 2, 3], [4, 5, 6], 10).tolist() == [0, 1, 2]
+
+
+class TestMinMax:
+    """Tests for min/max bucketing"""
+
+    def test_keeps_extremes_of_each_bucket(self):
+        y = np.tile([0.0, 10.0, 5.0, -3.0], 250)
+
+        indices = downsampling.minmax_indices(y, 50)
+
+        assert len(indices) <= 50
+        assert y[indices].max() == 10.0 and y[indices].min() == -3.0
+
+
+class TestDownsampleForChart:
+    """Tests for applying the point budget to chart frames"""
+
+    def test_long_series_reduced_to_width(self):
+        df = daily_series(5 * 365)
+
+        result = downsampling.downsample_for_chart(df, 'line', {'x': 'Date', 'y': 'Total Daily Volume', 'width': 400})
+
+        assert len(result) == 400
+        assert result['Date'].is_monotonic_increasing
+        assert result['Date'].iloc[0] == df['Date'].iloc[0] and result['Date'].iloc[-1] == df['Date'].iloc[-1]
+
+    def test_series_within_budget_is_untouched(self):
+        df = daily_series(90)
+
+        result = downsampling.downsample_for_chart(df, 'line', {'x': 'Date', 'y': 'Total Daily Volume'})
+
+        assert result is df
+
+    @patch('app.downsampling.MAX_CHART_POINTS', 1000)
+    def test_budget_shared_between_lines(self):
+        df = pd.concat([daily_series(3000, station_key=key) for key in range(4)])
+
+        result = downsampling.downsample_for_chart(
+            df, 'line', {'x': 'Date', 'y': 'Total Daily Volume', 'by': 'station_key', 'width': 700})
+
+        assert result.groupby('station_key').size().tolist() == [250] * 4
+
+    @pytest.mark.parametrize('kind, options', [
+        ('bar', {'x': 'Date', 'y': 'Total Daily Volume'}),
+        ('line', {'x': 'Date', 'y': ['Total Daily Volume']}),
+        ('line', {'y': 'Total Daily Volume'}),
+    ])
+    def test_unsupported_charts_are_untouched(self, kind, options):
+        df = daily_series(3000)
+
+        assert downsampling.downsample_for_chart(df, kind, options) is df
+
+    def test_unknown_method_raises(self):
+        with pytest.raises(ValueError):
+            downsampling.downsample_series(daily_series(100), 'Date', 'Total Daily Volume', 10, method='median')
@@ -0,0 +1,119 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import numpy as np
+import pandas as pd
+from app import db_utils, geo_index
+
+
+def make_stations():
+    # Four stations around Sydney plus one without coordinates
+    return pd.DataFrame({
+        'station_key': [1, 2, 3, 4, 5],
+        'station_id': ['A', 'B', 'C', 'D', 'E'],
+        'name': ['a', 'b', 'c', 'd', 'e'],
+        'road_name': ['Pacific Hwy', 'Pacific Hwy', 'Hume Hwy', 'M4', 'Unknown'],
+        'wgs84_latitude': [-33.80, -33.70, -33.90, -33.82, np.nan],
+        'wgs84_longitude': [151.18, 151.10, 150.95, 151.00, np.nan],
+        'location_geom': ['01', '02', '03', '04', None],
+    })
+
+
+class TestGeometryHelpers:
+    """Tests for the distance and containment helpers"""
+
+    def test_haversine_one_degree_of_latitude(self):
+        distance = geo_index.haversine_m(-33.0, 151.0, np.array([-34.0]), np.array([151.0]))
+        assert distance[0] == pytest.approx(111195, rel=1e-3)
+
+    def test_points_in_polygon(self):
+        square = [(0, 0), (2, 0), (2, 2), (0, 2)]
+        inside = geo_index.points_in_polygon(np.array([1.0, 3.0, 1.0]), np.array([1.0, 1.0, -0.5]), square)
+        assert inside.tolist() == [True, False, False]
+
+    def test_distance_to_line_uses_closest_segment(self):
+        line = [(151.0, -33.8), (151.1, -33.8)]
+        # ~1.1 km north of the middle of the line, and past its eastern end
+        distances = geo_index.distance_to_line_m(np.array([-33.79, -33.8]), np.array([151.05, 151.2]), line)
+        assert distances[0] == pytest.approx(1112, rel=1e-2)
+        assert distances[1] == pytest.approx(geo_index.haversine_m(-33.8, 151.1, -33.8, 151.2), rel=1e-2)
+
+    def test_polygon_wkt_closes_ring(self):
+        assert geo_index.polygon_wkt([(0, 0), (1, 0), (1, 1)]) == 'POLYGON((0.0 0.0, 1.0 0.0, 1.0 1.0, 0.0 0.0))'
+
+
+class TestStationGeoIndex:
+    """Tests for the in-process spatial fallback"""
+
+    def test_skips_stations_without_coordinates(self):
+        assert len(geo_index.StationGeoIndex(make_stations())) == 4
+
+    def test_nearest_orders_by_distance(self):
+        index = geo_index.StationGeoIndex(make_stations())
+
+        result = index.nearest(-33.81, 151.17, k=2)
+
+        assert result['station_key'].tolist() == [1, 2]
+        assert result['distance_m'].is_monotonic_increasing
+        assert 'location_geom' not in result.columns
+
+    @patch('app.geo_index.cKDTree', None)
+    def test_nearest_without_scipy_matches_scan(self):
+        index = geo_index.StationGeoIndex(make_stations())
+
+        result = index.nearest(-33.9, 150.9, k=10)
+
+        assert result['station_key'].tolist() == [3, 4, 1, 2]
+
+    def test_bbox_and_polygon(self):
+        index = geo_index.StationGeoIndex(make_stations())
+
+        assert index.in_bbox(-33.85, 151.05, -33.65, 151.2)['station_key'].tolist() == [1, 2]
+        western_sydney = [(150.9, -33.95), (151.05, -33.95), (151.05, -33.78), (150.9, -33.78)]
+        assert index.in_polygon(western_sydney)['station_key'].tolist() == [3, 4]
+
+    def test_near_line(self):
+        index = geo_index.StationGeoIndex(make_stations())
+        pacific_highway = [(151.05, -33.65), (151.20, -33.80)]
+
+        result = index.near_line(pacific_highway, 3000)
+
+        assert set(result['station_key']) == {1, 2}
+        assert (result['distance_m'] <= 3000).all()
+
+
+class TestGeoQueries:
+    """Tests for the db_utils spatial readers and their fallback"""
+
+    @pytest.fixture(autouse=True)
+    def reset_geo_index(self):
+        db_utils.get_station_geo_index.clear()
+        yield
+        db_utils.get_station_geo_index.clear()
+
+    @patch('app.db_utils.get_local_source', return_value=None)
+    @patch('app.db_utils.pd.read_sql')
+    def test_uses_postgis_when_available(self, mock_read_sql, mock_source):
+        mock_read_sql.return_value = pd.DataFrame({'station_key': [7], 'distance_m': [12.0]})
+
+        df = db_utils.get_nearest_stations(MagicMock(), -33.8, 151.1, k=1)
+
+        assert df['station_key'].tolist() == [7]
+        sql = str(mock_read_sql.call_args.args[0])
+        assert '<->' in sql and 'ST_Distance' in sql
+
+    @patch('app.db_utils.get_all_station_metadata', return_value=make_stations())
+    @patch('app.db_utils.get_local_source', return_value=None)
+    @patch('app.db_utils.pd.read_sql', side_effect=RuntimeError('function st_makeenvelope does not exist'))
+    def test_falls_back_when_postgis_fails(self, mock_read_sql, mock_source, mock_metadata):
+        df = db_utils.get_stations_in_bbox(MagicMock(), -33.85, 151.05, -33.65, 151.2)
+
+        assert df['station_key'].tolist() == [1, 2]
+
+    @patch('app.db_utils.get_all_station_metadata', return_value=make_stations())
+    @patch('app.db_utils.get_local_source', return_value=MagicMock())
+    @patch('app.db_utils.pd.read_sql')
+    def test_local_source_skips_postgis(self, mock_read_sql, mock_source, mock_metadata):
+        df = db_utils.get_stations_near_line(MagicMock(), [(151.05, -33.65), (151.20, -33.80)], 3000)
+
+        assert set(df['station_key']) == {1, 2}
+        mock_read_sql.assert_not_called()
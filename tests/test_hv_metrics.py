@@ -0,0 +1,115 @@
+import datetime
+import numpy as np
+import pandas as pd
+from unittest.mock import patch, MagicMock
+from app import hv_metrics, db_utils
+
+
+def class_rows(rows):
+    """One hourly_counts-like row per (station_key, day, classification_seq, hourly volume)."""
+    records = []
+    for station_key, day, seq, volume in rows:
+        record = {'station_key': station_key, 'count_date': datetime.date(2023, 5, day), 'classification_seq': seq,
+                  'day_of_week': 1, 'is_public_holiday': False, 'daily_total': 24.0 * volume}
+        record.update({col: volume for col in hv_metrics.HOUR_COLUMNS})
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+# Station 1: two days, 100 vehicles/hour of which 10 heavy; station 2: one day, 50/hour of which 20 heavy
+ROWS = [(1, 1, 1, 100.0), (1, 1, 3, 10.0), (1, 2, 1, 100.0), (1, 2, 3, 10.0), (2, 1, 1, 50.0), (2, 1, 3, 20.0),
+        (2, 1, 2, 999.0)]
+
+
+class TestClassPivot:
+    """Tests for the NumPy (station, class, hour) reshape"""
+
+    def test_cube_shape_and_day_counts(self):
+        keys, sums, days = hv_metrics.class_cube(class_rows(ROWS))
+
+        assert keys.tolist() == [1, 2]
+        assert sums.shape == (2, 2, 25)
+        assert days.tolist() == [[2, 2], [1, 1]]
+        assert sums[0, hv_metrics.CLASS_INDEX[3], 7] == 20.0
+
+    def test_pivot_layout_ignores_other_classes(self):
+        pivot = hv_metrics.class_pivot(class_rows(ROWS))
+
+        assert pivot.columns.tolist() == hv_metrics.pivot_columns()
+        assert pivot.set_index('station_key')['all_hour_00'].to_dict() == {1: 200.0, 2: 50.0}
+        assert pivot['hv_days'].tolist() == [2, 1]
+
+    def test_hourly_profile_and_percentage(self):
+        profile = hv_metrics.hv_hourly_profile(hv_metrics.class_pivot(class_rows(ROWS)))
+
+        # Three station-days of each class: HV (10 + 10 + 20) / 3, total (100 + 100 + 50) / 3
+        assert np.allclose(profile['Average HV Volume'], 40 / 3)
+        assert np.allclose(profile['Average Total Volume'], 250 / 3)
+        assert np.allclose(profile['HV Percentage (%)'], 16.0)
+
+    def test_station_ranking(self):
+        summary = hv_metrics.hv_station_summary(hv_metrics.class_pivot(class_rows(ROWS)))
+
+        by_volume = hv_metrics.top_hv_stations(summary, 2)
+        by_share = hv_metrics.top_hv_stations(summary, 1, by='hv_percentage')
+
+        assert by_volume['station_key'].tolist() == [2, 1]
+        assert by_volume['hv_daily'].tolist() == [480.0, 240.0]
+        assert by_share['station_key'].tolist() == [2]
+        assert by_share['hv_percentage'].iloc[0] == 40.0
+
+    def test_station_without_heavy_counts(self):
+        pivot = hv_metrics.class_pivot(class_rows([(5, 1, 1, 30.0)]))
+
+        summary = hv_metrics.hv_station_summary(pivot)
+
+        assert np.isnan(summary['hv_percentage'].iloc[0])
+        assert summary['total_daily'].iloc[0] == 720.0
+
+
+class TestHeavyVehicleReader:
+    """Tests for the db_utils heavy vehicle pivot reader"""
+
+    @patch('app.db_utils.get_local_source', return_value=None)
+    @patch('app.db_utils.pd.read_sql')
+    def test_classes_pivoted_in_one_statement(self, mock_read_sql, mock_source):
+        mock_read_sql.return_value = pd.DataFrame(columns=hv_metrics.pivot_columns())
+
+        db_utils.get_heavy_vehicle_pivot(MagicMock(), [1, 2], '2023-05-01', '2023-05-31')
+
+        mock_read_sql.assert_called_once()
+        sql = str(mock_read_sql.call_args.args[0])
+        assert 'FILTER (WHERE hourly_counts.classification_seq' in sql
+        assert sql.count('FILTER') == 2 * 26
+        assert 'JOIN' not in sql
+        assert 'GROUP BY hourly_counts.station_key' in sql
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_local_source_reduced_with_numpy(self, mock_get_source, mock_read_sql):
+        rows = pd.concat([class_rows(ROWS), class_rows([(1, 1, 3, 5.0)])])  # Second direction on 1 May
+        source = MagicMock()
+        source.read_hourly.return_value = rows
+        source.read_station_days.return_value = None  # Parquet: rows only, grouped by db_utils
+        source.read_heavy_vehicle_pivot.return_value = None
+        mock_get_source.return_value = source
+
+        pivot = db_utils.get_heavy_vehicle_pivot(MagicMock(), [1, 2], '2023-05-01', '2023-05-30')
+
+        assert pivot.set_index('station_key')['hv_hour_08'].to_dict() == {1: 25.0, 2: 20.0}
+        assert pivot['hv_days'].tolist() == [2, 1]
+        mock_read_sql.assert_not_called()
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_pivot_from_aggregating_source(self, mock_get_source, mock_read_sql):
+        source = MagicMock()
+        source.read_heavy_vehicle_pivot.return_value = pd.DataFrame({'station_key': [1], 'hv_days': [4]})
+        mock_get_source.return_value = source
+
+        pivot = db_utils.get_heavy_vehicle_pivot(MagicMock(), [1], '2023-05-01', '2023-05-30', day_type='Weekend')
+
+        assert pivot['hv_days'].tolist() == [4]
+        assert source.read_heavy_vehicle_pivot.call_args.args[4:] == (None, 'Weekend')
+        source.read_hourly.assert_not_called()
+        mock_read_sql.assert_not_called()
@@ -107,3 +107,38 @@ def test_initialize_database_failure(mock_getLogger, reset_mocks):
     mock_logger.error.assert_called_once()
     mock_st.error.assert_called_once_with("Fatal Error: Could not establish database connection. App cannot continue.")
     mock_st.stop.assert_called_once()
+
+
+def test_load_feature_modules_does_not_import_features(reset_mocks):
+    mock_logger = MagicMock()
+    with patch('app.main_app.importlib.import_module') as mock_import:
+        pages = load_feature_modules(mock_logger)
+
+    mock_import.assert_not_called()
+    assert list(pages)[0] == "Home"
+    assert pages["Home"] is render_home_page
+    assert pages["Station Profile"] == ("app.features.feature_1_profile", "render_station_profile")
+    assert len(pages) == 11
+
+
+def test_render_feature_page_imports_module_on_selection(reset_mocks):
+    mock_logger = MagicMock()
+    mock_module = MagicMock(render_peak_analysis=mock_render_peak_analysis)
+    pages = {"Peak Hour Analysis": ("app.features.feature_2_peak", "render_peak_analysis")}
+
+    with patch('app.main_app.importlib.import_module', return_value=mock_module) as mock_import:
+        render_feature_page("Peak Hour Analysis", pages, mock_logger)
+
+    mock_import.assert_called_once_with("app.features.feature_2_peak")
+    mock_render_peak_analysis.assert_called_once()
+
+
+def test_render_feature_page_reports_failed_import(reset_mocks):
+    mock_logger = MagicMock()
+    pages = {"Station Profile": ("app.features.feature_1_profile", "render_station_profile")}
+
+    with patch('app.main_app.importlib.import_module', side_effect=ImportError("No module named 'panel'")):
+        render_feature_page("Station Profile", pages, mock_logger)
+
+    mock_st.error.assert_called_once_with("Error loading application features. Check logs.")
+    mock_render_station_profile.assert_not_called()
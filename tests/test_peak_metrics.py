@@ -0,0 +1,167 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch, MagicMock
+from app import peak_metrics, db_utils
+
+
+def station_days(profiles):
+    """One station-day row per (station_key, 24 hourly volumes) pair."""
+    rows = []
+    for day, (station_key, hours) in enumerate(profiles):
+        row = {'station_key': station_key, 'count_date': datetime.date(2023, 1, 2) + datetime.timedelta(days=day)}
+        row.update(dict(zip(peak_metrics.HOUR_COLUMNS, hours)))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+FLAT = [10.0] * 24
+COMMUTER = [10.0] * 24
+COMMUTER[7], COMMUTER[8], COMMUTER[17] = 100.0, 80.0, 90.0
+
+
+class TestPeakWindows:
+    """Tests for the fixed-window peak sums"""
+
+    def test_window_sums_match_hour_columns(self):
+        matrix = peak_metrics.hour_matrix(station_days([(1, COMMUTER)]))
+
+        assert peak_metrics.window_sums(matrix, (6, 9))[0] == 10 + 100 + 80 + 10
+        assert peak_metrics.window_sums(matrix, (15, 18))[0] == 10 + 10 + 90 + 10
+
+    def test_missing_hour_makes_window_missing(self):
+        hours = list(FLAT)
+        hours[7] = np.nan
+        matrix = peak_metrics.hour_matrix(station_days([(1, hours)]))
+
+        assert np.isnan(peak_metrics.window_sums(matrix, (6, 9))[0])
+        assert peak_metrics.window_sums(matrix, (15, 18))[0] == 40
+
+    @pytest.mark.parametrize('window', [(9, 6), (-1, 3), (20, 24)])
+    def test_invalid_window(self, window):
+        with pytest.raises(ValueError):
+            peak_metrics.validate_window(window)
+
+    def test_sql_expression_adds_hour_columns(self):
+        expression = peak_metrics.window_sum_expression(db_utils.HourlyCount, (6, 8))
+        assert str(expression) == 'hourly_counts.hour_06 + hourly_counts.hour_07 + hourly_counts.hour_08'
+
+
+class TestRollingPeak:
+    """Tests for the vectorised true peak block"""
+
+    def test_one_hour_peak_per_row(self):
+        matrix = peak_metrics.hour_matrix(station_days([(1, COMMUTER), (1, FLAT)]))
+
+        starts, volumes = peak_metrics.rolling_peak(matrix, 1, (0, 11))
+
+        assert starts.tolist() == [7, 0]
+        assert volumes.tolist() == [100.0, 10.0]
+
+    def test_block_stays_inside_search_range(self):
+        matrix = peak_metrics.hour_matrix(station_days([(1, COMMUTER)]))
+
+        starts, volumes = peak_metrics.rolling_peak(matrix, 4, (12, 23))
+
+        assert 14 <= starts[0] <= 17 and starts[0] + 4 <= 24
+        assert volumes[0] == 90 + 30
+
+    def test_blocks_with_missing_hours_are_skipped(self):
+        hours = list(COMMUTER)
+        hours[8] = np.nan
+        matrix = peak_metrics.hour_matrix(station_days([(1, hours), (1, [np.nan] * 24)]))
+
+        starts, volumes = peak_metrics.rolling_peak(matrix, 2, (0, 11))
+
+        assert starts[0] not in (7, 8) and volumes[0] == 110.0
+        assert starts[1] == -1 and np.isnan(volumes[1])
+
+
+class TestStationPeakSummary:
+    """Tests for per-station averages"""
+
+    def test_fixed_windows_average_over_days(self):
+        days = station_days([(1, COMMUTER), (1, FLAT), (2, FLAT)])
+
+        summary = peak_metrics.station_peak_summary(days)
+
+        assert summary.loc[1, 'am_peak'] == (200 + 40) / 2
+        assert summary.loc[2, 'pm_peak'] == 40
+        assert summary['days'].tolist() == [2, 1]
+
+    def test_true_peak_reports_modal_start_hour(self):
+        days = station_days([(1, COMMUTER), (1, COMMUTER), (1, FLAT)])
+
+        summary = peak_metrics.station_peak_summary(days, peak_metrics.TRUE_PEAK_PERIODS, rolling_width=1)
+
+        assert summary.loc[1, 'am_peak_start'] == 7
+        assert summary.loc[1, 'am_peak_volume'] == pytest.approx(70.0)
+        assert peak_metrics.hour_label(summary.loc[1, 'pm_peak_start']) == '17:00-18:00'
+
+
+class TestPeakReaders:
+    """Tests for the db_utils peak readers"""
+
+    @patch('app.db_utils.get_local_source', return_value=None)
+    @patch('app.db_utils.pd.read_sql')
+    def test_peak_volumes_summed_in_sql(self, mock_read_sql, mock_source):
+        mock_read_sql.return_value = pd.DataFrame({'station_key': [1], 'am_peak': [240.0], 'pm_peak': [120.0], 'days': [5]})
+
+        df = db_utils.get_peak_volumes(MagicMock(), [1], '2023-01-01', '2023-01-31', windows={'am_peak': (7, 8)})
+
+        assert df['am_peak'].tolist() == [240.0]
+        sql = str(mock_read_sql.call_args.args[0])
+        assert 'hourly_counts.hour_07 + hourly_counts.hour_08' in sql
+        assert 'hour_09' not in sql
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_local_source_reduced_with_numpy(self, mock_get_source, mock_read_sql):
+        rows = station_days([(1, COMMUTER), (1, COMMUTER)])
+        rows['count_date'] = datetime.date(2023, 1, 2)  # Two directions on the same day
+        rows['classification_seq'] = 1
+        rows['day_of_week'] = 1
+        rows['is_public_holiday'] = False
+        source = MagicMock()
+        source.read_hourly.return_value = rows
+        source.read_station_days.return_value = None  # Parquet: rows only, grouped by db_utils
+        mock_get_source.return_value = source
+
+        df = db_utils.get_peak_volumes(MagicMock(), [1], '2023-01-01', '2023-01-31')
+
+        assert df['am_peak'].tolist() == [400.0]
+        assert df['days'].tolist() == [1]
+        mock_read_sql.assert_not_called()
+
+
+class TestPeakPageData:
+    """Tests for the profile and summary shown together on the peak page"""
+
+    @patch('app.db_utils.pd.read_sql')
+    @patch('app.db_utils.get_local_source')
+    def test_both_modes_profile_two_way_volumes(self, mock_get_source, mock_read_sql):
+        from app.features import feature_2_peak
+        rows = station_days([(1, COMMUTER), (1, COMMUTER)])
+        rows['count_date'] = datetime.date(2023, 6, 5)  # Both directions of one Monday
+        rows['traffic_direction_seq'] = [1, 2]
+        rows['classification_seq'] = 1
+        rows['day_of_week'] = 1
+        rows['is_public_holiday'] = False
+        rows['daily_total'] = sum(COMMUTER)
+        source = MagicMock()
+        source.read_hourly.return_value = rows
+        source.read_station_days.return_value = None  # Parquet: rows only, grouped by db_utils
+        mock_get_source.return_value = source
+        options = {'start_date': '2023-06-01', 'end_date': '2023-06-30', 'direction': 3, 'width': 1,
+                   'windows': {'am_peak': (6, 9), 'pm_peak': (15, 18)}}
+
+        fixed_summary, fixed_profile = feature_2_peak.load_peak_data(
+            MagicMock(), [1], dict(options, mode=feature_2_peak.FIXED_MODE))
+        _, true_profile = feature_2_peak.load_peak_data(
+            MagicMock(), [1], dict(options, mode=feature_2_peak.TRUE_PEAK_MODE))
+
+        assert fixed_profile[7] == 200.0
+        assert fixed_profile.tolist() == true_profile.tolist()
+        assert fixed_summary['am_peak'].tolist() == [fixed_profile.loc[6:9].sum()]
+        mock_read_sql.assert_not_called()
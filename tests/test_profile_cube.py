@@ -0,0 +1,188 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch, MagicMock
+from app import profile_cube, query_cache
+from app.profile_cube import ProfileCube
+
+
+def profile_rows(stations, volume_sum=100, day_count=5, classes=(1,)):
+    """station_profile_hourly rows: every direction, day type and hour for each station."""
+    records = []
+    for station_key in stations:
+        for direction in (1, 2):
+            for seq in classes:
+                for day_type in profile_cube.DAY_TYPES:
+                    for hour in range(24):
+                        records.append({'station_key': station_key, 'traffic_direction_seq': direction,
+                                        'classification_seq': seq, 'day_type': day_type, 'hour': hour,
+                                        'volume_sum': volume_sum * station_key, 'day_count': day_count})
+    return pd.DataFrame(records, columns=profile_cube.ROW_COLUMNS)
+
+
+def checksum(rows):
+    """What get_profile_hourly_checksum returns when station_profile_hourly holds `rows`."""
+    return len(rows), int(rows['volume_sum'].sum()), int(rows['day_count'].sum())
+
+
+@pytest.fixture(autouse=True)
+def reset_cubes(tmp_path, monkeypatch):
+    monkeypatch.setenv('TRAFFIC_CUBE_DIR', str(tmp_path))
+    profile_cube.clear_profile_cubes()
+    yield
+    profile_cube.clear_profile_cubes()
+
+
+class TestProfileCube:
+    """Tests for the station x direction x class x day type x hour cube"""
+
+    def test_cube_shape(self):
+        cube = ProfileCube.from_rows(2023, profile_rows([2, 1], classes=(1, 3)))
+
+        assert cube.keys.tolist() == [1, 2]
+        assert cube.sums.shape == (2, 2, 2, 2, 24)
+        assert cube.counts[1, 0, 0, 0, 0] == 5
+
+    def test_profile_sums_station_slices(self):
+        cube = ProfileCube.from_rows(2023, profile_rows([1, 2]))
+
+        one_way = cube.profile([1, 2], directions=[1])
+        both_ways = cube.profile([1, 2], directions=[3])
+
+        # (100 + 200) vehicles over (5 + 5) days, per direction
+        assert one_way.columns.tolist() == ['Weekday', 'Weekend']
+        assert np.allclose(one_way.to_numpy(), 30.0)
+        assert np.allclose(both_ways.to_numpy(), 60.0)
+
+    def test_unknown_stations_give_missing_profile(self):
+        cube = ProfileCube.from_rows(2023, profile_rows([1]))
+
+        assert cube.profile([9]).isna().all().all()
+        assert cube.profile([1], classification_seq=3).isna().all().all()
+
+    def test_key_metrics(self):
+        cube = ProfileCube.from_rows(2023, profile_rows([1]))
+
+        metrics = profile_cube.profile_metrics(cube.profile([1], directions=[1]))
+
+        assert metrics.loc['Weekday', 'Average Daily Volume'] == 24 * 20.0
+        assert metrics.loc['Weekend', 'Average AM Peak Volume'] == 4 * 20.0
+        assert metrics.columns.tolist() == ['Average Daily Volume', 'Average AM Peak Volume', 'Average PM Peak Volume']
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        cube = ProfileCube.from_rows(2023, profile_rows([1, 2]), version=7)
+        path = str(tmp_path / 'cube.npz')
+
+        cube.save(path)
+        loaded = ProfileCube.load(path)
+
+        assert loaded.version == 7 and loaded.year == 2023
+        assert np.array_equal(loaded.sums, cube.sums)
+        assert loaded.profile([2]).equals(cube.profile([2]))
+
+    def test_patch_replaces_station_slices(self):
+        cube = ProfileCube.from_rows(2023, profile_rows([1, 2]))
+
+        patched = cube.patched({2, 3}, profile_rows([3], volume_sum=10), version=2)
+
+        assert patched.keys.tolist() == [1, 3]
+        assert patched.version == 2
+        assert np.allclose(patched.profile([3], directions=[1]).to_numpy(), 6.0)
+
+
+class TestGetProfileCube:
+    """Tests for building, persisting and refreshing the cube"""
+
+    @patch('app.profile_cube.get_profile_hourly_checksum')
+    @patch('app.profile_cube.get_dataset_version', return_value=1)
+    @patch('app.profile_cube.get_profile_hourly_rows')
+    def test_built_once_and_persisted(self, mock_rows, mock_version, mock_checksum):
+        mock_rows.return_value = profile_rows([1, 2])
+        mock_checksum.return_value = checksum(mock_rows.return_value)
+
+        first = profile_cube.get_profile_cube(MagicMock(), 2023)
+        second = profile_cube.get_profile_cube(MagicMock(), 2023)
+        profile_cube.clear_profile_cubes()
+        from_disk = profile_cube.get_profile_cube(MagicMock(), 2023)
+
+        assert first is second
+        assert mock_rows.call_count == 1
+        assert np.array_equal(from_disk.sums, first.sums)
+
+    @patch('app.profile_cube.get_profile_hourly_checksum')
+    @patch('app.profile_cube.get_dataset_version')
+    @patch('app.profile_cube.get_profile_hourly_rows')
+    def test_new_version_patches_changed_stations_only(self, mock_rows, mock_version, mock_checksum):
+        mock_version.return_value = 1
+        mock_rows.return_value = profile_rows([1, 2])
+        mock_checksum.return_value = checksum(mock_rows.return_value)
+        profile_cube.get_profile_cube(MagicMock(), 2023)
+
+        query_cache._known_runs[2] = {'stations': frozenset({2}), 'start': datetime.date(2023, 6, 1),
+                                      'end': datetime.date(2023, 6, 30)}
+        query_cache._known_runs[3] = {'stations': None, 'start': datetime.date(2022, 1, 1),
+                                      'end': datetime.date(2022, 12, 31)}  # Another year
+        mock_version.return_value = 3
+        mock_rows.return_value = profile_rows([2], volume_sum=50)
+        mock_checksum.return_value = checksum(pd.concat([profile_rows([1]), profile_rows([2], volume_sum=50)]))
+        try:
+            cube = profile_cube.get_profile_cube(MagicMock(), 2023)
+        finally:
+            query_cache._known_runs.clear()
+
+        assert mock_rows.call_count == 2
+        assert mock_rows.call_args.args[2] == [2]
+        assert cube.version == 3
+        assert np.allclose(cube.profile([2], directions=[1]).to_numpy(), 20.0)
+        assert np.allclose(cube.profile([1], directions=[1]).to_numpy(), 20.0)
+
+    @patch('app.profile_cube.get_profile_hourly_checksum')
+    @patch('app.profile_cube.get_dataset_version')
+    @patch('app.profile_cube.get_profile_hourly_rows')
+    def test_unknown_run_rebuilds(self, mock_rows, mock_version, mock_checksum):
+        mock_version.return_value = 1
+        mock_rows.return_value = profile_rows([1])
+        mock_checksum.return_value = checksum(mock_rows.return_value)
+        profile_cube.get_profile_cube(MagicMock(), 2023)
+
+        mock_version.return_value = 2
+        profile_cube.get_profile_cube(MagicMock(), 2023)
+
+        assert len(mock_rows.call_args.args) == 2  # Whole year re-read
+
+    @patch('app.profile_cube.get_profile_hourly_checksum')
+    @patch('app.profile_cube.get_dataset_version', return_value=4)
+    @patch('app.profile_cube.get_profile_hourly_rows')
+    def test_stale_file_at_same_version_rebuilt(self, mock_rows, mock_version, mock_checksum):
+        # e.g. a recreated database whose version counter is back at 4
+        ProfileCube.from_rows(2023, profile_rows([1, 2]), version=4).save(profile_cube.cube_path(2023))
+        mock_rows.return_value = profile_rows([1, 2], volume_sum=30)
+        mock_checksum.return_value = checksum(mock_rows.return_value)
+
+        cube = profile_cube.get_profile_cube(MagicMock(), 2023)
+
+        assert len(mock_rows.call_args.args) == 2
+        assert np.allclose(cube.profile([1], directions=[1]).to_numpy(), 6.0)
+        assert ProfileCube.load(profile_cube.cube_path(2023)).checksum() == mock_checksum.return_value
+
+    @patch('app.profile_cube.get_profile_hourly_checksum', return_value=(0, 0, 0))
+    @patch('app.profile_cube.get_dataset_version', return_value=1)
+    @patch('app.profile_cube.get_profile_hourly_rows', return_value=None)
+    def test_failed_read_returns_none(self, mock_rows, mock_version, mock_checksum):
+        assert profile_cube.get_profile_cube(MagicMock(), 2023) is None
+
+
+class TestSummaryBackfill:
+    """Tests for the summary backfill invalidating cubes and cached results"""
+
+    @patch('db_summary_tables.record_ingest_run')
+    @patch('db_summary_tables.refresh_station_summaries', return_value=2)
+    def test_backfill_records_all_stations_run(self, mock_refresh, mock_record):
+        import db_summary_tables
+        dbapi_conn = MagicMock()
+        dbapi_conn.cursor.return_value.__enter__.return_value.fetchall.return_value = [(1, 2023), (2, 2023)]
+
+        assert db_summary_tables.refresh_all_summaries(dbapi_conn) == 2
+
+        mock_record.assert_called_once_with(dbapi_conn, None, None, 0, source='summary backfill')
@@ -0,0 +1,244 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app import query_cache
+import datetime
+from app.query_cache import (cached_query, get_dataset_version, skip_cache, scopes_overlap, build_scope,
+                             per_dataset_version)
+
+
+calls = []
+
+
+@cached_query(ttl=60, max_entries=8)
+def fake_reader(_session, station_key: int, direction: int = 1):
+    calls.append((station_key, direction))
+    return {'station_key': station_key, 'direction': direction}
+
+
+@cached_query(ttl=60, max_entries=2, stations='station_keys', dates=('start_date', 'end_date'))
+def fake_range_reader(_session, station_keys: list, start_date, end_date):
+    calls.append((tuple(station_keys), start_date, end_date))
+    if station_keys == [0]:
+        skip_cache()
+    return len(calls)
+
+
+def run(stations=None, start=None, end=None):
+    return {'stations': frozenset(stations) if stations is not None else None, 'start': start, 'end': end}
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+    yield
+
+
+class TestCachedQuery:
+    """Tests for the versioned st.cache_data wrapper used by db_utils readers"""
+
+    @patch('app.query_cache.get_dataset_version', return_value=1)
+    def test_repeated_calls_hit_cache(self, mock_version):
+        first = fake_reader(MagicMock(), 5)
+        second = fake_reader(MagicMock(), 5)
+
+        assert first == second
+        assert calls == [(5, 1)]
+
+    @patch('app.query_cache.get_dataset_version', return_value=1)
+    def test_arguments_are_normalised(self, mock_version):
+        fake_reader(MagicMock(), 5, 1)
+        fake_reader(MagicMock(), station_key=5)
+        fake_reader(MagicMock(), 5, direction=1)
+
+        assert calls == [(5, 1)]
+
+    @patch('app.query_cache.get_dataset_version', return_value=1)
+    def test_hits_return_copies(self, mock_version):
+        first = fake_reader(MagicMock(), 6)
+        first['station_key'] = 999
+
+        assert fake_reader(MagicMock(), 6)['station_key'] == 6
+
+    @patch('app.query_cache.get_dataset_version')
+    def test_version_bump_invalidates(self, mock_version):
+        mock_version.return_value = 1
+        fake_reader(MagicMock(), 7)
+        mock_version.return_value = 2
+        fake_reader(MagicMock(), 7)
+
+        assert calls == [(7, 1), (7, 1)]
+
+    @patch('app.query_cache.get_dataset_version')
+    def test_unrelated_ingest_run_keeps_entry(self, mock_version):
+        mock_version.return_value = 1
+        fake_range_reader(MagicMock(), [1, 2], '2023-01-01', '2023-03-31')
+        query_cache._known_runs[2] = run({3}, datetime.date(2023, 1, 1), datetime.date(2023, 12, 31))
+        query_cache._known_runs[3] = run({1}, datetime.date(2024, 1, 1), datetime.date(2024, 1, 31))
+        mock_version.return_value = 3
+
+        fake_range_reader(MagicMock(), [1, 2], '2023-01-01', '2023-03-31')
+
+        assert len(calls) == 1
+
+    @patch('app.query_cache.get_dataset_version')
+    def test_overlapping_ingest_run_invalidates_entry(self, mock_version):
+        mock_version.return_value = 1
+        fake_range_reader(MagicMock(), [1, 2], '2023-01-01', '2023-03-31')
+        query_cache._known_runs[2] = run({2}, datetime.date(2023, 3, 1), datetime.date(2023, 4, 30))
+        mock_version.return_value = 2
+
+        fake_range_reader(MagicMock(), [1, 2], '2023-01-01', '2023-03-31')
+
+        assert len(calls) == 2
+
+    @patch('app.query_cache.get_dataset_version')
+    def test_version_going_down_invalidates(self, mock_version):
+        mock_version.return_value = 5
+        fake_range_reader(MagicMock(), [1], '2023-01-01', '2023-01-31')
+        mock_version.return_value = 2  # Database dropped and re-initialised
+
+        fake_range_reader(MagicMock(), [1], '2023-01-01', '2023-01-31')
+        fake_range_reader(MagicMock(), [1], '2023-01-01', '2023-01-31')
+
+        assert len(calls) == 2
+
+    def test_changed_stations_after_version_goes_down(self):
+        entry = {'version': 5, 'scope': run({1})}
+
+        assert query_cache.changed_stations(entry, 2) is None
+        assert not query_cache.is_entry_current(entry, 2)
+
+    @patch('app.query_cache.get_dataset_version', return_value=1)
+    def test_lru_eviction(self, mock_version):
+        for key in (1, 2, 3):
+            fake_range_reader(MagicMock(), [key], '2023-01-01', '2023-01-31')
+        fake_range_reader(MagicMock(), [1], '2023-01-01', '2023-01-31')
+
+        assert len(calls) == 4
+
+    @patch('app.query_cache.get_dataset_version', return_value=1)
+    def test_skip_cache_results_not_stored(self, mock_version):
+        fake_range_reader(MagicMock(), [0], '2023-01-01', '2023-01-31')
+        fake_range_reader(MagicMock(), [0], '2023-01-01', '2023-01-31')
+
+        assert len(calls) == 2
+
+    def test_none_session_bypasses_cache(self):
+        fake_reader(None, 8)
+        fake_reader(None, 8)
+
+        assert len(calls) == 2
+
+
+class TestPerDatasetVersion:
+    """Tests for structures built once per dataset version"""
+
+    @staticmethod
+    def make_builder(results):
+        built = []
+
+        @per_dataset_version
+        def build(_session, version):
+            built.append(version)
+            return results.pop(0)
+
+        return build, built
+
+    @patch('app.query_cache.get_dataset_version')
+    def test_rebuilt_only_when_version_changes(self, mock_version):
+        build, built = self.make_builder(['a', 'b', 'c'])
+
+        mock_version.return_value = 3
+        assert build(MagicMock()) == 'a'
+        assert build(MagicMock()) == 'a'
+        mock_version.return_value = 4
+        assert build(MagicMock()) == 'b'
+        mock_version.return_value = 2  # Database dropped and re-initialised
+        assert build(MagicMock()) == 'c'
+
+        assert built == [3, 4, 2]
+
+    @patch('app.query_cache.get_dataset_version', return_value=1)
+    def test_failed_build_not_kept(self, mock_version):
+        build, built = self.make_builder([None, 'a'])
+
+        assert build(MagicMock()) is None
+        assert build(MagicMock()) == 'a'
+        assert build(None) is None
+        build.clear()
+
+        assert built == [1, 1]
+        assert build.__name__ == 'build'
+
+
+class TestScopes:
+    """Tests for matching ingest runs against cached result scopes"""
+
+    def test_build_scope_from_years(self):
+        scope = build_scope({'station_keys': [4, 5], 'years': [2022, 2023]}, stations='station_keys', years='years')
+
+        assert scope == run({4, 5}, datetime.date(2022, 1, 1), datetime.date(2023, 12, 31))
+
+    def test_unscoped_entry_always_overlaps(self):
+        assert scopes_overlap(run({1}, datetime.date(2023, 1, 1), datetime.date(2023, 1, 2)), run())
+
+    def test_disjoint_dates_do_not_overlap(self):
+        change = run(None, datetime.date(2024, 1, 1), datetime.date(2024, 1, 31))
+        scope = run({1}, datetime.date(2023, 1, 1), datetime.date(2023, 12, 31))
+
+        assert not scopes_overlap(change, scope)
+
+
+class TestDatasetVersion:
+    """Tests for reading the dataset version stamp"""
+
+    def test_version_is_read_and_reused(self):
+        session = MagicMock()
+        conn = session.get_bind.return_value.connect.return_value.__enter__.return_value
+        conn.execute.return_value.scalar.return_value = 4
+
+        assert get_dataset_version(session) == 4
+        assert get_dataset_version(session) == 4
+        conn.execute.assert_called_once()
+
+    def test_version_rechecked_after_interval(self):
+        session = MagicMock()
+        conn = session.get_bind.return_value.connect.return_value.__enter__.return_value
+        conn.execute.return_value.scalar.side_effect = [1, 2]
+
+        with patch('app.query_cache.time.monotonic', side_effect=[100.0, 100.0 + query_cache.VERSION_CHECK_SECONDS + 1]):
+            assert get_dataset_version(session) == 1
+            assert get_dataset_version(session) == 2
+
+    def test_ingest_runs_loaded_when_version_moves(self):
+        session = MagicMock()
+        conn = session.get_bind.return_value.connect.return_value.__enter__.return_value
+        conn.execute.return_value.scalar.side_effect = [1, 2]
+        conn.execute.return_value.all.return_value = [(2, [7, 8], datetime.date(2023, 5, 1), datetime.date(2023, 5, 2))]
+
+        with patch('app.query_cache.time.monotonic', side_effect=[100.0, 100.0 + query_cache.VERSION_CHECK_SECONDS + 1]):
+            get_dataset_version(session)
+            get_dataset_version(session)
+
+        assert query_cache._known_runs[2] == run({7, 8}, datetime.date(2023, 5, 1), datetime.date(2023, 5, 2))
+
+    def test_version_going_down_clears_everything(self):
+        with patch('app.query_cache.get_dataset_version', return_value=5):
+            fake_reader(MagicMock(), 7)
+        query_cache._known_runs[5] = run({7})
+        session = MagicMock()
+        conn = session.get_bind.return_value.connect.return_value.__enter__.return_value
+        conn.execute.return_value.scalar.side_effect = [5, 1]  # Database dropped and re-initialised
+
+        with patch('app.query_cache.time.monotonic', side_effect=[100.0, 100.0 + query_cache.VERSION_CHECK_SECONDS + 1]):
+            assert get_dataset_version(session) == 5
+            assert get_dataset_version(session) == 1
+
+        assert query_cache._known_runs == {}
+        assert all(not store for store in query_cache._stores.values())
+
+    def test_missing_table_means_version_zero(self):
+        session = MagicMock()
+        session.get_bind.return_value.connect.side_effect = Exception('relation "dataset_version" does not exist')
+
+        assert get_dataset_version(session) == 0
@@ -0,0 +1,79 @@
+"""
+Cold-start benchmark for the Streamlit entry point.
+
+Imports app.main_app in a fresh interpreter with `-X importtime`, records the
+cumulative import time of every module, and fails if a feature module or a
+plotting library is imported at startup, or if the app's own modules exceed
+their time budget. Budgets are generous wall-clock limits meant to catch
+regressions (a heavy import creeping back in), not to measure small changes.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import time allowed per module, in seconds
+IMPORT_BUDGET_SECONDS = {
+    'app.main_app': 5.0,
+    'app.db_utils': 4.0,
+}
+# Must only be imported when a feature page is selected
+DEFERRED_MODULE_PREFIXES = ('app.features', 'panel', 'holoviews', 'hvplot', 'bokeh', 'folium', 'streamlit_folium')
+# Imported by app.main_app's own modules; without one of these the benchmark cannot run here
+STARTUP_DEPENDENCIES = ('streamlit', 'sqlalchemy', 'geoalchemy2', 'pandas', 'numpy')
+
+
+def parse_importtime(stderr):
+    """Maps each module to its cumulative import time in seconds from `-X importtime` output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        timings[module.strip()] = int(cumulative) / 1_000_000
+    return timings
+
+
+@pytest.fixture(scope='module')
+def startup_timings():
+    for dependency in STARTUP_DEPENDENCIES:
+        pytest.importorskip(dependency)
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app.main_app'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    # Any other import error is the regression this benchmark guards against (e.g. a page library imported eagerly)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        pytest.fail("app.main_app failed to import:\n" + '\n'.join(errors[-20:]))
+    return parse_importtime(result.stderr)
+
+
+class TestStartupImports:
+    """Startup import budget for app.main_app"""
+
+    def test_parse_importtime(self):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   app.log_config\n"
+                  "import time:      3000 |    1500000 | app.main_app\n")
+
+        assert parse_importtime(stderr) == {'app.log_config': 0.00012, 'app.main_app': 1.5}
+
+    def test_feature_modules_are_deferred(self, startup_timings):
+        eager = sorted(module for module in startup_timings
+                       if any(module == prefix or module.startswith(f"{prefix}.") for prefix in DEFERRED_MODULE_PREFIXES))
+
+        assert eager == [], f"Imported at startup instead of on page selection: {eager}"
+
+    def test_modules_within_budget(self, startup_timings):
+        slowest = sorted(startup_timings.items(), key=lambda item: item[1], reverse=True)[:10]
+        report = ', '.join(f"{module} {seconds:.2f}s" for module, seconds in slowest)
+        over = {module: startup_timings[module] for module, budget in IMPORT_BUDGET_SECONDS.items()
+                if startup_timings.get(module, 0) > budget}
+
+        assert over == {}, f"Startup import budget exceeded: {over}. Slowest imports: {report}"
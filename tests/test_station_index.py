@@ -0,0 +1,145 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import numpy as np
+import pandas as pd
+from app import station_index
+
+
+def make_stations():
+    return pd.DataFrame({
+        'station_key': [10, 20, 30],
+        'station_id': ['T001', 'T002', '99001'],
+        'road_name': ['Pacific Highway', 'Pacific Highway', None],
+        'lga': ['Hornsby', 'Ku-ring-gai', 'Hornsby'],
+        'suburb': ['Asquith', 'Gordon', None],
+        'road_functional_hierarchy': ['Motorway', 'Local Road', 'Motorway'],
+        'quality_rating': [5, 3, 4],
+        'wgs84_latitude': [-33.6, -33.7, np.nan],
+        'vehicle_classifier': [True, False, True],
+        'location_geom': ['0101', '0102', '0103'],
+    })
+
+
+@pytest.fixture(autouse=True)
+def empty_station_index():
+    station_index.clear_station_index()
+    yield
+    station_index.clear_station_index()
+
+
+class TestStationIndex:
+    """Tests for the station lookup structure"""
+
+    def test_labels_and_lookups(self):
+        index = station_index.StationIndex(make_stations())
+
+        assert index.labels == ('T001 - Pacific Highway', 'T002 - Pacific Highway', '99001 - ')
+        assert index.key_for_label('T002 - Pacific Highway') == 20
+        assert index.key_for_id('99001') == 30
+        assert index.label_for(10) == 'T001 - Pacific Highway'
+        assert len(index) == 3 and 20 in index and 40 not in index
+
+    def test_row_matches_station_details_shape(self):
+        index = station_index.StationIndex(make_stations())
+
+        row = index.get(30)
+
+        assert 'location_geom' not in row
+        assert row['wgs84_latitude'] is None and row['road_name'] is None
+        assert index.get(99) is None
+
+    def test_rows_cannot_be_mutated_through_lookups(self):
+        index = station_index.StationIndex(make_stations())
+
+        index.get(10)['lga'] = 'Changed'
+
+        assert index.get(10)['lga'] == 'Hornsby'
+        with pytest.raises(TypeError):
+            index._rows[40] = {}
+
+    def test_inverted_indexes(self):
+        index = station_index.StationIndex(make_stations())
+
+        assert index.keys_for('lga', 'Hornsby') == (10, 30)
+        assert index.keys_for('road_name', 'Pacific Highway') == (10, 20)
+        assert index.keys_for('suburb', 'Nowhere') == ()
+        assert index.values('suburb') == ('Asquith', 'Gordon')
+
+    def test_filter_keys_and_dependent_values(self):
+        index = station_index.StationIndex(make_stations())
+
+        assert index.filter_keys(lga=['Hornsby'], suburb=[]) == (10, 30)
+        assert index.filter_keys(lga=['Hornsby', 'Ku-ring-gai'], road_name=['Pacific Highway']) == (10, 20)
+        assert index.filter_keys() == (10, 20, 30)
+        assert index.values_for('suburb', index.filter_keys(lga=['Hornsby'])) == ('Asquith',)
+
+
+class TestStationFacets:
+    """Tests for facet masks and dependent selector options"""
+
+    def test_facet_selections(self):
+        index = station_index.StationIndex(make_stations())
+
+        assert index.filter_keys(lga=['Hornsby'], road_functional_hierarchy=['Motorway']) == (10, 30)
+        assert index.filter_keys(quality_rating=[4, 5], vehicle_classifier=[True]) == (10, 30)
+        assert index.filter_keys(lga=['Nowhere']) == ()
+        assert all(type(key) is int for key in index.filter_keys(lga=['Hornsby']))
+
+    def test_dependent_options_with_counts(self):
+        index = station_index.StationIndex(make_stations())
+
+        assert index.options('lga') == ('Hornsby', 'Ku-ring-gai')
+        assert index.options('suburb', {'lga': ['Hornsby']}) == ('Asquith',)
+        assert index.option_counts('road_functional_hierarchy', {'lga': ['Hornsby', 'Ku-ring-gai']}) == {
+            'Local Road': 1, 'Motorway': 2}
+
+    def test_own_selection_does_not_hide_alternatives(self):
+        index = station_index.StationIndex(make_stations())
+
+        assert index.options('lga', {'lga': ['Hornsby']}) == ('Hornsby', 'Ku-ring-gai')
+
+    def test_cascade_drops_stale_selections(self):
+        index = station_index.StationIndex(make_stations())
+
+        options, selections = index.cascade({'lga': ['Ku-ring-gai'], 'suburb': ['Asquith', 'Gordon']})
+
+        assert options['suburb'] == ('Gordon',)
+        assert selections == {'lga': ['Ku-ring-gai'], 'suburb': ['Gordon'], 'road_functional_hierarchy': []}
+        assert options['road_functional_hierarchy'] == ('Local Road',)
+
+    def test_values_are_plain_python(self):
+        index = station_index.StationIndex(make_stations())
+
+        assert all(type(value) is int for value in index.options('quality_rating'))
+        assert index.options('vehicle_classifier') == (False, True)
+        assert 'permanent_station' not in index.facets
+
+    def test_masks_are_read_only(self):
+        index = station_index.StationIndex(make_stations())
+
+        with pytest.raises(ValueError):
+            index._masks['lga']['Hornsby'][0] = False
+
+
+class TestGetStationIndex:
+    """Tests for building the index once per dataset version"""
+
+    @patch('app.station_index.get_all_station_metadata', return_value=make_stations())
+    @patch('app.query_cache.get_dataset_version', return_value=3)
+    def test_reused_until_version_changes(self, mock_version, mock_metadata):
+        session = MagicMock()
+
+        first = station_index.get_station_index(session)
+        second = station_index.get_station_index(session)
+        mock_version.return_value = 4
+        third = station_index.get_station_index(session)
+
+        assert first is second
+        assert third is not first and third.version == 4
+        assert mock_metadata.call_count == 2
+
+    @patch('app.station_index.get_all_station_metadata', return_value=None)
+    @patch('app.query_cache.get_dataset_version', return_value=3)
+    def test_metadata_failure_returns_none(self, mock_version, mock_metadata):
+        assert station_index.get_station_index(MagicMock()) is None
+        assert station_index.get_station_index(None) is None